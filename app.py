@@ -2,16 +2,25 @@ import os
 import re
 import sys
 import time
+import getpass
 import hashlib
-import subprocess
 import urllib.request
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional, Tuple, Set
+from typing import List, Optional, Tuple
 
 import streamlit as st
 
+from reviewer.jobs import JobQueue, ensure_worker
+from reviewer.progress import PROGRESS_FILE, ProgressState, follow, load_state
+from reviewer.metrics import load_metrics, stage_table
+from reviewer.hosts import daemon_url, ollama_hosts
+from reviewer.resources import ResourcePlan, plan_presets
+from reviewer.registry import ModelRegistry, PullProgress, get_registry
+from reviewer.revision import INDEX_FILE
+
 # ----------------------------
 # Local folders
 # ----------------------------
@@ -20,6 +29,10 @@ PRIVATE_INPUTS = REPO_ROOT / "private_inputs"
 OUTPUTS_ROOT = REPO_ROOT / "outputs"
 PRIVATE_INPUTS.mkdir(parents=True, exist_ok=True)
 OUTPUTS_ROOT.mkdir(parents=True, exist_ok=True)
+JOBS_DB = OUTPUTS_ROOT / "_jobs.sqlite3"
+METRICS_HISTORY = OUTPUTS_ROOT / "metrics_history.jsonl"
+JOB_REFRESH_S = 2.0
+JOB_WATCH_S = 30.0
 
 APP_TITLE = "Local Manuscript Reviewer"
 APP_SUBTITLE = "Radiology • Nuclear Medicine • Medical Education • AI-in-Radiology/Education"
@@ -64,7 +77,26 @@ PRESETS = {
         "image_clarity": 180,
         "deliberate_random": 0.65,
     },
+    # llama.cpp's llama-server (or llama-swap for several models) started with
+    # --parallel 4: page images go out as 4 concurrent requests and several
+    # queued reviews share the server's batching slots.
+    "Local server (OpenAI-compatible)": {
+        "critic_model": "deepseek-r1:14b",
+        "writer_model": "llama3.1:8b",
+        "vision_model": "qwen2.5vl:7b",
+        "image_clarity": 180,
+        "deliberate_random": 0.45,
+        "llm_api": "openai",
+        "llm_slots": 4,
+    },
+}
+OLLAMA_HOSTS = ollama_hosts()
+LLM_URLS = {
+    "ollama": OLLAMA_HOSTS[0],
+    "openai": os.environ.get("OPENAI_BASE_URL", "http://localhost:8080").rstrip("/").removesuffix("/v1"),
 }
+# Off by default: on a shared workstation another review may be using the same model
+UNLOAD_ON_CANCEL = os.environ.get("REVIEWER_UNLOAD_ON_CANCEL", "0") == "1"
 
 # ----------------------------
 # Streamlit config + minimal CSS
@@ -115,6 +147,10 @@ def human_bytes(n: int) -> str:
         x /= 1024
     return f"{x:.1f} TB"
 
+def previous_reviews() -> List[Path]:
+    """Finished review folders a revision can be compared against, newest first."""
+    return sorted((p.parent for p in OUTPUTS_ROOT.glob(f"*/{INDEX_FILE}")), key=lambda p: p.name, reverse=True)
+
 def list_output_files(folder: Path) -> List[Path]:
     if not folder.exists():
         return []
@@ -129,43 +165,72 @@ def list_output_files(folder: Path) -> List[Path]:
         return (pri, name)
     return sorted(files, key=score)
 
-def get_installed_models() -> Set[str]:
-    """Queries local Ollama instance for installed model tags."""
+def _progress_text(state: ProgressState) -> str:
+    text = state.text
+    extras = []
+    if state.tok_s:
+        extras.append(f"{state.tok_s:.1f} tok/s")
+    if state.eta_s is not None:
+        extras.append(f"ETA {int(state.eta_s // 60)}m{int(state.eta_s % 60):02d}s")
+    return f"{text} ({', '.join(extras)})" if extras else text
+
+def _tail(path: Path, n: int = 50) -> List[str]:
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return [l.rstrip("\n") for l in f.readlines()[-n:]]
+
+def daemon_status() -> Optional[dict]:
+    """Health of the resident reviewer daemon, or None if it isn't running."""
     try:
-        with urllib.request.urlopen("http://localhost:11434/api/tags", timeout=1) as response:
+        with urllib.request.urlopen(f"{daemon_url()}/health", timeout=0.3) as response:
             if response.status == 200:
-                data = json.loads(response.read().decode())
-                return {m["name"] for m in data.get("models", [])}
+                return json.loads(response.read().decode())
     except Exception:
         pass
-    return set()
-
-def check_models_availability(preset_data: dict, installed_tags: Set[str]) -> Tuple[bool, List[str]]:
-    """Returns (True/False, list_of_missing_models)."""
-    required = [
-        preset_data["critic_model"],
-        preset_data["writer_model"],
-        preset_data["vision_model"]
-    ]
-    missing = []
-    for req in required:
-        if not any(req in tag for tag in installed_tags):
-            missing.append(req)
-    return (len(missing) == 0), missing
+    return None
 
-def pull_model_with_progress(model_name: str):
-    """ Runs 'ollama pull' and shows a spinner. """
-    try:
-        with st.spinner(f"Downloading {model_name}... (This can take a while for large models)"):
-            subprocess.run(["ollama", "pull", model_name], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        st.success(f"Successfully downloaded {model_name}!")
-        time.sleep(1) 
-        st.rerun()    
-    except subprocess.CalledProcessError:
-        st.error(f"Failed to download {model_name}. Check internet connection or model name.")
-    except Exception as e:
-        st.error(f"An error occurred: {e}")
+@st.cache_data(ttl=30, show_spinner=False)
+def resource_plan() -> ResourcePlan:
+    """Which presets fit in this machine's free memory; re-measured at most every 30 s."""
+    return plan_presets(PRESETS, LLM_URLS["ollama"])
+
+def model_registry(llm_api: str = "ollama") -> ModelRegistry:
+    """Shared for the process, so reruns reuse its cached model list (refreshed every TAGS_TTL_S)."""
+    return get_registry([LLM_URLS["openai"]] if llm_api == "openai" else OLLAMA_HOSTS, llm_api)
+
+def check_models_availability(preset_data: dict, registry: ModelRegistry) -> Tuple[bool, List[str]]:
+    """Returns (True/False, list_of_missing_models); tags must match exactly ("llama3.3" is "llama3.3:latest")."""
+    missing = registry.missing([preset_data["critic_model"], preset_data["writer_model"], preset_data["vision_model"]])
+    return (len(missing) == 0), missing
 
+def _pull_text(p: PullProgress) -> str:
+    if p.error:
+        return f"{p.model}: failed ({p.error})"
+    sizes = f" {human_bytes(p.completed)} / {human_bytes(p.total)}" if p.total else ""
+    return f"{p.model}: {p.status}{sizes}"
+
+def pull_models_with_progress(registry: ModelRegistry, models: List[str]):
+    """Pulls the models side by side through the server's API, one progress bar each."""
+    bars = {m: st.progress(0.0, text=f"{m}: starting") for m in models}
+    latest: dict = {}
+    # Streamlit elements can only be updated from this thread, so the pulls report into `latest`
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(registry.pull_many, models, lambda p: latest.__setitem__(p.model, p))
+        while not future.done():
+            for m, p in list(latest.items()):
+                bars[m].progress(min(p.fraction or 0.0, 1.0), text=_pull_text(p))
+            time.sleep(0.5)
+        results = future.result()
+    failed = [p for p in results.values() if p.error]
+    for p in results.values():
+        bars[p.model].progress(1.0 if not p.error else min(p.fraction or 0.0, 1.0), text=_pull_text(p))
+    if failed:
+        st.error("Failed to download " + ", ".join(p.model for p in failed) + ". Check internet connection or model name.")
+        return
+    st.success(f"Successfully downloaded {', '.join(models)}!")
+    time.sleep(1)
+    st.rerun()
 
 def build_cli_command(
     pdf_path: Path,
@@ -179,6 +244,13 @@ def build_cli_command(
     vision_model: str,
     image_clarity: int,
     deliberate_random: float,
+    metrics_history: Optional[Path] = METRICS_HISTORY,
+    llm_api: str = "ollama",
+    llm_slots: int = 1,
+    max_ctx: Optional[int] = None,
+    fallbacks: Optional[dict] = None,
+    structured_critique: bool = False,
+    previous_run: Optional[Path] = None,
 ) -> List[str]:
     category_map = {
         "Original Research": "original_research",
@@ -210,6 +282,30 @@ def build_cli_command(
     if has_ai:
         cmd += ["--has_ai"]
 
+    if structured_critique:
+        cmd += ["--critic_format", "json"]
+    if previous_run:
+        cmd += ["--previous_run", str(previous_run)]
+
+    if metrics_history:
+        cmd += ["--metrics_history", str(metrics_history)]
+
+    if llm_api != "ollama":
+        cmd += ["--llm_api", llm_api, "--llm_url", LLM_URLS[llm_api]]
+    elif len(OLLAMA_HOSTS) > 1:
+        cmd += ["--llm_url", ",".join(OLLAMA_HOSTS)]
+    if llm_slots > 1:
+        cmd += ["--llm_slots", str(int(llm_slots))]
+    if max_ctx:
+        cmd += ["--max_ctx", str(int(max_ctx))]
+    fallbacks = fallbacks or {}
+    if fallbacks.get("critic_model"):
+        cmd += ["--critic_fallback", fallbacks["critic_model"]]
+    if fallbacks.get("writer_model"):
+        cmd += ["--writer_fallback", fallbacks["writer_model"]]
+    if UNLOAD_ON_CANCEL and llm_api == "ollama":
+        cmd += ["--unload_on_cancel"]
+
     return cmd
 
 # ----------------------------
@@ -219,10 +315,16 @@ def main():
     st.title(f"🧾 {APP_TITLE}")
     st.caption(APP_SUBTITLE)
 
-    installed_tags = get_installed_models()
+    # One model-list lookup per rerun, shared by the preset labels and the readiness check below
+    missing_by_preset = {
+        name: check_models_availability(p, model_registry(p.get("llm_api", "ollama")))[1] for name, p in PRESETS.items()
+    }
+    queue = JobQueue(JOBS_DB)
     
     # Sidebar settings
     with st.sidebar:
+        page = st.radio("Page", ["New review", "Jobs"], horizontal=True, label_visibility="collapsed")
+
         st.markdown("### Privacy / confidentiality")
         st.markdown(
             """
@@ -242,35 +344,44 @@ def main():
         st.markdown("### Choose the Critic/Writer Model Quality")
         
         preset_options = list(PRESETS.keys())
+        plan = resource_plan()
         
         def format_preset(name):
-            is_ready, _ = check_models_availability(PRESETS[name], installed_tags)
-            if is_ready:
+            if not missing_by_preset[name]:
                 return name
             return f"{name} (Download Required ⬇️)"
 
         selected_key = st.selectbox(
             "Model preset", 
             preset_options, 
-            index=1,
+            index=preset_options.index(plan.preset) if plan.preset else 1,
             format_func=format_preset
         )
+        fit = plan.fits.get(selected_key)
+        if fit is not None and fit.fits is False:
+            st.warning(f"{selected_key} needs ~{fit.need / 2**30:.0f} GB for {fit.largest}; "
+                       "it will not fit in free memory and will swap.")
+        with st.expander("Memory check", expanded=False):
+            st.markdown(plan.explain(selected_key))
         
         preset = PRESETS[selected_key]
-        is_preset_ready, missing_models = check_models_availability(preset, installed_tags)
+        llm_api = preset.get("llm_api", "ollama")
+        missing_models = missing_by_preset[selected_key]
+        is_preset_ready = not missing_models
 
-        if not is_preset_ready:
+        if not is_preset_ready and llm_api != "ollama":
+            st.warning(f"Not served by {LLM_URLS[llm_api]}: {', '.join(missing_models)}")
+        elif not is_preset_ready:
             st.warning(f"Missing: {', '.join(missing_models)}")
             if st.button("📥 Download Missing Models", type="primary"):
-                for m in missing_models:
-                    pull_model_with_progress(m)
+                pull_models_with_progress(model_registry(llm_api), missing_models)
 
         st.markdown("### Advanced settings")
         
         # NOTE: Slider is only relevant if images are on, but we leave it for simplicity
         image_clarity = st.slider(
             "Image clarity (if analyzing images)",
-            min_value=120, max_value=320, value=int(preset["image_clarity"]), step=10,
+            min_value=120, max_value=320, value=int(fit.fig_dpi if fit and fit.fig_dpi else preset["image_clarity"]), step=10,
         )
 
         deliberate_random = st.slider(
@@ -279,24 +390,50 @@ def main():
             help="Lower feels more deliberate/consistent. Higher feels more random/creative.",
         )
 
+        structured_critique = st.checkbox(
+            "Structured critique (JSON)", value=False,
+            help="The critic fills a fixed schema (issues by section, with severity and pointer) and the writer "
+                 "gets a compact list instead of the critic's full notes. Saved as critique.json.",
+        )
+
         with st.expander("Model details"):
             st.text_input("Critic model", value=preset["critic_model"], disabled=True)
             st.text_input("Writer model", value=preset["writer_model"], disabled=True)
             st.text_input("Vision model", value=preset["vision_model"], disabled=True)
 
+        st.markdown("### Job queue")
+        owner = st.text_input("Your name (shown in the queue)", value=getpass.getuser())
+        max_conc = st.number_input(
+            "Reviews allowed to run at once",
+            min_value=1, max_value=8, value=queue.max_concurrency, step=1,
+            help="Applies to everyone on this workstation. Keep at 1 unless you have GPU memory for several models.",
+        )
+        if int(max_conc) != queue.max_concurrency:
+            queue.max_concurrency = int(max_conc)
+        daemon = daemon_status()
+        if daemon:
+            st.caption(f"⚡ Reviewer daemon warm ({', '.join(daemon.get('warm', []))}); "
+                       f"{daemon.get('active', 0)} review(s) running in it.")
+        else:
+            st.caption("Reviewer daemon not running; each review starts a fresh process.")
+
         st.markdown("---")
         local_only_confirm = st.checkbox(
             "I confirm I will run this locally only (no deployment, no tunnels).",
             value=False,
         )
 
+    if page == "Jobs":
+        jobs_page(queue)
+        return
+
     # Main workflow
     st.markdown("## Workflow")
     colA, colB, colC = st.columns([1.2, 1, 1])
 
     with colA:
-        st.markdown("### 1) Upload PDF")
-        uploaded = st.file_uploader("Manuscript PDF", type=["pdf"], accept_multiple_files=False)
+        st.markdown("### 1) Upload manuscript")
+        uploaded = st.file_uploader("Manuscript (PDF or DOCX)", type=["pdf", "docx"], accept_multiple_files=False)
         st.caption("Saved locally into `private_inputs/` (not uploaded anywhere).")
 
     with colB:
@@ -321,6 +458,14 @@ def main():
         else:
             st.caption("⚡ Fast mode: Skipping images.")
 
+        earlier = previous_reviews()
+        previous_run = st.selectbox(
+            "Revision of an earlier review? (optional)", [None, *earlier],
+            format_func=lambda p: "No, first review" if p is None else p.name,
+            help="For R1/R2 submissions: only the changed sections and figures are critiqued, and the review "
+                 "responds to the points raised in the chosen earlier review.",
+        )
+
     with colC:
         st.markdown("### 3) Start review")
         st.caption("Runs locally using your local models (Ollama + GPU where configured).")
@@ -337,7 +482,7 @@ def main():
         if not is_preset_ready:
             st.caption("⚠️ Install models in sidebar to start.")
         elif uploaded is None:
-            st.caption("Upload a PDF to enable Start.")
+            st.caption("Upload a PDF or DOCX to enable Start.")
         elif not local_only_confirm:
             st.caption("Confirm local-only use in sidebar.")
 
@@ -350,7 +495,7 @@ def main():
             f.write(uploaded.getbuffer())
 
         file_hash = _sha256_file(tmp)
-        pdf_path = PRIVATE_INPUTS / f"{tmp.stem}__{file_hash}.pdf"
+        pdf_path = PRIVATE_INPUTS / f"{tmp.stem}__{file_hash}{Path(original_name).suffix.lower() or '.pdf'}"
         tmp.rename(pdf_path)
 
         run_id = f"{_now_stamp()}__{pdf_path.stem[:48]}"
@@ -369,94 +514,172 @@ def main():
             vision_model=preset["vision_model"],
             image_clarity=image_clarity,
             deliberate_random=deliberate_random,
+            llm_api=preset.get("llm_api", "ollama"),
+            llm_slots=int(preset.get("llm_slots", 1)),
+            max_ctx=fit.max_ctx if fit else None,
+            fallbacks=plan.fallbacks.get(selected_key),
+            structured_critique=structured_critique,
+            previous_run=previous_run,
         )
 
-        st.markdown("### Review Progress")
-        
-        prog_bar = st.progress(0, text="Initializing reviewer...")
-        with st.expander("See raw technical logs (for debugging)", expanded=False):
-            log_box = st.empty()
+        job_id = queue.submit(label=uploaded.name, cmd=cmd, output_dir=output_dir, owner=owner)
+        ensure_worker(JOBS_DB, REPO_ROOT)
+        st.session_state["active_job"] = job_id
 
-        start = time.time()
-        collected: List[str] = []
-        
-        try:
-            p = subprocess.Popen(
-                cmd,
-                cwd=str(REPO_ROOT),
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT, 
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-            )
+    active_job = st.session_state.get("active_job")
+    if active_job is not None:
+        job = queue.get(active_job)
+        if job is not None:
+            render_job(queue, job)
+            _refresh_while_active(job)
 
-            while True:
-                line = p.stdout.readline() if p.stdout else ""
-                if line:
-                    text_line = line.strip()
-                    collected.append(text_line)
-
-                    lower_line = text_line.lower()
-                    
-                    if "mean pooling" in lower_line or "creating a new one" in lower_line:
-                        prog_bar.progress(15, text="🧠 Initializing Medical Knowledge (SciBERT)...")
-                    elif "loading weights" in lower_line or "bertmodel" in lower_line:
-                        prog_bar.progress(20, text="⏳ Loading AI models (this may take a moment)...")
-                    elif "critic" in lower_line and "start" in lower_line:
-                        prog_bar.progress(30, text="🧐 Critic Agent: Reading and analyzing manuscript...")
-                    elif "writer" in lower_line and "start" in lower_line:
-                        prog_bar.progress(60, text="✍️ Writer Agent: Drafting peer review report...")
-                    elif "vision" in lower_line or "figure" in lower_line:
-                        prog_bar.progress(80, text="🖼️ Vision Agent: Checking figures and tables...")
-                    elif "saving" in lower_line or "completed" in lower_line:
-                        prog_bar.progress(95, text="💾 Finalizing and saving reports...")
-
-                    log_box.code("\n".join(collected[-50:]), language="text")
-
-                if p.poll() is not None:
-                    if p.stdout:
-                        rest = p.stdout.read()
-                        if rest:
-                            for l in rest.splitlines():
-                                collected.append(l.strip())
-                    break
-                time.sleep(0.01)
-
-        except Exception as e:
-            st.error(f"Could not start the review process: {e}")
-            st.stop()
-
-        elapsed = time.time() - start
-        prog_bar.progress(100, text=f"✅ Complete! (took {elapsed:.1f}s)")
-        
-        run_log = output_dir / "run_log.txt"
-        run_log.write_text("\n".join(collected), encoding="utf-8")
+def render_job(queue: JobQueue, job) -> None:
+    """Shows one queued/running/finished review; safe to call on every rerun.
 
-        st.markdown("### Generated Reviews & Reports")
-        files = list_output_files(output_dir)
-        if not files:
-            st.warning("No output files were generated. Check the hidden log above for errors.")
+    For a running job this blocks for up to JOB_WATCH_S, redrawing the bar as
+    progress events arrive, and then returns so the caller can rerun.
+    """
+    st.markdown(f"### Review Progress — {job.label}")
+    console = job.output_dir / "console_log.txt"
+    progress_file = job.output_dir / PROGRESS_FILE
+    status_slot = st.empty()
+    if job.state in ("queued", "running"):
+        # Drawn before the running branch starts watching, so a click interrupts the watch
+        if st.button("Cancel review", key=f"cancel_active_{job.id}"):
+            queue.cancel(job.id)
+            st.rerun()
+
+    with st.expander("See raw technical logs (for debugging)", expanded=False):
+        st.code("\n".join(_tail(console, 50)), language="text")
+
+    if job.state == "queued":
+        pos = queue.position(job.id)
+        status_slot.info(f"⏳ Queued (position {pos}). It will start when a slot frees up.")
+    elif job.state == "running":
+        state = ProgressState()
+        bar = status_slot.progress(0, text=state.text)
+        for ev in follow(progress_file, timeout_s=JOB_WATCH_S):
+            state.apply(ev)
+            if ev.get("event") in ("progress", "stage_start", "end"):
+                bar.progress(min(int(state.pct), 100), text=_progress_text(state))
+        if state.finished:
+            time.sleep(1.0)  # give the worker a beat to record the exit code
+    elif job.state == "done":
+        took = (job.finished_at or 0) - (job.started_at or 0)
+        status_slot.progress(100, text=f"✅ Complete! (took {took:.1f}s)")
+    elif job.state == "cancelling":
+        status_slot.warning(f"🚫 Cancelling job #{job.id}; the model server is being released...")
+    elif job.state == "cancelled":
+        if job.started_at:
+            status_slot.warning(f"Review was cancelled (job #{job.id}). Partial outputs stay in {job.output_dir.name}.")
         else:
-            for p in files:
-                with open(p, "rb") as f:
-                    file_data = f.read()
-                    
-                col_icon, col_details, col_btn = st.columns([0.5, 3, 1])
-                with col_icon:
-                    st.write("📄")
-                with col_details:
-                    st.markdown(f"**{p.name}**")
-                    st.caption(f"{human_bytes(p.stat().st_size)}")
-                with col_btn:
-                    st.download_button(
-                        label="Download",
-                        data=file_data,
-                        file_name=p.name,
-                        mime="application/octet-stream",
-                        key=f"dl_{p.name}"
-                    )
-        st.markdown("---")
+            status_slot.warning("Review was cancelled before it started.")
+    else:
+        state = load_state(progress_file)
+        where = f" during {state.stage}" if state.stage else ""
+        status_slot.error(f"Review failed{where} (exit code {job.returncode}). {job.error or 'See the technical log below.'}")
+
+    if job.state in ("done", "failed"):
+        render_metrics(job.output_dir)
+    if job.state == "done":
+        render_output_files(job.output_dir)
+    st.markdown("---")
+
+def render_metrics(output_dir: Path) -> None:
+    """Per-stage wall time, model load time and tokens/sec from metrics.json."""
+    metrics = load_metrics(output_dir)
+    if not metrics:
+        return
+    rows = stage_table(metrics)
+    if not rows:
+        return
+    with st.expander("Timing & token metrics", expanded=False):
+        st.dataframe(
+            rows,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "stage": "Stage",
+                "wall_s": st.column_config.NumberColumn("Wall (s)", format="%.1f"),
+                "model": "Model",
+                "load_s": st.column_config.NumberColumn("Model load (s)", format="%.1f"),
+                "prompt_tokens": "Prompt tokens",
+                "prompt_tok_s": st.column_config.NumberColumn("Prompt tok/s", format="%.1f"),
+                "gen_tokens": "Generated tokens",
+                "gen_tok_s": st.column_config.NumberColumn("Gen tok/s", format="%.1f"),
+            },
+        )
+        st.caption("A large model-load time means the model was not resident; low prompt tok/s points at a "
+                   "context that is too long; low gen tok/s points at the model itself or memory pressure.")
+
+def _refresh_while_active(job) -> None:
+    if job.is_active:
+        # A running job already waited inside render_job; idle-wait when queued or cancelling.
+        if job.state != "running":
+            time.sleep(JOB_REFRESH_S)
+        st.rerun()
+
+def render_output_files(output_dir: Path) -> None:
+    st.markdown("### Generated Reviews & Reports")
+    files = list_output_files(output_dir)
+    if not files:
+        st.warning("No output files were generated. Check the hidden log above for errors.")
+        return
+    for p in files:
+        with open(p, "rb") as f:
+            file_data = f.read()
+
+        col_icon, col_details, col_btn = st.columns([0.5, 3, 1])
+        with col_icon:
+            st.write("📄")
+        with col_details:
+            st.markdown(f"**{p.name}**")
+            st.caption(f"{human_bytes(p.stat().st_size)}")
+        with col_btn:
+            st.download_button(
+                label="Download",
+                data=file_data,
+                file_name=p.name,
+                mime="application/octet-stream",
+                key=f"dl_{output_dir.name}_{p.name}"
+            )
+
+def jobs_page(queue: JobQueue) -> None:
+    st.markdown("## Jobs")
+    st.caption("All reviews queued on this workstation. Running reviews keep going if you close the tab.")
+
+    jobs = queue.list_jobs(limit=50)
+    if not jobs:
+        st.info("No reviews have been queued yet.")
+        return
+
+    icons = {"queued": "⏳", "running": "⚙️", "cancelling": "🚫", "done": "✅", "failed": "❌", "cancelled": "🚫"}
+    for job in jobs:
+        col_state, col_label, col_btn = st.columns([0.6, 3, 1])
+        with col_state:
+            st.write(f"{icons.get(job.state, '•')} {job.state}")
+        with col_label:
+            when = datetime.fromtimestamp(job.created_at).strftime("%Y-%m-%d %H:%M")
+            pos = queue.position(job.id) if job.state == "queued" else None
+            extra = f" • position {pos}" if pos else ""
+            st.markdown(f"**#{job.id} {job.label}**  \n{job.owner or 'unknown'} • {when}{extra}")
+        with col_btn:
+            if st.button("Open", key=f"open_{job.id}"):
+                st.session_state["active_job"] = job.id
+            if job.state in ("queued", "running") and st.button("Cancel", key=f"cancel_{job.id}"):
+                queue.cancel(job.id)
+                st.rerun()
+
+    active_job = st.session_state.get("active_job")
+    if active_job is not None:
+        job = queue.get(active_job)
+        if job is not None:
+            st.markdown("---")
+            render_job(queue, job)
+            _refresh_while_active(job)
+    elif any(j.is_active for j in jobs):
+        time.sleep(JOB_REFRESH_S)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Stand-in PubMed E-utilities, Crossref and Semantic Scholar on one local port,
+# for timing and exercising reviewer.novelty_search without the network.
+# Every source returns the same few works (some DOIs shared, spelled
+# differently), with configurable latency and an optional run of 429s.
+
+@dataclass
+class FakeLiteratureConfig:
+    latency_s: dict[str, float] = field(default_factory=lambda: {"pubmed": 0.2, "crossref": 0.3, "semantic_scholar": 0.4})
+    rate_limited: dict[str, int] = field(default_factory=dict)  # source -> number of 429s before answering
+    retry_after_s: float = 0.1
+
+WORKS = [
+    {"title": "Deep learning triage of PET/CT studies", "year": 2023, "doi": "10.1000/petct.2023.001", "venue": "J Nucl Med"},
+    {"title": "Resident education with AI feedback", "year": 2022, "doi": "10.1000/edu.2022.042", "venue": "Acad Radiol"},
+    {"title": "Reporting guidelines for AI in imaging", "year": 2020, "doi": "10.1000/claim.2020.7", "venue": "Radiol AI"},
+]
+
+class FakeLiterature:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: FakeLiteratureConfig | None = None):
+        self.config = config or FakeLiteratureConfig()
+        self.hits: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def endpoints(self):
+        from reviewer.novelty_search import Endpoints
+        return Endpoints(pubmed=f"{self.url}/eutils", crossref=f"{self.url}/crossref",
+                         semantic_scholar=f"{self.url}/s2")
+
+    def start(self) -> "FakeLiterature":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+        cfg = self.config
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def _send(self, body: dict, code: int = 200, headers: dict | None = None) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                u = urlparse(self.path)
+                q = {k: v[0] for k, v in parse_qs(u.query).items()}
+                source = {"eutils": "pubmed", "crossref": "crossref", "s2": "semantic_scholar"}.get(u.path.split("/")[1])
+                if source is None:
+                    self._send({"error": "not found"}, 404)
+                    return
+                with fake._lock:
+                    n = fake.hits[source] = fake.hits.get(source, 0) + 1
+                if n <= cfg.rate_limited.get(source, 0):
+                    self._send({"error": "rate limited"}, 429, {"Retry-After": str(cfg.retry_after_s)})
+                    return
+                time.sleep(cfg.latency_s.get(source, 0.0))
+
+                if u.path.endswith("/esearch.fcgi"):
+                    self._send({"esearchresult": {"idlist": [str(1000 + i) for i in range(len(WORKS))]}})
+                elif u.path.endswith("/esummary.fcgi"):
+                    result = {}
+                    for i, w in enumerate(WORKS):
+                        result[str(1000 + i)] = {
+                            "title": w["title"], "pubdate": f"{w['year']} Jan", "fulljournalname": w["venue"],
+                            "authors": [{"name": "Doe J"}], "articleids": [{"idtype": "doi", "value": w["doi"]}],
+                        }
+                    self._send({"result": result})
+                elif source == "crossref":
+                    self._send({"message": {"items": [{
+                        "title": [w["title"]], "issued": {"date-parts": [[w["year"]]]}, "container-title": [w["venue"]],
+                        "author": [{"given": "Jane", "family": "Doe"}], "DOI": w["doi"].upper(),
+                        "URL": f"https://doi.org/{w['doi']}",
+                    } for w in WORKS[:int(q.get("rows", 8))]]}})
+                else:
+                    self._send({"data": [{
+                        "title": w["title"], "year": w["year"], "venue": w["venue"], "authors": [{"name": "Jane Doe"}],
+                        "externalIds": {"DOI": f"https://doi.org/{w['doi']}"} if i else {}, "url": f"https://s2/{i}",
+                    } for i, w in enumerate(WORKS)]})
+
+        return Handler
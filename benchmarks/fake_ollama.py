@@ -0,0 +1,311 @@
+from __future__ import annotations
+import hashlib
+import json
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Stand-in Ollama server for benchmarks: same endpoints and response shapes
+# (including the timing fields), with configurable latency and tokens/sec, so
+# the pipeline can be timed without real 14-70B models. It also answers the
+# OpenAI-compatible /v1 endpoints the way llama-server does, for --llm_api openai.
+
+LOREM = (
+    "The manuscript describes a retrospective cohort with adequate sample size, "
+    "but the reference standard and blinding need clarification. Confidence intervals "
+    "should accompany all accuracy estimates, and the figures need axis units. "
+).split(" ")
+
+@dataclass
+class FakeConfig:
+    latency_s: float = 0.05          # time to first token (prompt evaluation)
+    load_s: float = 0.0              # reported load_duration
+    tok_s: float = 400.0             # generation speed
+    gen_tokens: int = 256            # tokens per response (capped by num_predict)
+    prompt_chars_per_token: float = 4.0
+    models: list[str] = field(default_factory=lambda: [
+        "deepseek-r1:14b", "deepseek-r1:32b", "deepseek-r1:70b",
+        "llama3.3:latest", "llama3.1:8b", "qwen2.5vl:7b",
+    ])
+    context_length: int = 131072
+    embed_dim: int = 384
+
+@dataclass
+class RequestLog:
+    path: str
+    model: str
+    bytes_in: int
+    prompt_chars: int
+    images: int
+    ts: float
+
+class FakeOllama:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: FakeConfig | None = None):
+        self.config = config or FakeConfig()
+        self.requests: list[RequestLog] = []
+        self.loaded: set[str] = set()  # models "resident" after a generate/chat, as /api/ps reports
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def request_summary(self) -> dict:
+        by_path: dict[str, dict] = {}
+        for r in self.requests:
+            d = by_path.setdefault(r.path, {"count": 0, "bytes_in": 0, "max_bytes_in": 0, "images": 0})
+            d["count"] += 1
+            d["bytes_in"] += r.bytes_in
+            d["max_bytes_in"] = max(d["max_bytes_in"], r.bytes_in)
+            d["images"] += r.images
+        return by_path
+
+    def _handler(self):
+        fake = self
+        cfg = self.config
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *a):
+                pass
+
+            def _send_json(self, body: dict, code: int = 200) -> None:
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read(self) -> tuple[dict, int]:
+                n = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(n) if n else b"{}"
+                return json.loads(raw or b"{}"), len(raw)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": m, "model": m, "size": 0} for m in cfg.models]})
+                elif self.path == "/v1/models":
+                    self._send_json({"object": "list", "data": [{"id": m, "object": "model"} for m in cfg.models]})
+                elif self.path == "/api/ps":
+                    with fake._lock:
+                        loaded = sorted(fake.loaded)
+                    self._send_json({"models": [{"name": m, "model": m, "size_vram": 0} for m in loaded]})
+                elif self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                else:
+                    self._send_json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                body, nbytes = self._read()
+                model = body.get("model", "")
+                if self.path == "/api/show":
+                    self._send_json({
+                        "details": {"parameter_size": "7B", "quantization_level": "Q4_K_M"},
+                        "model_info": {"general.architecture": "llama", "llama.context_length": cfg.context_length},
+                    })
+                    return
+                if self.path == "/api/embed":
+                    inputs = body.get("input") or []
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._log(model, nbytes, sum(len(x) for x in inputs), 0)
+                    self._send_json({"model": model, "embeddings": [self._embed(x) for x in inputs]})
+                    return
+                if self.path == "/v1/embeddings":
+                    inputs = body.get("input") or []
+                    if isinstance(inputs, str):
+                        inputs = [inputs]
+                    self._log(model, nbytes, sum(len(x) for x in inputs), 0)
+                    self._send_json({"object": "list", "model": model, "data": [
+                        {"object": "embedding", "index": i, "embedding": self._embed(x)} for i, x in enumerate(inputs)
+                    ]})
+                    return
+                if self.path == "/v1/chat/completions":
+                    self._openai_chat(body, model, nbytes)
+                    return
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({"error": "not found"}, 404)
+                    return
+
+                if self.path == "/api/chat":
+                    msgs = body.get("messages") or []
+                    prompt = "".join(m.get("content") or "" for m in msgs)
+                    images = sum(len(m.get("images") or []) for m in msgs)
+                else:
+                    prompt = body.get("prompt") or ""
+                    images = len(body.get("images") or [])
+                self._log(model, nbytes, len(prompt), images)
+
+                opts = body.get("options") or {}
+                n = min(cfg.gen_tokens, int(opts.get("num_predict") or cfg.gen_tokens))
+                if n < 0:
+                    n = cfg.gen_tokens
+                prompt_tokens = int(math.ceil(len(prompt) / cfg.prompt_chars_per_token)) + 256 * images
+                stream = body.get("stream", True)
+                chat = self.path == "/api/chat"
+
+                t0 = time.perf_counter()
+                time.sleep(cfg.latency_s)
+                prompt_s = time.perf_counter() - t0
+                tokens = [LOREM[i % len(LOREM)] + " " for i in range(n)]
+                per_tok = 1.0 / cfg.tok_s if cfg.tok_s > 0 else 0.0
+
+                def final(text: str) -> dict:
+                    gen_s = time.perf_counter() - t0 - prompt_s
+                    out = {
+                        "model": model,
+                        "done": True,
+                        "done_reason": "stop",
+                        "total_duration": int((time.perf_counter() - t0 + cfg.load_s) * 1e9),
+                        "load_duration": int(cfg.load_s * 1e9),
+                        "prompt_eval_count": prompt_tokens,
+                        "prompt_eval_duration": int(prompt_s * 1e9),
+                        "eval_count": n,
+                        "eval_duration": int(gen_s * 1e9),
+                    }
+                    if chat:
+                        out["message"] = {"role": "assistant", "content": text}
+                    else:
+                        out["response"] = text
+                    return out
+
+                if not stream:
+                    time.sleep(per_tok * n)
+                    self._send_json(final("".join(tokens)))
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for tok in tokens:
+                    time.sleep(per_tok)
+                    piece = {"model": model, "done": False}
+                    if chat:
+                        piece["message"] = {"role": "assistant", "content": tok}
+                    else:
+                        piece["response"] = tok
+                    self._chunk(piece)
+                last = final("")
+                self._chunk(last)
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _openai_chat(self, body: dict, model: str, nbytes: int) -> None:
+                prompt, images = "", 0
+                for m in body.get("messages") or []:
+                    content = m.get("content") or ""
+                    if isinstance(content, str):
+                        prompt += content
+                        continue
+                    for part in content:
+                        if part.get("type") == "text":
+                            prompt += part.get("text") or ""
+                        elif part.get("type") == "image_url":
+                            images += 1
+                self._log(model, nbytes, len(prompt), images)
+
+                n = min(cfg.gen_tokens, int(body.get("max_tokens") or cfg.gen_tokens))
+                prompt_tokens = int(math.ceil(len(prompt) / cfg.prompt_chars_per_token)) + 256 * images
+                t0 = time.perf_counter()
+                time.sleep(cfg.latency_s)
+                prompt_s = time.perf_counter() - t0
+                tokens = [LOREM[i % len(LOREM)] + " " for i in range(n)]
+                per_tok = 1.0 / cfg.tok_s if cfg.tok_s > 0 else 0.0
+
+                def extras() -> dict:
+                    gen_s = time.perf_counter() - t0 - prompt_s
+                    return {
+                        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n, "total_tokens": prompt_tokens + n},
+                        "timings": {"prompt_n": prompt_tokens, "prompt_ms": prompt_s * 1000,
+                                    "predicted_n": n, "predicted_ms": gen_s * 1000},
+                    }
+
+                if not body.get("stream"):
+                    time.sleep(per_tok * n)
+                    self._send_json({"object": "chat.completion", "model": model, "choices": [{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                    }], **extras()})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for tok in tokens:
+                    time.sleep(per_tok)
+                    self._sse({"object": "chat.completion.chunk", "model": model,
+                               "choices": [{"index": 0, "delta": {"content": tok}, "finish_reason": None}]})
+                last = {"object": "chat.completion.chunk", "model": model, "choices": []}
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    last.update(extras())
+                self._sse(last)
+                self._raw(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def _sse(self, obj: dict) -> None:
+                self._raw(f"data: {json.dumps(obj)}\n\n".encode("utf-8"))
+
+            def _raw(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _chunk(self, obj: dict) -> None:
+                data = (json.dumps(obj) + "\n").encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _log(self, model: str, nbytes: int, prompt_chars: int, images: int) -> None:
+                with fake._lock:
+                    fake.requests.append(RequestLog(self.path, model, nbytes, prompt_chars, images, time.time()))
+                    if self.path in ("/api/generate", "/api/chat") and model:
+                        fake.loaded.add(model if ":" in model else f"{model}:latest")
+
+            @staticmethod
+            def _embed(text: str) -> list[float]:
+                h = hashlib.sha256(text.encode("utf-8")).digest()
+                return [((h[i % len(h)] / 255.0) - 0.5) for i in range(cfg.embed_dim)]
+
+        return Handler
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Stand-in Ollama server for benchmarks")
+    ap.add_argument("--port", type=int, default=11500)
+    ap.add_argument("--latency_s", type=float, default=0.05)
+    ap.add_argument("--load_s", type=float, default=0.0)
+    ap.add_argument("--tok_s", type=float, default=400.0)
+    ap.add_argument("--gen_tokens", type=int, default=256)
+    args = ap.parse_args()
+    cfg = FakeConfig(latency_s=args.latency_s, load_s=args.load_s, tok_s=args.tok_s, gen_tokens=args.gen_tokens)
+    fake = FakeOllama(port=args.port, config=cfg)
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# End-to-end pipeline benchmark against the stand-in Ollama server.
+#
+#   python -m benchmarks.run_bench                       # run and compare with baselines.json
+#   python -m benchmarks.run_bench --scenarios demo synth100
+#   python -m benchmarks.run_bench --update_baseline     # record this machine's numbers
+#
+# LLM latency is simulated, so the numbers measure our own work: ingest,
+# rendering, evidence extraction, prompt assembly and request sizes.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from benchmarks.fake_ollama import FakeConfig, FakeOllama  # noqa: E402
+from benchmarks.synth import make_manuscript  # noqa: E402
+
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines.json"
+DEMO_PDF = REPO_ROOT / "demo" / "synthetic_manuscript.pdf"
+
+SCENARIOS = {
+    "demo": None,
+    "synth100": 100,
+    "synth300": 300,
+}
+
+# Differences smaller than these are noise whatever the ratio says.
+ABS_FLOOR = {"s": 0.05, "mb": 16.0, "bytes": 4096}
+
+def _input_for(name: str, workdir: Path) -> Path:
+    pages = SCENARIOS[name]
+    if pages is None:
+        return DEMO_PDF
+    return make_manuscript(workdir / f"{name}.pdf", pages)
+
+def _run_cli(cmd: list[str], log_path: Path) -> tuple[int, float, float | None]:
+    """Runs a child process; returns (returncode, wall_s, peak_rss_mb)."""
+    t0 = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen(cmd, cwd=str(REPO_ROOT), stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, rusage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is KiB on Linux and bytes on macOS
+            scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+            peak_mb = rusage.ru_maxrss / scale
+        else:
+            proc.wait()
+            peak_mb = None
+    return proc.returncode, time.perf_counter() - t0, peak_mb
+
+def bench_scenario(name: str, workdir: Path, cfg: FakeConfig, vision: bool = True) -> dict:
+    pdf = _input_for(name, workdir)
+    out_dir = workdir / f"out_{name}"
+    with FakeOllama(config=cfg) as fake:
+        cmd = [
+            sys.executable, "-m", "reviewer.cli",
+            "--input", str(pdf),
+            "--out", str(out_dir),
+            "--critic_model", "deepseek-r1:14b",
+            "--writer_model", "llama3.1:8b",
+            "--ollama_url", fake.url,
+            "--daemon", "off",
+        ]
+        if vision:
+            cmd += ["--vlm_model", "qwen2.5vl:7b", "--fig_dpi", "200"]
+        rc, wall_s, peak_mb = _run_cli(cmd, workdir / f"{name}.log")
+        requests = fake.request_summary()
+
+    metrics = {}
+    mpath = out_dir / "metrics.json"
+    if mpath.exists():
+        metrics = json.loads(mpath.read_text(encoding="utf-8"))
+    return {
+        "returncode": rc,
+        "pages": SCENARIOS[name],
+        "wall_s": round(wall_s, 3),
+        "peak_rss_mb": round(peak_mb, 1) if peak_mb is not None else None,
+        "stages": metrics.get("stages", {}),
+        "requests": requests,
+    }
+
+def bench_micro(workdir: Path) -> dict:
+    """In-process timings for the pieces that do not need an LLM at all."""
+    from reviewer.ingest import load_manuscript
+    from reviewer import cli
+
+    out: dict = {}
+    pdf = workdir / "synth300.pdf"
+    if not pdf.exists():
+        make_manuscript(pdf, 300)
+
+    t0 = time.perf_counter()
+    ms = load_manuscript(pdf)
+    out["ingest_300p_s"] = round(time.perf_counter() - t0, 4)
+    full_text = "\n\n".join(u.text for u in ms.units)
+
+    class _Args:
+        manuscript_type = "original_research"
+        study_design = "Retrospective cohort"
+        has_ai = True
+
+    template = cli.load_template("critic_prompt")
+    t0 = time.perf_counter()
+    for _ in range(20):
+        cli.build_critic_input(template, full_text, _Args, "No images found.")
+    out["prompt_assembly_300p_ms"] = round((time.perf_counter() - t0) / 20 * 1000, 3)
+
+    try:
+        from reviewer.splitter import split_to_sentences
+        t0 = time.perf_counter()
+        sentences = split_to_sentences(ms.units)
+        out["sentence_split_300p_s"] = round(time.perf_counter() - t0, 3)
+        out["sentences_300p"] = len(sentences)
+    except ImportError as e:
+        out["sentence_split_300p_s"] = f"skipped ({e.name} not installed)"
+        sentences = None
+
+    # Three sources at 0.2/0.3/0.4 s (PubMed takes two round trips): concurrent
+    # lookups should land near the slowest source, not the ~1.1 s sum.
+    from benchmarks.fake_literature import FakeLiterature
+    from reviewer.novelty_search import Fetcher, novelty_bundle
+    with FakeLiterature() as lit:
+        t0 = time.perf_counter()
+        novelty_bundle(["PET/CT", "triage"], cache=False, fetcher=Fetcher(), endpoints=lit.endpoints())
+        out["novelty_bundle_s"] = round(time.perf_counter() - t0, 3)
+
+    if sentences is not None:
+        try:
+            from reviewer.bert_evidence import get_extractor
+            from reviewer.rubric import load_rubric
+            rubric = load_rubric(REPO_ROOT / "config" / "rubrics" / "core_rubric.json")
+            extractor = get_extractor()
+            t0 = time.perf_counter()
+            extractor.extract(sentences[:2000], rubric)
+            out["evidence_2000_sentences_s"] = round(time.perf_counter() - t0, 3)
+        except ImportError as e:
+            out["evidence_2000_sentences_s"] = f"skipped ({e.name} not installed)"
+    return out
+
+def _flatten(results: dict) -> dict[str, tuple[float, str]]:
+    """scenario metrics -> {"synth100.stages.render": (value, unit)}"""
+    flat: dict[str, tuple[float, str]] = {}
+    for name, r in results.get("scenarios", {}).items():
+        flat[f"{name}.wall_s"] = (r["wall_s"], "s")
+        if r.get("peak_rss_mb") is not None:
+            flat[f"{name}.peak_rss_mb"] = (r["peak_rss_mb"], "mb")
+        for stage, secs in (r.get("stages") or {}).items():
+            flat[f"{name}.stages.{stage}"] = (secs, "s")
+        for path, req in (r.get("requests") or {}).items():
+            flat[f"{name}.requests.{path}.max_bytes_in"] = (req["max_bytes_in"], "bytes")
+    for key, val in (results.get("micro") or {}).items():
+        if isinstance(val, (int, float)) and not key.startswith("sentences"):
+            unit = "s" if key.endswith("_s") else ("ms" if key.endswith("_ms") else "count")
+            flat[f"micro.{key}"] = (val / 1000 if unit == "ms" else val, "s" if unit == "ms" else unit)
+    return flat
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    cur = _flatten(results)
+    base = _flatten(baseline)
+    regressions = []
+    for key, (value, unit) in cur.items():
+        if key not in base:
+            continue
+        ref = base[key][0]
+        floor = ABS_FLOOR.get(unit, 0)
+        if ref and value > ref * (1 + tolerance) and value - ref > floor:
+            regressions.append(f"{key}: {ref} -> {value} (+{(value / ref - 1):.0%})")
+    return regressions
+
+def format_results(results: dict) -> str:
+    lines = [f"{'scenario':<10} {'rc':>3} {'wall s':>8} {'rss MB':>8}  stages"]
+    for name, r in results["scenarios"].items():
+        stages = ", ".join(f"{k}={v:.2f}" for k, v in r["stages"].items())
+        rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+        lines.append(f"{name:<10} {r['returncode']:>3} {r['wall_s']:>8.2f} {rss:>8}  {stages}")
+        for path, req in r["requests"].items():
+            lines.append(f"{'':<10} {path}: {req['count']} req, max {req['max_bytes_in'] / 1024:.0f} KiB in, {req['images']} images")
+    if results.get("micro"):
+        lines.append("micro: " + ", ".join(f"{k}={v}" for k, v in results["micro"].items()))
+    return "\n".join(lines)
+
+def main(argv: list[str] | None = None) -> int:
+    import argparse
+    ap = argparse.ArgumentParser(description="End-to-end reviewer benchmark with a stand-in Ollama")
+    ap.add_argument("--scenarios", nargs="*", default=list(SCENARIOS), choices=list(SCENARIOS))
+    ap.add_argument("--no_vision", action="store_true")
+    ap.add_argument("--no_micro", action="store_true")
+    ap.add_argument("--tok_s", type=float, default=2000.0, help="Simulated generation speed")
+    ap.add_argument("--latency_s", type=float, default=0.02, help="Simulated time to first token")
+    ap.add_argument("--gen_tokens", type=int, default=128)
+    ap.add_argument("--baseline", default=str(BASELINE_FILE))
+    ap.add_argument("--update_baseline", action="store_true")
+    ap.add_argument("--tolerance", type=float, default=0.3)
+    ap.add_argument("--out", default=None, help="Also write the results JSON here")
+    ap.add_argument("--keep", action="store_true", help="Keep the working directory")
+    args = ap.parse_args(argv)
+
+    cfg = FakeConfig(latency_s=args.latency_s, tok_s=args.tok_s, gen_tokens=args.gen_tokens)
+    workdir = Path(tempfile.mkdtemp(prefix="reviewer_bench_"))
+    results: dict = {"python": sys.version.split()[0], "platform": sys.platform, "scenarios": {}}
+    for name in args.scenarios:
+        print(f"Running {name}...", flush=True)
+        results["scenarios"][name] = bench_scenario(name, workdir, cfg, vision=not args.no_vision)
+    if not args.no_micro:
+        results["micro"] = bench_micro(workdir)
+
+    print(format_results(results))
+    if args.out:
+        Path(args.out).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    failed = [n for n, r in results["scenarios"].items() if r["returncode"] != 0]
+    if failed:
+        print(f"\nFailed scenarios (see logs in {workdir}): {', '.join(failed)}")
+        return 2
+
+    rc = 0
+    baseline_path = Path(args.baseline)
+    if args.update_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"\nBaseline written to {baseline_path}")
+    elif baseline_path.exists():
+        regressions = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print("\nPerformance regressions vs baseline:\n  " + "\n  ".join(regressions))
+            rc = 1
+        else:
+            print("\nNo regressions vs baseline.")
+
+    if not args.keep:
+        import shutil
+        shutil.rmtree(workdir, ignore_errors=True)
+    return rc
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import random
+from pathlib import Path
+
+# Synthetic manuscripts for benchmarks: realistic page density (two dense
+# text blocks per page), section headings, a "Figure N" caption with either an
+# embedded raster image or vector drawing every few pages, and a text table.
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEMO_FIGURES = REPO_ROOT / "demo" / "figures"
+
+SECTIONS = ["Abstract", "Introduction", "Methods", "Results", "Discussion", "References"]
+
+WORDS = (
+    "patients underwent PET/CT imaging with [18F]FDG and the reference standard was histopathology "
+    "sensitivity specificity confidence interval retrospective cohort inclusion criteria exclusion "
+    "readers were blinded the area under the curve was compared using DeLong test p value "
+    "radiopharmaceutical activity administered MBq uptake SUVmax lesion segmentation model validation "
+    "calibration external test set deep learning network trained annotated education residents"
+).split()
+
+def _paragraph(rng: random.Random, n_words: int) -> str:
+    words = [rng.choice(WORDS) for _ in range(n_words)]
+    sentences, cur = [], []
+    for i, w in enumerate(words, 1):
+        cur.append(w)
+        if i % rng.randint(12, 22) == 0:
+            sentences.append(" ".join(cur).capitalize() + ".")
+            cur = []
+    if cur:
+        sentences.append(" ".join(cur).capitalize() + ".")
+    return " ".join(sentences)
+
+def make_manuscript(path: str | Path, pages: int, figure_every: int = 6, seed: int = 7) -> Path:
+    import fitz  # PyMuPDF
+
+    rng = random.Random(seed)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    images = sorted(DEMO_FIGURES.glob("*.png"))
+    doc = fitz.open()
+    fig_no = 0
+    section_every = max(1, pages // len(SECTIONS))
+    for i in range(pages):
+        page = doc.new_page(width=612, height=792)
+        y = 56
+        if i % section_every == 0 and i // section_every < len(SECTIONS):
+            page.insert_text((56, y), SECTIONS[i // section_every], fontsize=14)
+            y += 24
+        has_figure = figure_every and i % figure_every == figure_every - 1
+        text_h = 300 if has_figure else 660
+        page.insert_textbox(fitz.Rect(56, y, 556, y + text_h), _paragraph(rng, 420 if not has_figure else 180), fontsize=9)
+        if has_figure:
+            fig_no += 1
+            box = fitz.Rect(96, y + text_h + 20, 516, y + text_h + 300)
+            if images and fig_no % 2:
+                page.insert_image(box, filename=str(images[fig_no % len(images)]))
+            else:
+                for k in range(12):
+                    h = rng.uniform(20, 240)
+                    page.draw_rect(fitz.Rect(box.x0 + 10 + k * 33, box.y1 - h, box.x0 + 34 + k * 33, box.y1), color=(0, 0, 0), fill=(0.6, 0.6, 0.8))
+                page.draw_line(box.bl, box.br)
+                page.draw_line(box.bl, box.tl)
+            page.insert_text((96, box.y1 + 16), f"Figure {fig_no}. Synthetic figure caption for benchmarking.", fontsize=9)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=100)
+    ap.add_argument("--out", default="outputs/_bench/synthetic_100p.pdf")
+    args = ap.parse_args()
+    print(make_manuscript(args.out, args.pages))
@@ -1,11 +1,15 @@
+import os
 import sys
 import subprocess
 import time
 import shutil
 import urllib.request
 import urllib.error
-import json
+from urllib.parse import urlparse
 import webbrowser
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # --- Configuration ---
@@ -15,18 +19,40 @@ REQUIRED_MODELS = [
     "llama3.3",
 ]
 
+SCIBERT_MODEL = "allenai/scibert_scivocab_uncased"
+
+# Module name -> pip requirement; checked with find_spec so nothing is imported.
+REQUIRED_MODULES = {
+    "streamlit": "streamlit",
+    "fitz": "pymupdf",
+    "docx": "python-docx",
+    "requests": "requests",
+}
+
 REPO_ROOT = Path(__file__).resolve().parent
 
+# Standard library only, so these work before requirements.txt is installed
+sys.path.insert(0, str(REPO_ROOT))
+from reviewer.hosts import daemon_url, ollama_hosts
+from reviewer.registry import get_registry
+
 def log(msg, color="white"):
     print(f"[{time.strftime('%H:%M:%S')}] {msg}")
 
-def is_ollama_running():
+def _host_up(url):
     try:
-        with urllib.request.urlopen("http://localhost:11434/api/tags", timeout=2) as response:
+        with urllib.request.urlopen(f"{url}/api/tags", timeout=2) as response:
             return response.status == 200
-    except urllib.error.URLError:
+    except (urllib.error.URLError, OSError):
         return False
 
+def is_ollama_running():
+    hosts = ollama_hosts()
+    if len(hosts) == 1:
+        return _host_up(hosts[0])
+    with ThreadPoolExecutor(max_workers=len(hosts)) as pool:
+        return any(pool.map(_host_up, hosts))
+
 def wait_for_ollama_seamlessly():
     if is_ollama_running():
         return
@@ -49,27 +75,70 @@ def wait_for_ollama_seamlessly():
     print("") 
     log("✅ Ollama detected! Resuming...")
 
+def _pull_reporter():
+    """Logs each pull's status changes and every 10% of its download, so parallel pulls stay readable."""
+    shown = {}
+    lock = threading.Lock()
+
+    def report(p):
+        step = int((p.fraction or 0) * 10)
+        with lock:
+            if shown.get(p.model) == (p.status, step, p.error):
+                return
+            shown[p.model] = (p.status, step, p.error)
+        if p.error:
+            log(f"FAILED to pull {p.model}: {p.error}")
+        elif p.total and p.status.startswith("pulling"):
+            log(f"{p.model}: {step * 10}% of {p.total / 1e9:.1f} GB")
+        else:
+            log(f"{p.model}: {p.status}")
+    return report
+
 def check_and_pull_models():
     log("Checking AI models...")
-    try:
-        with urllib.request.urlopen("http://localhost:11434/api/tags") as response:
-            data = json.loads(response.read().decode())
-            installed_tags = [m["name"] for m in data.get("models", [])]
-    except Exception as e:
-        log(f"Error talking to Ollama: {e}")
+    registry = get_registry(ollama_hosts())
+    if registry.installed(force=True) is None:
+        log(f"Error talking to Ollama at {', '.join(registry.urls)}.")
         return
 
+    # Exact tags: "llama3.3" is llama3.3:latest, not llama3.3-vision
+    missing = registry.missing(REQUIRED_MODELS)
     for model in REQUIRED_MODELS:
-        found = any(model in tag for tag in installed_tags)
-        if not found:
-            log(f"Model '{model}' is missing. Pulling now (this may take a while)...")
-            try:
-                subprocess.run(["ollama", "pull", model], check=True)
-                log(f"Successfully pulled {model}.")
-            except subprocess.CalledProcessError:
-                log(f"FAILED to pull {model}. Check your internet connection or model name.")
-        else:
+        if model not in missing:
             log(f"Model '{model}' is ready.")
+    if not missing:
+        return
+
+    log(f"Pulling {', '.join(missing)} (this may take a while)...")
+    results = registry.pull_many(missing, _pull_reporter())
+    for model, p in results.items():
+        if not p.error:
+            log(f"Successfully pulled {model}.")
+
+def missing_requirements():
+    return [pip_name for mod, pip_name in REQUIRED_MODULES.items() if importlib.util.find_spec(mod) is None]
+
+def _hf_cache_dirs():
+    dirs = []
+    if os.environ.get("HF_HUB_CACHE"):
+        dirs.append(Path(os.environ["HF_HUB_CACHE"]))
+    if os.environ.get("HF_HOME"):
+        dirs.append(Path(os.environ["HF_HOME"]) / "hub")
+    dirs.append(Path.home() / ".cache" / "huggingface" / "hub")
+    return dirs
+
+def is_scibert_cached(model_name=SCIBERT_MODEL):
+    """Filesystem-only check: a snapshot with a config and weights means no download is needed."""
+    repo_dir = "models--" + model_name.replace("/", "--")
+    weights = ("pytorch_model.bin", "model.safetensors")
+    for cache in _hf_cache_dirs():
+        for snap in (cache / repo_dir / "snapshots").glob("*"):
+            if (snap / "config.json").exists() and any((snap / w).exists() for w in weights):
+                return True
+    # Older sentence-transformers versions kept their own copy
+    st_home = Path(os.environ.get("SENTENCE_TRANSFORMERS_HOME", Path.home() / ".cache" / "torch" / "sentence_transformers"))
+    legacy = st_home / model_name.replace("/", "_")
+    return (legacy / "config.json").exists()
 
 def check_scibert_download():
     """
@@ -77,53 +146,66 @@ def check_scibert_download():
     so the user doesn't think the app is frozen.
     """
     log("Checking SciBERT (Medical AI Brain)...")
-    
-    # We run a tiny python script in a subprocess to check/download
-    check_script = """
+    if is_scibert_cached():
+        log("✅ SciBERT is ready.")
+        return
+
+    log("⚠️ SciBERT missing. Downloading now (approx 440MB)...")
+    download_script = f"""
 import sys
 try:
     from sentence_transformers import SentenceTransformer
-    # This will download if missing, or return instantly if cached
-    model = SentenceTransformer('allenai/scibert_scivocab_uncased')
+    SentenceTransformer('{SCIBERT_MODEL}')
 except Exception as e:
+    print(e)
     sys.exit(1)
 """
     try:
-        # Run the check. If it takes time, the user sees "Checking..."
-        # We capture output to keep it clean, unless it fails.
-        subprocess.run([sys.executable, "-c", check_script], check=True)
-        log("✅ SciBERT is ready.")
+        subprocess.run([sys.executable, "-c", download_script], check=True)
+        log("✅ SciBERT download complete.")
     except subprocess.CalledProcessError:
-        log("⚠️ SciBERT missing. Downloading now (approx 440MB)...")
-        try:
-            # Re-run with output visible so they see progress if possible
-            subprocess.run([sys.executable, "-c", check_script], check=True)
-            log("✅ SciBERT download complete.")
-        except:
-            log("❌ Failed to download SciBERT. The app might crash later.")
+        log("❌ Failed to download SciBERT. The app might crash later.")
+
+def start_reviewer_daemon():
+    """Starts the resident reviewer worker so reviews skip per-run model/import setup."""
+    url = daemon_url()
+    try:
+        with urllib.request.urlopen(f"{url}/health", timeout=1) as response:
+            if response.status == 200:
+                log("✅ Reviewer daemon already running.")
+                return
+    except (urllib.error.URLError, OSError):
+        pass
+
+    log("Starting reviewer daemon...")
+    kwargs = {"cwd": str(REPO_ROOT), "stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if sys.platform == "win32":
+        kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+    # On the port clients will look for; the daemon itself only listens on localhost
+    port = urlparse(url).port
+    subprocess.Popen([sys.executable, "-m", "reviewer.daemon", *(["--port", str(port)] if port else [])], **kwargs)
 
 def main():
     log("--- Local Manuscript Reviewer Launcher ---")
 
-# 1. Check Python Dependencies
-    try:
-        import streamlit
-        import fitz  # pymupdf
-        import docx  # <--- ADD THIS LINE (this triggers the check)
-    except ImportError:
-        log("Installing missing requirements...")
+# 1. Check Python Dependencies (no imports, just a lookup)
+    missing = missing_requirements()
+    if missing:
+        log(f"Installing missing requirements ({', '.join(missing)})...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
 
-    # 2. Check SciBERT (The "Fix" is now here)
-    check_scibert_download()
-
-    # 3. Check Ollama (Seamless)
-    wait_for_ollama_seamlessly()
+    # 2-4. SciBERT, Ollama and models are independent, so check them side by side.
+    #      Ollama stays on the main thread because it may need to prompt the user.
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        scibert = pool.submit(check_scibert_download)
+        wait_for_ollama_seamlessly()
+        check_and_pull_models()
+        scibert.result()
 
-    # 4. Check Models (Auto-Setup)
-    check_and_pull_models()
+    # 5. Keep the review pipeline warm between runs
+    start_reviewer_daemon()
 
-    # 5. Run App (Auto-Launch Browser)
+    # 6. Run App (Auto-Launch Browser)
     log("🚀 Starting User Interface...")
     app_path = REPO_ROOT / "app.py"
     
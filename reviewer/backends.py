@@ -0,0 +1,85 @@
+from __future__ import annotations
+from typing import Protocol
+
+from .ollama import HTTP, HttpTransport, OllamaText, OllamaVLM, Transport, session
+from .openai_compat import OpenAIText, OpenAIVLM, api_root
+
+# Which kind of server the review talks to. Both backends hand out clients
+# with the same surface (generate / analyze_images / last_stats), so the
+# pipeline only chooses a backend once, in reviewer.cli.
+#
+#   ollama  Ollama's native API (default, http://localhost:11434)
+#   openai  any local OpenAI-compatible server, e.g. llama.cpp's llama-server
+#           started with --parallel N for continuous batching across N slots
+
+BACKENDS = ("ollama", "openai")
+DEFAULT_URLS = {"ollama": "http://localhost:11434", "openai": "http://localhost:8080"}
+
+class Backend(Protocol):
+    name: str
+    base_url: str
+    transport: Transport
+
+    def text(self, model: str, **kw): ...
+
+    def vision(self, model: str, **kw): ...
+
+    def embed(self, model: str, inputs: list[str]) -> list[list[float]]: ...
+
+    def list_models(self) -> list[str]: ...
+
+class OllamaBackend:
+    name = "ollama"
+
+    def __init__(self, base_url: str = DEFAULT_URLS["ollama"], transport: Transport = HTTP):
+        self.base_url = base_url.rstrip("/")
+        self.transport = transport
+
+    def text(self, model: str, **kw) -> OllamaText:
+        return OllamaText(model=model, base_url=self.base_url, transport=self.transport, **kw)
+
+    def vision(self, model: str, **kw) -> OllamaVLM:
+        return OllamaVLM(model=model, base_url=self.base_url, transport=self.transport, **kw)
+
+    def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        body = self.transport.post_json(f"{self.base_url}/api/embed", {"model": model, "input": inputs}, 300)
+        return body.get("embeddings") or []
+
+    def list_models(self) -> list[str]:
+        r = session().get(f"{self.base_url}/api/tags", timeout=5)
+        r.raise_for_status()
+        return [m["name"] for m in r.json().get("models", [])]
+
+class OpenAIBackend:
+    name = "openai"
+
+    def __init__(self, base_url: str = DEFAULT_URLS["openai"], transport: Transport | None = None,
+                 api_key: str | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else None
+        self.transport = transport or (HttpTransport(self.headers) if self.headers else HTTP)
+
+    def text(self, model: str, **kw) -> OpenAIText:
+        return OpenAIText(model=model, base_url=self.base_url, transport=self.transport, **kw)
+
+    def vision(self, model: str, **kw) -> OpenAIVLM:
+        return OpenAIVLM(model=model, base_url=self.base_url, transport=self.transport, **kw)
+
+    def embed(self, model: str, inputs: list[str]) -> list[list[float]]:
+        body = self.transport.post_json(f"{api_root(self.base_url)}/embeddings", {"model": model, "input": inputs}, 300)
+        rows = sorted(body.get("data") or [], key=lambda d: d.get("index", 0))
+        return [d["embedding"] for d in rows]
+
+    def list_models(self) -> list[str]:
+        r = session().get(f"{api_root(self.base_url)}/models", timeout=5, headers=self.headers)
+        r.raise_for_status()
+        return [m["id"] for m in r.json().get("data", [])]
+
+def make_backend(api: str, base_url: str | None = None, transport: Transport | None = None,
+                 api_key: str | None = None) -> Backend:
+    url = base_url or DEFAULT_URLS.get(api, DEFAULT_URLS["ollama"])
+    if api == "openai":
+        return OpenAIBackend(url, transport, api_key)
+    if api == "ollama":
+        return OllamaBackend(url, transport or HTTP)
+    raise ValueError(f"Unknown LLM API {api!r}; expected one of {', '.join(BACKENDS)}")
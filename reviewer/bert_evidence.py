@@ -1,5 +1,6 @@
 from __future__ import annotations
 from dataclasses import dataclass
+import functools
 import numpy as np
 from sentence_transformers import SentenceTransformer
 from .rubric import Rubric
@@ -16,6 +17,14 @@ class Evidence:
 class EvidenceExtractor:
     def __init__(self, model_name: str = "allenai/scibert_scivocab_uncased", device: str | None = None):
         self.model = SentenceTransformer(model_name, device=device)
+        self._probe_cache: dict[tuple[str, ...], np.ndarray] = {}
+
+    def _probe_embeddings(self, probes: list[str]) -> np.ndarray:
+        # Rubric probes are fixed, so a resident process encodes them once.
+        key = tuple(probes)
+        if key not in self._probe_cache:
+            self._probe_cache[key] = self.model.encode(probes, convert_to_numpy=True, show_progress_bar=False)
+        return self._probe_cache[key]
 
     @staticmethod
     def _cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
@@ -28,15 +37,20 @@ class EvidenceExtractor:
         sent_emb = self.model.encode(sent_texts, convert_to_numpy=True, show_progress_bar=False)
         out: list[Evidence] = []
         for item in rubric.items:
-            probe_emb = self.model.encode(item.probes, convert_to_numpy=True, show_progress_bar=False)
+            probe_emb = self._probe_embeddings(item.probes)
             sims = self._cosine(probe_emb, sent_emb)
             best = sims.max(axis=0)
             idx = np.argsort(-best)[:top_k]
-            snippets = [f"{sentences[i].pointer} {sent_texts[i][:320].replace('\n',' ')}" for i in idx]
+            snippets = [f"{sentences[i].pointer} {' '.join(sent_texts[i][:320].splitlines())}" for i in idx]
             score = float(best[idx[0]]) if len(idx) else 0.0
             out.append(Evidence(item_id=item.id, label=item.label, severity=item.severity, score=score, snippets=snippets))
         return out
 
+@functools.lru_cache(maxsize=2)
+def get_extractor(model_name: str = "allenai/scibert_scivocab_uncased", device: str | None = None) -> EvidenceExtractor:
+    """Shared extractor, so SciBERT is loaded once per process."""
+    return EvidenceExtractor(model_name=model_name, device=device)
+
 def build_evidence_block(evidence: list[Evidence]) -> str:
     lines: list[str] = []
     for e in evidence:
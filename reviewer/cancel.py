@@ -0,0 +1,190 @@
+from __future__ import annotations
+import json
+import logging
+import signal
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+from .ollama import CALL_WATCHER, HTTP, Transport
+
+# Cancelling a review.
+#
+# The job worker signals the review process (SIGTERM; CTRL_BREAK on Windows).
+# The handler cancels the token and raises Cancelled in the main thread.
+# Cancelling shuts the socket of every request in flight through a
+# CancellableTransport, in any thread, so a blocked read ends at once (a
+# non-streamed vision call can otherwise wait up to its 1800 s timeout), and
+# streamed responses also stop at the next chunk. Dropping the connection is
+# what makes Ollama and llama-server stop generating. The process then marks
+# its partial outputs, unloads the models when asked to (keep_alive 0), and
+# exits without waiting for vision threads.
+#
+# In the resident daemon there is no signal: /cancel sets the run's token,
+# which drops the connections the same way.
+
+EXIT_CANCELLED = 130
+MARKER_FILE = "CANCELLED.json"
+
+class Cancelled(BaseException):
+    """The review was cancelled; partial outputs are marked, not deleted.
+
+    A BaseException, like KeyboardInterrupt, so stage-level `except Exception`
+    fallbacks do not swallow it.
+    """
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.RLock()  # re-entrant: cancel() also runs from a signal handler
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """Returns False if it was already cancelled."""
+        with self._lock:
+            if self._event.is_set():
+                return False
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                logging.info(f"Cancel callback failed: {e}")
+        return True
+
+    def on_cancel(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Calls fn when cancelled (at once if it already is); returns a function that unregisters it."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return lambda: self._discard(fn)
+        fn()
+        return lambda: None
+
+    def _discard(self, fn: Callable[[], None]) -> None:
+        with self._lock:
+            if fn in self._callbacks:
+                self._callbacks.remove(fn)
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise Cancelled(self.reason)
+
+class _CallWatcher:
+    """The connections one call has used; cancelling the token shuts their sockets."""
+
+    def __init__(self, token: CancelToken):
+        self.token = token
+        self.conns: list = []
+        self.unregister = token.on_cancel(self.drop)
+
+    def watch(self, conn) -> None:
+        self.conns.append(conn)
+        if self.token.cancelled:
+            self.drop()
+
+    def check(self) -> None:
+        self.token.check()
+
+    def drop(self) -> None:
+        for conn in list(self.conns):
+            sock = getattr(conn, "sock", None)
+            if sock is None:
+                continue
+            try:
+                sock.shutdown(socket.SHUT_RDWR)  # unlike close(), wakes a thread blocked reading it
+            except OSError:
+                pass
+
+    @contextmanager
+    def active(self):
+        reset = CALL_WATCHER.set(self)
+        try:
+            yield
+        finally:
+            CALL_WATCHER.reset(reset)
+
+class CancellableTransport:
+    """Wraps a Transport so no call starts, none runs on, and no stream continues, once the token is cancelled."""
+
+    def __init__(self, inner: Transport, token: CancelToken):
+        self.inner = inner
+        self.token = token
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict:
+        self.token.check()
+        watcher = _CallWatcher(self.token)
+        try:
+            with watcher.active():
+                body = self.inner.post_json(url, payload, timeout)
+        finally:
+            watcher.unregister()
+        self.token.check()
+        return body
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]:
+        self.token.check()
+        watcher = _CallWatcher(self.token)
+        stream = self.inner.post_stream(url, payload, timeout)
+        try:
+            while True:
+                with watcher.active():
+                    chunk = next(stream, None)
+                if chunk is None:
+                    return
+                self.token.check()
+                yield chunk
+        finally:
+            stream.close()  # closes the HTTP response, so the server stops generating
+            watcher.unregister()
+
+def install_signal_handlers(token: CancelToken) -> None:
+    """SIGTERM/SIGINT (and SIGBREAK on Windows) cancel the run; call from the main thread."""
+
+    def handler(signum, frame):
+        if token.cancel(f"received {signal.Signals(signum).name}"):
+            raise Cancelled(token.reason)
+
+    for name in ("SIGTERM", "SIGINT", "SIGBREAK"):
+        if hasattr(signal, name):
+            signal.signal(getattr(signal, name), handler)
+
+def unload_models(base_urls: list[str], models: list[str], timeout: float = 5.0) -> None:
+    """Asks each Ollama host to drop the models now (keep_alive 0) instead of after their idle timeout.
+
+    Sent concurrently and bounded by `timeout` overall, so cancelling stays within the worker's grace period.
+    """
+
+    def unload(url: str, model: str) -> None:
+        try:
+            HTTP.post_json(f"{url}/api/generate", {"model": model, "keep_alive": 0}, timeout)
+            logging.info(f"Unloaded {model} on {url}.")
+        except Exception as e:
+            logging.info(f"Could not unload {model} on {url}: {e}")
+
+    threads = [
+        threading.Thread(target=unload, args=(url, model), daemon=True)
+        for url in base_urls
+        for model in dict.fromkeys(m for m in models if m)
+    ]
+    for t in threads:
+        t.start()
+    deadline = time.time() + timeout
+    for t in threads:
+        t.join(max(0.0, deadline - time.time()))
+
+def write_marker(out_dir: Path, reason: str, stage: str | None = None) -> Path:
+    """CANCELLED.json next to the partial outputs, so nothing mistakes them for a finished review."""
+    path = Path(out_dir) / MARKER_FILE
+    path.write_text(json.dumps({"reason": reason, "stage": stage, "ts": time.time()}), encoding="utf-8")
+    return path
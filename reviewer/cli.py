@@ -1,48 +1,98 @@
 import argparse
+import functools
+import json
 import logging
 import sys
 import os
+import threading
+import urllib.error
+import urllib.request
+from dataclasses import asdict
 from pathlib import Path
-import fitz  # PyMuPDF
 
 # Add repo root to path to find sibling modules
 sys.path.append(str(Path(__file__).parent.parent))
 
 # --- IMPORT YOUR CUSTOM BRAINS ---
 try:
-    from reviewer.ollama import OllamaText, OllamaVLM
-    from reviewer.ingest import load_manuscript
+    from reviewer.backends import BACKENDS, DEFAULT_URLS, Backend, make_backend
+    from reviewer.ollama import HTTP, HttpTransport
+    from reviewer.hosts import DEFAULT_DAEMON_URL, PoolTransport, daemon_url, get_pool, ollama_hosts, parse_hosts
+    from reviewer.ingest import load_manuscript, tables_markdown
+    from reviewer.progress import PROGRESS_FILE, ProgressReporter
+    from reviewer.metrics import RunMetrics
+    from reviewer.replay import ARCHIVE_FILE, ReplayTransport, make_transport
+    from reviewer.cancel import (
+        EXIT_CANCELLED, Cancelled, CancellableTransport, CancelToken, install_signal_handlers, unload_models,
+        write_marker,
+    )
+    from reviewer.equator_cache import match_guidelines
+    from reviewer.nomenclature import check_nomenclature, format_findings
+    from reviewer.numeric_checks import check_numbers, format_discrepancies
+    from reviewer.prompting import excerpt, fill_template
+    from reviewer.context import (
+        FALLBACK_MAX_CTX, SAFETY_TOKENS, TokenEstimator, image_tokens, model_context_limit, model_show, plan_context,
+        plan_for_prompt, vision_prompt_rate,
+    )
+    from reviewer.reasoning import BUDGET_MARK, THINK_CHOICES, THINKING_FILE, is_thinking_model
+    from reviewer.pdf_images import VisionBudget
+    from reviewer.docx_media import caption_label, extract_docx_figures
+    from reviewer.resources import fits_now, is_oom_error
+    from reviewer.critique import (
+        CRITIQUE_FILE, CRITIQUE_SCHEMA, SECTIONS, for_writer, from_dict, parse_critique, parse_sections,
+        Critique, load_json, sections_schema, with_json_output,
+    )
+    from reviewer.revision import (
+        NOTES_FILE, build_index, diff_manuscripts, file_hash, for_revision_writer, load_previous, merge_revision,
+        open_points, points_to_check, render_points, revision_schema, save_index, status_counts,
+    )
 except ImportError as e:
     print(f"❌ CRITICAL IMPORT ERROR: {e}")
     print("Ensure 'ollama.py' and 'ingest.py' are in the 'reviewer' folder.")
     sys.exit(1)
 
-def setup_logging(output_dir: Path):
-    log_file = output_dir / "run_log.txt"
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s [%(levelname)s] %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding='utf-8'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(message)s"
+
+def setup_logging(output_dir: Path, this_thread_only: bool = False) -> logging.Handler:
+    """Adds a run_log.txt handler for this run and returns it so it can be removed.
+
+    The daemon runs several reviews in one process, so there each run's file
+    handler only accepts records from the thread that is running it.
+    """
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    if not any(type(h) is logging.StreamHandler for h in root.handlers):
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(console)
 
-def extract_images_local(pdf_path: Path, output_dir: Path, dpi=200):
-    """Fallback image extractor if pdf_images.py is not configured"""
+    handler = logging.FileHandler(output_dir / "run_log.txt", encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if this_thread_only:
+        ident = threading.get_ident()
+        handler.addFilter(lambda record: record.thread == ident)
+    root.addHandler(handler)
+    return handler
+
+def extract_images_local(pdf_path: Path, output_dir: Path, dpi=200, tables=(), budget=None, page_text=None):
+    """Renders the best-scoring figure pages within the vision budget; table-only pages are skipped.
+
+    Returns (image paths, the chosen PageScores).
+    """
+    import fitz  # PyMuPDF; imported here so thin-client runs never load it
+    from reviewer.pdf_images import select_figure_pages
     output_dir.mkdir(parents=True, exist_ok=True)
     doc = fitz.open(pdf_path)
     image_paths = []
-    
-    # Scan first 10 pages to save time
-    for i, page in enumerate(doc):
-        if i >= 10: break
+    chosen = select_figure_pages(doc, tables, budget, page_text, dpi=dpi)
+    for s in chosen:
         # Render page as image (simpler than object extraction for Vision models)
-        pix = page.get_pixmap(dpi=dpi)
-        out_path = output_dir / f"page_{i+1}.png"
+        pix = doc.load_page(s.index).get_pixmap(dpi=dpi)
+        out_path = output_dir / f"page_{s.index+1}.png"
         pix.save(out_path)
         image_paths.append(str(out_path))
-    return image_paths
+    return image_paths, chosen
 
 def load_template(name: str) -> str:
     """Finds and loads a template from config/prompts"""
@@ -51,13 +101,39 @@ def load_template(name: str) -> str:
     prompt_path = base / "config" / "prompts" / f"{name}.txt"
     
     if prompt_path.exists():
-        return prompt_path.read_text(encoding="utf-8")
+        # Keyed on mtime so a long-lived daemon still picks up template edits
+        return _read_template(prompt_path, prompt_path.stat().st_mtime_ns)
     
     # Fallback default if file is missing
     logging.warning(f"⚠️ Template {name}.txt not found. Using default.")
     return f"Please review the following input based on {name}."
 
-def main():
+@functools.lru_cache(maxsize=64)
+def _read_template(path: Path, mtime_ns: int) -> str:
+    return path.read_text(encoding="utf-8")
+
+def _llm_urls(api: str, value: str | None) -> list[str]:
+    if value:
+        return parse_hosts(value)
+    if api == "openai":
+        return [os.environ.get("OPENAI_BASE_URL", "").strip().rstrip("/") or DEFAULT_URLS["openai"]]
+    return ollama_hosts()
+
+def _keep_alive(value: str):
+    # Ollama reads bare numbers as seconds and strings as Go durations ("30m").
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+def _sections(value: str) -> list[str]:
+    names = [s.strip().lower() for s in value.split(",") if s.strip()]
+    unknown = [s for s in names if s not in SECTIONS]
+    if unknown or not names:
+        raise argparse.ArgumentTypeError(f"unknown section(s) {', '.join(unknown) or value!r}; choose from {', '.join(SECTIONS)}")
+    return names
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Custom Manuscript Reviewer CLI")
     
     # Core Arguments
@@ -74,93 +150,704 @@ def main():
     parser.add_argument("--writer_model", required=True, type=str)
     parser.add_argument("--vlm_model", type=str, default=None)
     parser.add_argument("--fig_dpi", type=int, default=200)
+    parser.add_argument("--vision_pages", type=int, default=10,
+                        help="Most pages sent to the VLM; pages are ranked by how likely they carry a figure.")
+    parser.add_argument("--vision_megapixels", type=float, default=None,
+                        help="Cap on the total rendered pixels sent to the VLM (megapixels).")
+    parser.add_argument("--vision_budget_s", type=float, default=None,
+                        help="Cap on the estimated VLM prompt time, from this model's past vision speed "
+                             "in --metrics_history.")
     parser.add_argument("--temperature", type=float, default=0.2)
+    parser.add_argument("--llm_api", choices=BACKENDS, default="ollama",
+                        help="'ollama' (native API) or 'openai' for a local OpenAI-compatible server such as llama-server.")
+    parser.add_argument("--ollama_url", "--llm_url", dest="ollama_url", type=str, default=None,
+                        help=f"Server base URL; several comma-separated Ollama URLs are load-balanced "
+                             f"(default: $OLLAMA_HOSTS, $OLLAMA_HOST or {DEFAULT_OLLAMA_URL}; "
+                             f"$OPENAI_BASE_URL or {DEFAULT_URLS['openai']} with --llm_api openai).")
+    parser.add_argument("--api_key", type=str, default=None,
+                        help="Bearer token for --llm_api openai (default: $OPENAI_API_KEY; local servers rarely need one).")
+    parser.add_argument("--llm_slots", type=int, default=1,
+                        help="Concurrent requests the server can batch (llama-server --parallel, OLLAMA_NUM_PARALLEL); "
+                             "page images are split across this many vision calls.")
+    parser.add_argument("--num_ctx", type=int, default=None,
+                        help="Fixed context window for every model; by default it is sized from the prompt.")
+    parser.add_argument("--max_ctx", type=int, default=None,
+                        help="Upper bound for the automatic context size (default: the model's own limit).")
+    parser.add_argument("--critic_fallback", type=str, default=None,
+                        help="Smaller critic model to switch to when --critic_model runs out of memory "
+                             "(or clearly cannot fit in free memory on a local Ollama).")
+    parser.add_argument("--writer_fallback", type=str, default=None,
+                        help="Same as --critic_fallback, for the writer.")
+    parser.add_argument("--critic_format", choices=["text", "json"], default="text",
+                        help="'json' makes the critic answer in a fixed schema (issues by section with severity, "
+                             f"pointer, evidence, fix), saved as <out>/{CRITIQUE_FILE}; the writer then gets a compact "
+                             "rendering instead of the whole free-text Issue Log.")
+    parser.add_argument("--regenerate_sections", type=_sections, default=None,
+                        help=f"Comma-separated critique sections to ask the critic for again, keeping the rest of "
+                             f"<out>/{CRITIQUE_FILE} from an earlier --critic_format json run; then rewrites the review.")
+    parser.add_argument("--previous_run", type=str, default=None,
+                        help="Output folder of the review of the previous version (R1, R2, ...): only changed "
+                             "sections and figures are critiqued, earlier points are marked addressed or not, and "
+                             "the writer produces a response-to-revision review. The critic answers in JSON.")
+    parser.add_argument("--num_predict", type=int, default=3500,
+                        help="Maximum tokens the critic/writer may generate (besides reasoning, see --think_budget).")
+    parser.add_argument("--think", choices=list(THINK_CHOICES), default="auto",
+                        help="Reasoning models (deepseek-r1): 'on' asks Ollama >= 0.9 for the trace in a separate field, "
+                             "'off' asks it to skip reasoning, 'auto' leaves the model's default. The trace is saved "
+                             f"as <out>/{THINKING_FILE.format(stage='<stage>')} and never passed to the writer.")
+    parser.add_argument("--think_budget", type=int, default=4096,
+                        help="Reasoning tokens a thinking model may use before it is stopped and asked to answer "
+                             "from its reasoning so far; 0 for no limit.")
+    parser.add_argument("--unload_on_cancel", action="store_true",
+                        help="When the review is cancelled, unload its models from Ollama (keep_alive 0) "
+                             "instead of leaving them resident until their idle timeout.")
+    parser.add_argument("--keep_alive", type=_keep_alive, default=None,
+                        help="How long Ollama keeps models loaded after a call, e.g. '30m' or '-1'.")
+
+    # Record/replay of model calls
+    parser.add_argument("--backend", choices=["live", "record", "replay"], default="live",
+                        help="'record' archives every model call; 'replay' serves calls from an archive "
+                             "and only sends requests it has not seen to the server.")
+    parser.add_argument("--replay_archive", type=str, default=None,
+                        help=f"Archive to write/read (default: <out>/{ARCHIVE_FILE}).")
+    parser.add_argument("--replay_timing", action="store_true",
+                        help="When replaying, reproduce the recorded latencies.")
+    parser.add_argument("--replay_strict", action="store_true",
+                        help="When replaying, fail instead of calling the server on an unrecorded request.")
+
+    # Progress side channel (JSON lines) read by the app
+    parser.add_argument("--progress_file", type=str, default=None,
+                        help=f"Where to write JSON progress events (default: <out>/{PROGRESS_FILE}).")
+
+    # Metrics (metrics.json is always written to --out)
+    parser.add_argument("--metrics_history", type=str, default=None,
+                        help="Append this run's metrics as one JSON line to this file.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile our own Python work per stage (CPU by function, Python memory peak, I/O) "
+                             "into <out>/profile.md and a flame graph stack file, <out>/profile.folded. "
+                             "Always runs in this process.")
+
+    # Resident worker (reviewer.daemon)
+    parser.add_argument("--daemon", type=str, default="auto",
+                        help=f"'auto' uses a running reviewer daemon at $REVIEWER_DAEMON_URL (default {DEFAULT_DAEMON_URL}) "
+                             "if there is one; 'off' always runs in this process; or give the daemon URL.")
+    return parser
+
+def _daemon_url(choice: str) -> str | None:
+    if choice == "off":
+        return None
+    url = daemon_url() if choice == "auto" else choice
+    try:
+        with urllib.request.urlopen(f"{url}/health", timeout=0.3) as r:
+            return url if r.status == 200 else None
+    except (urllib.error.URLError, OSError):
+        if choice != "auto":
+            print(f"⚠️ Reviewer daemon at {url} is not reachable; running in this process.")
+        return None
+
+def run_via_daemon(url: str, argv: list[str], args) -> int:
+    """Hands the review to the resident daemon and relays its progress events."""
+    # The daemon has its own working directory, so send absolute paths.
+    # Both the "--flag value" and the "--flag=value" forms.
+    argv = list(argv)
+    paths = {flag: getattr(args, flag.lstrip("-"))
+             for flag in ("--input", "--out", "--progress_file", "--metrics_history", "--replay_archive", "--previous_run")}
+    for i, arg in enumerate(argv):
+        flag, eq, _ = arg.partition("=")
+        if not paths.get(flag):
+            continue
+        resolved = str(Path(paths[flag]).resolve())
+        if eq:
+            argv[i] = f"{flag}={resolved}"
+        elif i + 1 < len(argv):
+            argv[i + 1] = resolved
+    req = urllib.request.Request(
+        f"{url}/review",
+        data=json.dumps({"argv": argv}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    print(f"Submitting review to daemon at {url}...")
+    status = "error"
+    with urllib.request.urlopen(req, timeout=None) as r:
+        for raw in r:
+            ev = json.loads(raw)
+            kind = ev.get("event")
+            if kind == "stage_start":
+                print(f"[daemon] {ev.get('stage')} started {ev.get('detail') or ''}".rstrip())
+            elif kind == "stage_end":
+                print(f"[daemon] {ev.get('stage')} finished in {ev.get('seconds')}s")
+            elif kind == "log":
+                print(ev.get("message", ""))
+            elif kind == "end":
+                status = ev.get("status", "error")
+                if ev.get("error"):
+                    print(f"❌ {ev['error']}")
+    if status == "ok":
+        print("Review completed successfully.")
+    if status == "cancelled":
+        return EXIT_CANCELLED
+    return 0 if status == "ok" else 1
+
+def cancel_daemon_run(url: str, out_dir: str) -> None:
+    """Tells the daemon to stop the review writing to out_dir; it marks and cleans up itself."""
+    req = urllib.request.Request(
+        f"{url}/cancel",
+        data=json.dumps({"out": str(Path(out_dir).resolve())}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=5):
+            pass
+    except (urllib.error.URLError, OSError) as e:
+        print(f"⚠️ Could not reach the reviewer daemon to cancel: {e}")
+
+def main(argv: list[str] | None = None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.previous_run and args.regenerate_sections:
+        parser.error("--previous_run and --regenerate_sections cannot be combined.")
+
+    token = CancelToken()
+    install_signal_handlers(token)
+    # The daemon runs other reviews alongside, so a profile there would mix them
+    daemon = None if args.profile else _daemon_url(args.daemon)
+    if daemon:
+        try:
+            sys.exit(run_via_daemon(daemon, argv, args))
+        except Cancelled:
+            print("🚫 Cancelling the review on the daemon...")
+            cancel_daemon_run(daemon, args.out)
+            sys.exit(EXIT_CANCELLED)
+        except (urllib.error.URLError, ConnectionError) as e:
+            print(f"⚠️ Lost the reviewer daemon ({e}); running in this process.")
 
-    args = parser.parse_args()
-    
     pdf_path = Path(args.input)
     out_dir = Path(args.out)
     out_dir.mkdir(parents=True, exist_ok=True)
     setup_logging(out_dir)
 
+    progress = ProgressReporter(args.progress_file or out_dir / PROGRESS_FILE)
+    try:
+        execute(args, pdf_path, out_dir, progress, token)
+    except Cancelled:
+        print("🚫 Review cancelled.")
+        sys.stdout.flush()
+        logging.shutdown()
+        # Vision threads may still be blocked on the server; exiting closes their sockets.
+        os._exit(EXIT_CANCELLED)
+
+def execute(args, pdf_path: Path, out_dir: Path, progress: ProgressReporter, cancel: CancelToken | None = None) -> None:
+    """Runs the pipeline, always closing the progress stream and writing metrics.json."""
+    metrics = RunMetrics(run={
+        "input": pdf_path.name,
+        "critic_model": args.critic_model,
+        "writer_model": args.writer_model,
+        "vlm_model": args.vlm_model,
+        "fig_dpi": args.fig_dpi,
+        "vision_max_pages": args.vision_pages,
+        "vision_megapixels": args.vision_megapixels,
+        "vision_budget_s": args.vision_budget_s,
+        "temperature": args.temperature,
+    })
+    if args.profile:
+        from reviewer.profiling import StageProfiler
+        metrics.profiler = StageProfiler().start()
+    error = None
+    try:
+        run_review(args, pdf_path, out_dir, progress, metrics, cancel)
+        metrics.status = "ok"
+    except SystemExit as e:
+        metrics.status = "error" if e.code else "ok"
+        raise
+    except Cancelled as e:
+        metrics.status = "cancelled"
+        error = str(e) or "cancelled"
+        logging.warning(f"🚫 Review cancelled during {progress.current or 'setup'} ({error}).")
+        write_marker(out_dir, error, progress.current)
+        if args.unload_on_cancel and args.llm_api == "ollama":
+            unload_models(_llm_urls(args.llm_api, args.ollama_url), [args.critic_model, args.writer_model, args.vlm_model])
+        raise
+    except BaseException as e:
+        metrics.status = "error"
+        error = str(e)
+        logging.error(f"Review failed: {e}")
+        raise
+    finally:
+        if metrics.profiler:
+            metrics.profiler.stop()
+            metrics.run["profile"] = metrics.profiler.write(out_dir).name
+        metrics.write(out_dir)
+        if args.metrics_history:
+            metrics.append_history(args.metrics_history)
+        if error:
+            progress.end(metrics.status, error=error)
+        else:
+            progress.end(metrics.status)
+
+def intake_text(args) -> str:
+    return f"Type: {args.manuscript_type}\nDesign: {args.study_design}\nAI Study: {args.has_ai}"
+
+def prompt_values(args, vision_context: str = "", checks: dict[str, str] | None = None) -> dict[str, str]:
+    """Values for the {placeholders} in critic_prompt.txt / writer_prompt.txt.
+
+    `checks` carries the outputs of the local deterministic checks (e.g. nomenclature_findings).
+    """
+    original = args.manuscript_type in ("original_research", "Original Research")
+    return {
+        "canvas_core": load_template("canvas_core"),
+        "intake": intake_text(args),
+        # Mapping lookup, not a model call; see reviewer/equator_cache.py
+        "guidelines_selected": match_guidelines(args.study_design, args.has_ai).to_prompt(),
+        "figure_notes": vision_context,
+        "reviewer_template_excerpt": excerpt(load_template("reviewer_template_original_research")) if original else "(not applicable)",
+        **(checks or {}),
+    }
+
+def build_critic_input(critic_template: str, full_text: str, args, vision_context: str,
+                       checks: dict[str, str] | None = None) -> str:
+    # Fill the {placeholders} before the manuscript goes in, so braces in the
+    # manuscript text are never mistaken for template fields.
+    critic_template = fill_template(critic_template, prompt_values(args, vision_context, checks))
+
+    # Legacy {{...}} templates; append the text if {{TEXT}} isn't found
+    if "{{TEXT}}" in critic_template:
+        critic_input = critic_template.replace("{{TEXT}}", full_text)
+    else:
+        critic_input = f"{critic_template}\n\n### MANUSCRIPT ###\n{full_text}"
+        
+    # Inject Metadata
+    critic_input = critic_input.replace("{{METADATA}}", intake_text(args))
+    
+    # Inject Vision
+    return critic_input.replace("{{VISION}}", vision_context)
+
+def build_writer_input(writer_template: str, critique: str, values: dict[str, str] | None = None) -> str:
+    if "{issue_log}" in writer_template:
+        return fill_template(writer_template, {**(values or {}), "issue_log": critique})
+    writer_template = fill_template(writer_template, values or {})
+    if "{{CRITIQUE}}" in writer_template:
+        return writer_template.replace("{{CRITIQUE}}", critique)
+    return f"{writer_template}\n\n### CRITIQUE NOTES ###\n{critique}"
+
+# VLM replies are short figure notes; this is what the vision context reserves.
+VISION_NUM_PREDICT = 2048
+
+def _ctx_limit(args, backend: Backend, model: str) -> int | None:
+    # OpenAI-compatible servers fix the context at launch and do not report it
+    # per model, so there --max_ctx (the per-slot context) is the only bound.
+    limit = model_context_limit(backend.base_url, model, backend.transport) if backend.name == "ollama" else None
+    if args.max_ctx:
+        limit = min(limit, args.max_ctx) if limit else args.max_ctx
+    return limit
+
+def plan_text_call(args, backend: Backend, client, template_only: str, body: str, label: str, metrics: RunMetrics) -> str:
+    """Sizes client.num_ctx for template + body; returns body, shortened if it had to be."""
+    if args.num_ctx:
+        client.num_ctx = args.num_ctx
+        return body
+    estimator = TokenEstimator.calibrated(client.model, args.metrics_history)
+    body, plan = plan_for_prompt(estimator.count(template_only), body, client.num_predict + (client.think_budget or 0),
+                                 _ctx_limit(args, backend, client.model), estimator, label)
+    client.num_ctx = plan.num_ctx
+    metrics.run.setdefault("context", {})[label.lower()] = asdict(plan)
+    return body
+
+def run_text_stage(args, backend: Backend, label: str, model: str, fallback: str | None,
+                   build, body: str, progress: ProgressReporter, metrics: RunMetrics, schema: dict | None = None) -> str:
+    """Plans and runs one critic/writer call; `build(body)` returns the full prompt.
+
+    With a `schema`, the server constrains the reply to that JSON schema.
+
+    With a fallback model, a call that fails for lack of memory is retried once
+    on it, and on a local Ollama a model that clearly cannot fit is swapped
+    before it is loaded; swapping would make it ~10x slower rather than fail.
+    """
+    stage = label.lower()
+    # Free memory only says something when the one Ollama is on this machine
+    preflight = backend.name == "ollama" and args.backend == "live" and len(_llm_urls(args.llm_api, args.ollama_url)) == 1
+    while True:
+        client = backend.text(model, temperature=args.temperature, num_predict=args.num_predict, keep_alive=args.keep_alive)
+        client.format = schema
+        show = model_show(backend.base_url, model, backend.transport) if backend.name == "ollama" else None
+        if is_thinking_model(show, model):
+            # Ollama rejects `think` for models that cannot think, so it is only sent to those that can
+            client.think = THINK_CHOICES[args.think]
+            if args.think_budget and args.think != "off":
+                client.think_budget = args.think_budget
+        prompt = build(plan_text_call(args, backend, client, build(""), body, label, metrics))
+        if fallback and preflight and fits_now(backend.base_url, model, client.num_ctx) is False:
+            logging.warning(f"⚠️ {label}: {model} does not fit in free memory with num_ctx={client.num_ctx}; using {fallback}.")
+            metrics.run.setdefault("fallback", {})[stage] = {"from": model, "to": fallback, "reason": "memory"}
+            model, fallback = fallback, None
+            continue
+        try:
+            with metrics.stage(stage):
+                expected = client.num_predict + (client.think_budget or 0)
+                text = client.generate(prompt, on_tokens=progress.token_callback(stage, expected))
+        except Exception as e:
+            if not fallback or not is_oom_error(e):
+                raise
+            logging.warning(f"⚠️ {label}: {model} ran out of memory ({e}); retrying with {fallback}.")
+            metrics.run.setdefault("fallback", {})[stage] = {"from": model, "to": fallback, "reason": "oom"}
+            model, fallback = fallback, None
+            continue
+        # After a thinking-budget cut there are two calls; each is recorded with its own prompt size
+        for chars, stats in client.last_calls or [(len(prompt), client.last_stats)]:
+            metrics.record_llm(stage, client.model, stats, chars)
+        if client.last_thinking:
+            save_thinking(args, stage, client.last_thinking, metrics)
+        if not text.strip():
+            # Only the answer goes downstream, never the reasoning in its place
+            logging.error(f"{label}: {model} returned no answer" + (
+                f" after {len(client.last_thinking)} characters of reasoning (saved to "
+                f"{THINKING_FILE.format(stage=stage)}); raise --num_predict or --think_budget, or use --think off."
+                if client.last_thinking else "."))
+            sys.exit(1)
+        return text
+
+def save_thinking(args, stage: str, trace: str, metrics: RunMetrics) -> None:
+    """The reasoning trace goes to its own file; later calls of the same stage append to it."""
+    thinking = metrics.run.setdefault("thinking", {})
+    path = Path(args.out) / THINKING_FILE.format(stage=stage)
+    with open(path, "a" if stage in thinking else "w", encoding="utf-8") as f:
+        f.write(trace + "\n\n")
+    info = thinking.setdefault(stage, {"file": path.name, "chars": 0, "budget_reached": False})
+    info["chars"] += len(trace)
+    info["budget_reached"] = info["budget_reached"] or BUDGET_MARK in trace
+
+def run_structured_critic(args, backend: Backend, critic_template: str, full_text: str, vision_context: str,
+                          checks: dict[str, str], out_dir: Path, progress: ProgressReporter, metrics: RunMetrics) -> str:
+    """Critic in JSON (reviewer/critique.py); returns the compact Issue Log for the writer.
+
+    Sections lost to a cut-off reply, or named in --regenerate_sections, are
+    asked for in a second, narrower call instead of re-running the whole critic.
+    """
+    saved = out_dir / CRITIQUE_FILE
+
+    def ask(names: tuple[str, ...]) -> str:
+        template = with_json_output(critic_template, names)
+        schema = CRITIQUE_SCHEMA if names == SECTIONS else sections_schema(names)
+        return run_text_stage(
+            args, backend, "Critic", args.critic_model, args.critic_fallback,
+            lambda text: build_critic_input(template, text, args, vision_context, checks),
+            full_text, progress, metrics, schema,
+        )
+
+    repaired = False
+    if args.regenerate_sections:
+        if not saved.exists():
+            logging.error(f"--regenerate_sections needs {saved} from an earlier --critic_format json run.")
+            sys.exit(1)
+        critique, _ = from_dict(json.loads(saved.read_text(encoding="utf-8")))
+        missing = args.regenerate_sections
+    else:
+        raw = ask(SECTIONS)
+        critique, missing, repaired = parse_critique(raw)
+        if critique is None:
+            logging.warning("⚠️ Critic: the reply was not JSON; passing it to the writer as free text.")
+            metrics.run["critique"] = {"format": "text", "parsed": False}
+            return raw
+    if missing:
+        logging.info(f"Critic: asking again for {', '.join(missing)}" + (" (the reply was cut off)." if repaired else "."))
+        part = parse_sections(ask(tuple(missing)), missing)
+        critique.sections.update(part)
+        lost = [s for s in missing if s not in part]
+        if lost:
+            logging.warning(f"⚠️ Critic: no usable output for {', '.join(lost)}.")
+    saved.write_text(json.dumps(critique.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+    issue_log = for_writer(critique)
+    metrics.run["critique"] = {
+        "format": "json", "repaired": repaired, "asked_again": list(missing),
+        "issues": len(critique.issues), "writer_chars": len(issue_log),
+    }
+    return issue_log
+
+def run_revision_critic(args, backend: Backend, previous, diff, vision_context: str, figures_changed: int,
+                        checks: dict[str, str], out_dir: Path, progress: ProgressReporter, metrics: RunMetrics) -> str:
+    """Critic on the changes since the previous version (reviewer/revision.py); returns the log for the writer."""
+    prior = previous.critique
+    points = open_points(prior) if prior else []
+    asked = diff.critique_sections(bool(figures_changed))
+    reply = None
+    if asked:
+        shown = points_to_check(points, asked)
+        values = {
+            # A free-text previous critique cannot be split by section, so the critic gets all of it
+            "prior_points": render_points(shown) if prior else (previous.critique_text or "(none)"),
+            "sections": ", ".join(asked),
+        }
+        template = load_template("revision_critic_prompt")
+        raw = run_text_stage(
+            args, backend, "Critic", args.critic_model, args.critic_fallback,
+            lambda text: build_critic_input(template, text, args, vision_context, {**checks, **values}),
+            diff.render(), progress, metrics, revision_schema([pid for pid, _, _ in shown], asked),
+        )
+        reply, _ = load_json(raw)
+        if not isinstance(reply, dict):
+            logging.warning("⚠️ Critic: the revision reply was not JSON; previous points are left unaddressed.")
+    else:
+        logging.info("Critic: no text, table or figure changes since the previous version; skipping the critic.")
+    # Without a structured prior the previous free text is carried forward whole, even when the critic is skipped
+    merged, summary = merge_revision(prior or Critique(), points, reply, asked,
+                                     "" if prior else previous.critique_text)
+    (out_dir / CRITIQUE_FILE).write_text(json.dumps(merged.to_dict(), indent=2, ensure_ascii=False), encoding="utf-8")
+    issue_log = for_revision_writer(merged, summary, diff, figures_changed)
+    metrics.run["revision"] = {
+        "previous_run": str(previous.folder), "diff": diff.summary(), "sectioned": diff.sectioned,
+        "critic_sections": asked, "critic_input_chars": len(diff.render()) if asked else 0,
+        "figures_changed": figures_changed, "points": status_counts(merged),
+    }
+    return issue_log
+
+def plan_vision_call(args, backend: Backend, vlm, prompt: str, image_paths: list, metrics: RunMetrics,
+                     key: str = "vision") -> list:
+    """Sizes vlm.num_ctx for the prompt plus image tokens, dropping trailing images that cannot fit."""
+    if args.num_ctx:
+        vlm.num_ctx = args.num_ctx
+        return image_paths
+    limit = _ctx_limit(args, backend, vlm.model) or FALLBACK_MAX_CTX
+    room = limit - VISION_NUM_PREDICT - SAFETY_TOKENS
+    tokens = TokenEstimator().count(prompt)
+    kept = []
+    for p in image_paths:
+        t = image_tokens(p)
+        if kept and tokens + t > room:
+            logging.warning(f"⚠️ Vision: context limit reached; skipping {len(image_paths) - len(kept)} of {len(image_paths)} page image(s).")
+            break
+        kept.append(p)
+        tokens += t
+    plan = plan_context(tokens, VISION_NUM_PREDICT, limit)
+    vlm.num_ctx = plan.num_ctx
+    metrics.run.setdefault("context", {})[key] = asdict(plan)
+    logging.info(f"Vision: ~{tokens} prompt tokens for {len(kept)} image(s) -> num_ctx={plan.num_ctx}")
+    return kept
+
+def _batches(items: list, n: int) -> list[list]:
+    """Splits items into at most n contiguous, near-equal batches."""
+    n = max(1, min(n, len(items)))
+    size, extra = divmod(len(items), n)
+    out, start = [], 0
+    for i in range(n):
+        end = start + size + (1 if i < extra else 0)
+        out.append(items[start:end])
+        start = end
+    return out
+
+def _with_captions(prompt: str, batch: list, captions: dict[str, str] | None) -> str:
+    if not captions:
+        return prompt
+    lines = [f"Image {i}: {captions.get(p, '(no caption found)')}" for i, p in enumerate(batch, start=1)]
+    return prompt + "\n\nThe images, in order, with their captions from the manuscript:\n" + "\n".join(lines)
+
+def run_vision(args, backend: Backend, prompt: str, image_paths: list, metrics: RunMetrics,
+               captions: dict[str, str] | None = None) -> str:
+    """One VLM call per slot, each with a contiguous run of page images, sent concurrently.
+
+    `captions` maps image paths to caption text for images that are not whole pages (DOCX figures).
+    """
+    batches = _batches(image_paths, args.llm_slots)
+    calls = []
+    for i, batch in enumerate(batches):
+        vlm = backend.vision(args.vlm_model, temperature=args.temperature, keep_alive=args.keep_alive)
+        key = "vision" if len(batches) == 1 else f"vision_{i + 1}"
+        batch = plan_vision_call(args, backend, vlm, _with_captions(prompt, batch, captions), batch, metrics, key)
+        calls.append((vlm, _with_captions(prompt, batch, captions), batch))
+    if len(calls) == 1:
+        vlm, text, batch = calls[0]
+        notes = [vlm.analyze_images(text, batch)]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        pool = ThreadPoolExecutor(max_workers=len(calls))
+        try:
+            notes = list(pool.map(lambda c: c[0].analyze_images(c[1], c[2]), calls))
+        finally:
+            # No waiting on a cancel: the calls still in flight end with the process
+            pool.shutdown(wait=False, cancel_futures=True)
+    for vlm, text, _ in calls:
+        metrics.record_llm("vision", vlm.model, vlm.last_stats, len(text))
+    return "\n\n".join(n for n in notes if n)
+
+def run_review(args, pdf_path: Path, out_dir: Path, progress: ProgressReporter, metrics: RunMetrics,
+               cancel: CancelToken | None = None):
     logging.info(f"Starting review using custom logic for: {pdf_path.name}")
+    llm_urls = _llm_urls(args.llm_api, args.ollama_url)
+    llm_url = llm_urls[0]
+    archive = Path(args.replay_archive) if args.replay_archive else out_dir / ARCHIVE_FILE
+    if args.backend == "replay" and not archive.exists():
+        logging.error(f"Replay archive not found: {archive}")
+        sys.exit(1)
+    api_key = (args.api_key or os.environ.get("OPENAI_API_KEY")) if args.llm_api == "openai" else None
+    inner = HttpTransport({"Authorization": f"Bearer {api_key}"}) if api_key else HTTP
+    pool = None
+    if args.llm_api == "ollama" and len(llm_urls) > 1:
+        pool = get_pool(llm_urls)
+        inner = PoolTransport(pool, inner)
+        logging.info(f"Ollama hosts: {', '.join(llm_urls)}")
+    transport = make_transport(args.backend, archive, timing=args.replay_timing, strict=args.replay_strict, inner=inner)
+    backend = make_backend(args.llm_api, llm_url, CancellableTransport(transport, cancel) if cancel else transport, api_key)
+    metrics.run.update({"llm_api": args.llm_api, "llm_slots": args.llm_slots})
+    if args.llm_api != "ollama":
+        logging.info(f"LLM server: {args.llm_api} at {llm_url}")
+    if args.backend != "live":
+        logging.info(f"Model backend: {args.backend} ({archive})")
 
     # 1. INGEST (Using your code)
     print("[1/5] Extracting PDF text (Custom Ingest)...")
+    progress.stage_start("ingest")
     try:
-        manuscript = load_manuscript(pdf_path)
-        # Combine all text units into one string
-        full_text = "\n\n".join([unit.text for unit in manuscript.units])
+        with metrics.stage("ingest"):
+            manuscript = load_manuscript(pdf_path, tables=True)
+            # Combine all text units into one string
+            full_text = "\n\n".join([unit.text for unit in manuscript.units])
         logging.info(f"Extracted {len(full_text)} characters.")
     except Exception as e:
         logging.error(f"Ingest failed: {e}")
         sys.exit(1)
+    progress.stage_end("ingest")
+
+    previous = None
+    if args.previous_run:
+        try:
+            previous = load_previous(args.previous_run)
+        except (OSError, ValueError) as e:
+            logging.error(f"Cannot use --previous_run: {e}")
+            sys.exit(1)
+        logging.info(f"Revision of the review in {previous.folder}"
+                     + ("" if previous.critique else " (free-text critique; points are matched by the critic)."))
+
+    # Local checks and text-layer tables; these fill critic prompt sections without a model call
+    checks = {}
+    with metrics.stage("checks"):
+        nomenclature = check_nomenclature(manuscript.units)
+        checks["nomenclature_findings"] = format_findings(nomenclature)
+        numeric = check_numbers(manuscript)
+        checks["numeric_findings"] = format_discrepancies(numeric)
+        checks["tables"] = tables_markdown(manuscript.tables) if manuscript.tables else "(no text-layer tables detected)"
+    metrics.run["checks"] = {"nomenclature": len(nomenclature), "numeric": len(numeric), "tables": len(manuscript.tables)}
 
     # 2. VISION (Optional)
     vision_context = ""
+    figure_paths = []  # every figure image of this version, for the index
+    figures_changed = 0
     if args.vlm_model:
         print(f"[3/5] Running Vision Analysis ({args.vlm_model})...")
+        progress.stage_start("vision", detail=args.vlm_model)
         try:
             img_dir = out_dir / "figures"
-            image_paths = extract_images_local(pdf_path, img_dir, dpi=args.fig_dpi)
-            
+            budget = VisionBudget(
+                max_pages=args.vision_pages,
+                megapixels=args.vision_megapixels,
+                seconds=args.vision_budget_s,
+                tokens_per_s=vision_prompt_rate(args.vlm_model, args.metrics_history),
+            )
+            captions = None
+            if pdf_path.suffix.lower() == ".docx":
+                # Embedded images are read from the package as they are; nothing to render
+                with metrics.stage("render"):
+                    figures = extract_docx_figures(pdf_path, img_dir, budget)
+                image_paths = [f.path for f in figures]
+                captions = {f.path: caption_label(f) for f in figures}
+                metrics.run["vision_pages"] = [
+                    {"figure": Path(f.name).name, "caption": f.pointer or None} for f in figures
+                ]
+            else:
+                with metrics.stage("render"):
+                    page_text = {u.page: u.text for u in manuscript.units if u.page is not None}
+                    image_paths, chosen = extract_images_local(
+                        pdf_path, img_dir, dpi=args.fig_dpi, tables=manuscript.tables, budget=budget, page_text=page_text,
+                    )
+                metrics.run["vision_pages"] = [
+                    {"page": s.index + 1, "kind": s.kind, "score": round(s.score, 2)} for s in chosen
+                ]
+
+            figure_paths = list(image_paths)
+            if previous is not None:
+                # Same image bytes as last round: its notes still apply
+                seen = previous.index.get("figures", {})
+                image_paths = [p for p in image_paths if file_hash(p) not in seen]
+                logging.info(f"Vision: {len(image_paths)} new or changed figure image(s), "
+                             f"{len(figure_paths) - len(image_paths)} unchanged.")
+            figures_changed = len(image_paths)
+
             if image_paths:
-                vlm = OllamaVLM(model=args.vlm_model, temperature=args.temperature)
                 # Load vision prompt template if exists, else default
                 vlm_prompt = load_template("vlm_prompt") or "Describe these figures in detail, noting any errors."
-                vision_context = vlm.analyze_images(vlm_prompt, image_paths)
+                with metrics.stage("vision"):
+                    vision_context = run_vision(args, backend, vlm_prompt, image_paths, metrics, captions)
                 logging.info("Vision analysis complete.")
+            elif figure_paths:
+                vision_context = "No new or changed figures since the previous version."
             else:
-                vision_context = "No images found."
+                vision_context = "No figures found (tables are read from the text layer)."
         except Exception as e:
             logging.error(f"Vision analysis failed: {e}")
             vision_context = "Vision analysis skipped due to error."
+        progress.stage_end("vision")
     else:
         print("[3/5] Skipping Vision (User disabled).")
+        progress.skip("vision")
+
+    # What the next revision round compares against
+    save_index(out_dir, build_index(manuscript, figure_paths))
+    if args.vlm_model:
+        notes = vision_context if figures_changed else ""
+        if previous is not None and len(figure_paths) > figures_changed and previous.figure_notes:
+            notes = "\n\n".join(n for n in (notes, previous.figure_notes) if n)
+        (out_dir / NOTES_FILE).write_text(notes, encoding="utf-8")
 
-    # 3. CRITIC (Using your OllamaText class)
+    # 3. CRITIC
     print(f"[4/5] Running Critic ({args.critic_model})...")
-    critic = OllamaText(model=args.critic_model, temperature=args.temperature)
-    
+    progress.stage_start("critic", detail=args.critic_model)
+
     # Load your specific template
     critic_template = load_template("critic_prompt")
-    
-    # Construct prompt by injecting variables (Robust handling)
-    # We append text if {{TEXT}} placeholder isn't found
-    if "{{TEXT}}" in critic_template:
-        critic_input = critic_template.replace("{{TEXT}}", full_text)
+    metrics.run["guidelines"] = match_guidelines(args.study_design, args.has_ai).to_dict()
+    if previous is not None:
+        diff = diff_manuscripts(previous.index, build_index(manuscript))
+        changed = {t.pointer for t in manuscript.tables if t.pointer in diff.tables_changed}
+        checks["tables"] = (tables_markdown([t for t in manuscript.tables if t.pointer in changed])
+                            if changed else "(no new or changed tables)")
+        critique = run_revision_critic(args, backend, previous, diff, vision_context, figures_changed, checks,
+                                       out_dir, progress, metrics)
+    elif args.critic_format == "json" or args.regenerate_sections:
+        critique = run_structured_critic(args, backend, critic_template, full_text, vision_context, checks,
+                                         out_dir, progress, metrics)
     else:
-        critic_input = f"{critic_template}\n\n### MANUSCRIPT ###\n{full_text}"
-        
-    # Inject Metadata
-    meta_str = f"Type: {args.manuscript_type}\nDesign: {args.study_design}\nAI Study: {args.has_ai}"
-    critic_input = critic_input.replace("{{METADATA}}", meta_str)
-    
-    # Inject Vision
-    critic_input = critic_input.replace("{{VISION}}", vision_context)
-
-    # Generate
-    critique = critic.generate(critic_input)
+        critique = run_text_stage(
+            args, backend, "Critic", args.critic_model, args.critic_fallback,
+            lambda text: build_critic_input(critic_template, text, args, vision_context, checks),
+            full_text, progress, metrics,
+        )
     (out_dir / "critique_debug.md").write_text(critique, encoding="utf-8")
+    progress.stage_end("critic")
 
-    # 4. WRITER (Using your OllamaText class)
+    # 4. WRITER
     print(f"[5/5] Running Writer ({args.writer_model})...")
-    writer = OllamaText(model=args.writer_model, temperature=args.temperature)
-    
-    writer_template = load_template("writer_prompt")
-    
-    if "{{CRITIQUE}}" in writer_template:
-        writer_input = writer_template.replace("{{CRITIQUE}}", critique)
-    else:
-        writer_input = f"{writer_template}\n\n### CRITIQUE NOTES ###\n{critique}"
-
-    final_review = writer.generate(writer_input)
+    progress.stage_start("writer", detail=args.writer_model)
+    writer_template = load_template("revision_writer_prompt" if previous is not None else "writer_prompt")
+    values = prompt_values(args, vision_context)
+    final_review = run_text_stage(
+        args, backend, "Writer", args.writer_model, args.writer_fallback,
+        lambda text: build_writer_input(writer_template, text, values),
+        critique, progress, metrics,
+    )
+    progress.stage_end("writer")
 
     # 5. Save
+    progress.stage_start("save")
     safe_name = pdf_path.stem.replace(" ", "_")
     final_path = out_dir / f"Review_{safe_name}.md"
     final_path.write_text(final_review, encoding="utf-8")
     
+    progress.stage_end("save")
+    if pool is not None:
+        metrics.run["hosts"] = pool.summary()
+    if isinstance(transport, ReplayTransport):
+        metrics.run["replay"] = {"hits": transport.hits, "misses": transport.misses}
+        logging.info(f"Replay: {transport.hits} call(s) served from archive, {transport.misses} sent live.")
     print("Review completed successfully.")
     logging.info(f"Saved to {final_path}")
 
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import functools
+import json
+import logging
+import math
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+
+from .registry import ModelDetails
+
+# Context-window planning for Ollama calls.
+#
+# Prompt size is estimated with a chars-per-token ratio that is calibrated per
+# model from earlier runs (metrics history records prompt_chars next to
+# Ollama's prompt_eval_count). num_ctx is then the smallest bucket that holds
+# prompt + num_predict, capped at the model's trained context length. Buckets
+# keep Ollama from reloading the model for every slightly different size.
+
+CTX_BUCKETS = (2048, 4096, 8192, 16384, 32768, 65536, 131072)
+DEFAULT_CHARS_PER_TOKEN = 3.6
+FALLBACK_MAX_CTX = 32768
+SAFETY_TOKENS = 256
+TRUNCATION_MARKER = "\n\n[... {n} characters omitted to fit the model's context window ...]\n\n"
+
+@dataclass
+class ContextPlan:
+    num_ctx: int
+    num_predict: int
+    prompt_tokens: int
+    max_ctx: int
+    truncated_chars: int = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self.truncated_chars > 0
+
+class TokenEstimator:
+    def __init__(self, chars_per_token: float = DEFAULT_CHARS_PER_TOKEN):
+        self.chars_per_token = chars_per_token
+
+    def count(self, text: str) -> int:
+        return int(math.ceil(len(text) / self.chars_per_token))
+
+    def chars_for(self, tokens: int) -> int:
+        return int(tokens * self.chars_per_token)
+
+    @classmethod
+    def calibrated(cls, model: str, history_path: str | Path | None, max_runs: int = 20) -> "TokenEstimator":
+        """Ratio from this model's recent calls in a metrics history file, if any."""
+        if not history_path or not Path(history_path).exists():
+            return cls()
+        chars = tokens = 0
+        runs = 0
+        lines = Path(history_path).read_text(encoding="utf-8", errors="ignore").splitlines()
+        for line in reversed(lines):
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            used = False
+            for call in rec.get("llm") or []:
+                # Vision calls carry image tokens, which would skew a text ratio.
+                if call.get("model") == model and call.get("stage") != "vision" and call.get("prompt_tokens"):
+                    chars += int(call.get("prompt_chars") or 0)
+                    tokens += int(call["prompt_tokens"])
+                    used = True
+            runs += used
+            if runs >= max_runs:
+                break
+        if chars and tokens:
+            return cls(min(max(chars / tokens, 2.0), 6.0))
+        return cls()
+
+DEFAULT_VISION_TOK_S = 400.0
+
+def vision_prompt_rate(model: str, history_path: str | Path | None, max_runs: int = 20) -> float:
+    """Prompt tokens/s of this VLM's recent vision calls (image tokens dominate), else a default."""
+    if not history_path or not Path(history_path).exists():
+        return DEFAULT_VISION_TOK_S
+    tokens = seconds = 0.0
+    runs = 0
+    for line in reversed(Path(history_path).read_text(encoding="utf-8", errors="ignore").splitlines()):
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        calls = [c for c in rec.get("llm") or [] if c.get("model") == model and c.get("stage") == "vision"]
+        for c in calls:
+            tokens += c.get("prompt_tokens") or 0
+            seconds += c.get("prompt_eval_s") or 0
+        runs += bool(calls)
+        if runs >= max_runs:
+            break
+    return tokens / seconds if tokens and seconds else DEFAULT_VISION_TOK_S
+
+def image_size(data: bytes) -> tuple[int, int] | None:
+    """(width, height) from a PNG or JPEG header, without decoding the image."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] == b"\xff\xd8":
+        i = 2
+        while i + 9 < len(data) and data[i] == 0xFF:
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2  # standalone markers carry no length
+                continue
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h, w = struct.unpack(">HH", data[i + 5:i + 9])
+                return w, h
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def image_tokens(path: str | Path, patch: int = 28) -> int:
+    """Vision tokens for a PNG or JPEG, using Qwen2.5-VL's 28x28-pixel patches."""
+    with open(path, "rb") as f:
+        head = f.read(1 << 18)  # JPEG frame headers can sit behind large EXIF blocks
+    size = image_size(head)
+    if not size:
+        return 1024
+    w, h = size
+    return max(1, math.ceil(w / patch) * math.ceil(h / patch))
+
+@functools.lru_cache(maxsize=32)
+def model_show(base_url: str, model: str, transport=None) -> dict | None:
+    """Ollama's /api/show for a model, or None if it could not be read.
+
+    Goes through the clients' transport so record/replay runs plan identically.
+    """
+    from .ollama import HTTP
+    try:
+        return (transport or HTTP).post_json(f"{base_url}/api/show", {"model": model}, 10)
+    except Exception as e:
+        logging.info(f"Could not read model details for {model}: {e}")
+        return None
+
+def model_context_limit(base_url: str, model: str, transport=None) -> int | None:
+    """Trained context length from /api/show (model_info "<arch>.context_length")."""
+    return ModelDetails.from_show(model, model_show(base_url, model, transport)).context_length
+
+def plan_context(prompt_tokens: int, num_predict: int, max_ctx: int | None,
+                 buckets: tuple[int, ...] = CTX_BUCKETS) -> ContextPlan:
+    cap = max_ctx or FALLBACK_MAX_CTX
+    need = prompt_tokens + num_predict + SAFETY_TOKENS
+    fitting = [b for b in buckets if b <= cap]
+    num_ctx = next((b for b in fitting if b >= need), fitting[-1] if fitting else cap)
+    if need > num_ctx and cap > num_ctx:
+        num_ctx = cap  # larger than every bucket but the model allows it
+    return ContextPlan(num_ctx=num_ctx, num_predict=num_predict, prompt_tokens=prompt_tokens, max_ctx=cap)
+
+def fit_text(text: str, budget_tokens: int, estimator: TokenEstimator, head_share: float = 0.7) -> tuple[str, int]:
+    """Cuts the middle out of `text` so it fits `budget_tokens`; returns (text, chars_removed).
+
+    The head (abstract, methods) and the tail (discussion, limitations) carry
+    most of what a reviewer needs, so those are kept.
+    """
+    budget_chars = estimator.chars_for(max(budget_tokens, 0))
+    if len(text) <= budget_chars:
+        return text, 0
+    # The marker takes room from what is kept; sized for the widest count, so the result stays within budget
+    keep = max(budget_chars - len(TRUNCATION_MARKER.format(n=len(text))), 0)
+    head = int(keep * head_share)
+    tail = keep - head
+    removed = len(text) - keep
+    return text[:head] + TRUNCATION_MARKER.format(n=removed) + (text[-tail:] if tail else ""), removed
+
+def plan_for_prompt(template_tokens: int, body: str, num_predict: int, max_ctx: int | None,
+                    estimator: TokenEstimator, label: str) -> tuple[str, ContextPlan]:
+    """Plans num_ctx for template + body, cutting body down if even max_ctx is too small."""
+    body_tokens = estimator.count(body)
+    plan = plan_context(template_tokens + body_tokens, num_predict, max_ctx)
+    room = plan.num_ctx - num_predict - SAFETY_TOKENS - template_tokens
+    if body_tokens > room:
+        body, removed = fit_text(body, room, estimator)
+        plan.prompt_tokens = template_tokens + estimator.count(body)
+        plan.truncated_chars = removed
+        logging.warning(
+            f"⚠️ {label}: prompt (~{template_tokens + body_tokens} tokens) exceeds the {plan.num_ctx}-token "
+            f"context; removed {removed} characters from the middle of the manuscript."
+        )
+    logging.info(f"{label}: ~{plan.prompt_tokens} prompt tokens -> num_ctx={plan.num_ctx} (max {plan.max_ctx})")
+    return body, plan
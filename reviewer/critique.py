@@ -0,0 +1,276 @@
+from __future__ import annotations
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+# Structured critic output (reviewer.cli --critic_format json).
+#
+# The critic answers in JSON constrained by CRITIQUE_SCHEMA (Ollama's
+# `format`, or `response_format` on OpenAI-compatible servers): issues
+# grouped by manuscript section, each with severity, pointer, evidence and
+# fix. Output cut short by num_predict is closed at the last complete value
+# and the sections it lost are asked for again on their own, with the
+# schema narrowed to them. The writer gets for_writer(): one line per
+# distinct issue and no evidence quotes, a fraction of the free-text Issue
+# Log. critique.json stays in the output folder, so later runs can
+# regenerate single sections and keep the rest.
+
+CRITIQUE_FILE = "critique.json"
+SEVERITIES = ("Fatal", "Major", "Moderate", "Minor")
+SECTIONS = (
+    "abstract", "introduction", "methods", "results", "discussion",
+    "tables", "figures", "references", "reporting_guidelines", "ethics_bias_reproducibility",
+)
+KEY_DETAILS = ("novelty", "rationale", "analysis_quality", "clarity_of_results")
+
+ISSUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "severity": {"type": "string", "enum": list(SEVERITIES)},
+        "issue": {"type": "string"},
+        "why": {"type": "string"},
+        "pointer": {"type": "string"},
+        "evidence": {"type": "string"},
+        "fix": {"type": "string"},
+    },
+    "required": ["severity", "issue", "why", "pointer", "evidence", "fix"],
+}
+_ISSUES = {"type": "array", "items": ISSUE_SCHEMA}
+_STRINGS = {"type": "array", "items": {"type": "string"}}
+
+def sections_schema(names) -> dict:
+    return {"type": "object", "properties": {n: _ISSUES for n in names}, "required": list(names)}
+
+CRITIQUE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "synopsis": {"type": "string"},
+        "key_details": {
+            "type": "object",
+            "properties": {k: {"type": "string"} for k in KEY_DETAILS},
+            "required": list(KEY_DETAILS),
+        },
+        "strengths": _STRINGS,
+        "sections": sections_schema(SECTIONS),
+        "missing_info": _STRINGS,
+    },
+    "required": ["synopsis", "key_details", "strengths", "sections", "missing_info"],
+}
+
+OUTPUT_INSTRUCTIONS = """OUTPUT FORMAT (JSON, no prose outside it)
+Return one JSON object with:
+- "synopsis": 3–4 sentences, paraphrased.
+- "key_details": novelty, rationale, analysis_quality, clarity_of_results; each "Yes/No/Unclear" plus 1–2 sentences ("n/a" if not original research).
+- "strengths": 3–6 short items.
+- "sections": for each of {sections}, a list of issues (empty if none). Each issue:
+  severity (Fatal|Major|Moderate|Minor), issue, why (why it matters), pointer (e.g. [p3], [table2], Figure 1),
+  evidence (a short paraphrase of what the manuscript says or lacks), fix (concrete edit).
+  Put each point under one section only. Nomenclature problems go under the section where they occur;
+  reporting-guideline gaps under reporting_guidelines; figure notes under figures or tables.
+- "missing_info": 5–12 requests for information the authors must supply."""
+
+SECTION_INSTRUCTIONS = """OUTPUT FORMAT (JSON, no prose outside it)
+Return one JSON object with only these sections: {sections}. Each is a list of issues (empty if none) with
+severity (Fatal|Major|Moderate|Minor), issue, why, pointer, evidence, fix. Put each point under one section only."""
+
+@dataclass
+class Issue:
+    severity: str
+    issue: str
+    why: str = ""
+    pointer: str = ""
+    evidence: str = ""
+    fix: str = ""
+    status: str = ""  # revision rounds: addressed, partly addressed, unaddressed or new
+    note: str = ""  # revision rounds: what the authors did about it
+
+@dataclass
+class Critique:
+    synopsis: str = ""
+    key_details: dict[str, str] = field(default_factory=dict)
+    strengths: list[str] = field(default_factory=list)
+    sections: dict[str, list[Issue]] = field(default_factory=dict)
+    missing_info: list[str] = field(default_factory=list)
+
+    @property
+    def issues(self) -> list[Issue]:
+        return [i for items in self.sections.values() for i in items]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def merge_sections(self, other: "Critique", names) -> None:
+        for n in names:
+            if n in other.sections:
+                self.sections[n] = other.sections[n]
+
+# -- parsing and repair --
+
+_FENCE = re.compile(r"^```(?:json)?\s*|\s*```$")
+_THINK = re.compile(r"<think>.*?</think>", re.DOTALL)
+MAX_REPAIR_CUTS = 200
+
+def _closers(text: str) -> str | None:
+    """Brackets that would close `text`, or None when it ends inside a string or after a key."""
+    stack: list[str] = []
+    in_str = escaped = False
+    for ch in text:
+        if in_str:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if not stack:
+                return None
+            stack.pop()
+    if in_str:
+        return None
+    return "".join(reversed(stack))
+
+def load_json(text: str) -> tuple[object | None, bool]:
+    """(parsed value, repaired?) for the JSON object in `text`; (None, False) if nothing usable.
+
+    Output cut off mid-way is closed at the last complete element, so
+    everything before the cut is kept.
+    """
+    text = _FENCE.sub("", _THINK.sub("", text).strip())
+    start = text.find("{")
+    if start < 0:
+        return None, False
+    text = text[start:]
+    try:
+        return json.loads(text), False
+    except ValueError:
+        pass
+    try:
+        return json.JSONDecoder().raw_decode(text)[0], False  # trailing chatter after the object
+    except ValueError:
+        pass
+    # Walk back over the places where an element ends: after , } ] or a closing quote
+    cuts = [i for i in range(len(text) - 1, 0, -1) if text[i] in ',}]"'][:MAX_REPAIR_CUTS]
+    for i in cuts:
+        head = text[:i] if text[i] == "," else text[:i + 1]
+        head = head.rstrip()
+        closers = _closers(head)
+        if closers is None or head.endswith(":"):
+            continue
+        try:
+            return json.loads(head + closers), True
+        except ValueError:
+            continue
+    return None, False
+
+def as_text(v) -> str:
+    """A model-supplied field as a stripped string (non-strings as JSON)."""
+    if isinstance(v, str):
+        return v.strip()
+    return "" if v is None else json.dumps(v, ensure_ascii=False)
+
+def _strings(v) -> list[str]:
+    if isinstance(v, str):
+        v = [v]
+    return [s for s in (as_text(x) for x in (v if isinstance(v, list) else [])) if s]
+
+def _severity(v) -> str:
+    s = as_text(v).lower()
+    return next((x for x in SEVERITIES if s.startswith(x.lower())), "Moderate")
+
+def parse_issues(v) -> list[Issue]:
+    """Issues from a parsed JSON list, skipping entries without an issue text."""
+    out = []
+    for d in v if isinstance(v, list) else []:
+        if not isinstance(d, dict) or not as_text(d.get("issue")):
+            continue  # cut off before the issue itself was written
+        out.append(Issue(_severity(d.get("severity")), as_text(d.get("issue")), as_text(d.get("why")),
+                         as_text(d.get("pointer")), as_text(d.get("evidence")), as_text(d.get("fix")),
+                         as_text(d.get("status")), as_text(d.get("note"))))
+    return out
+
+def from_dict(data: dict) -> tuple[Critique, list[str]]:
+    """Coerces parsed output into a Critique; also returns the sections that are missing."""
+    raw_sections = data.get("sections") if isinstance(data.get("sections"), dict) else {}
+    c = Critique(
+        synopsis=as_text(data.get("synopsis")),
+        key_details={k: as_text(v) for k, v in (data.get("key_details") or {}).items()} if isinstance(data.get("key_details"), dict) else {},
+        strengths=_strings(data.get("strengths")),
+        sections={k.lower(): parse_issues(v) for k, v in raw_sections.items()},
+        missing_info=_strings(data.get("missing_info")),
+    )
+    return c, [s for s in SECTIONS if s not in c.sections]
+
+def parse_critique(text: str) -> tuple[Critique | None, list[str], bool]:
+    """(critique, sections to ask for again, repaired?) from the critic's reply."""
+    data, repaired = load_json(text)
+    if not isinstance(data, dict):
+        return None, list(SECTIONS), False
+    c, missing = from_dict(data)
+    if repaired:
+        # The last section written before the cut may be incomplete
+        present = [s for s in SECTIONS if s in c.sections]
+        if present and not missing and not c.missing_info:
+            missing = present[-1:]
+        elif present and missing and SECTIONS.index(missing[0]) > SECTIONS.index(present[-1]):
+            missing = [present[-1], *missing]
+    return c, missing, repaired
+
+def parse_sections(text: str, names) -> dict[str, list[Issue]]:
+    data, _ = load_json(text)
+    if not isinstance(data, dict):
+        return {}
+    data = data.get("sections", data) if isinstance(data.get("sections"), dict) else data
+    return {n: parse_issues(data[n]) for n in names if n in data}
+
+# -- rendering --
+
+def _key(issue: Issue) -> str:
+    return " ".join(re.sub(r"[^a-z0-9 ]", "", issue.issue.lower()).split())
+
+def for_writer(c: Critique) -> str:
+    """The Issue Log as the writer needs it: no evidence quotes, repeated points listed once."""
+    order = {s: i for i, s in enumerate(SEVERITIES)}
+    lines = ["SYNOPSIS: " + (c.synopsis or "(none)")]
+    details = [f"{k.replace('_', ' ').capitalize()}: {v}" for k, v in c.key_details.items() if v]
+    if details:
+        lines.append("KEY DETAILS: " + " | ".join(details))
+    if c.strengths:
+        lines.append("STRENGTHS:\n" + "\n".join(f"- {s}" for s in c.strengths))
+    seen: set[str] = set()
+    blocks = []
+    names = [*SECTIONS, *(s for s in c.sections if s not in SECTIONS)]
+    for name in names:
+        rows = []
+        for i in sorted(c.sections.get(name, []), key=lambda i: order.get(i.severity, 2)):
+            k = _key(i)
+            if k in seen:
+                continue
+            seen.add(k)
+            row = f"- [{i.severity}] {i.issue}"
+            row += f" ({i.pointer})" if i.pointer else ""
+            row += f" Why: {i.why}" if i.why else ""
+            row += f" Fix: {i.fix}" if i.fix else ""
+            rows.append(row)
+        if rows:
+            blocks.append(f"{name.replace('_', ' ').upper()}:\n" + "\n".join(rows))
+    lines.append("ISSUES BY SECTION:\n" + ("\n".join(blocks) if blocks else "(none raised)"))
+    if c.missing_info:
+        lines.append("MISSING INFO REQUESTS:\n" + "\n".join(f"- {m}" for m in c.missing_info))
+    return "\n\n".join(lines)
+
+def output_instructions(names=SECTIONS) -> str:
+    listed = ", ".join(names)
+    if tuple(names) == SECTIONS:
+        return OUTPUT_INSTRUCTIONS.format(sections=listed)
+    return SECTION_INSTRUCTIONS.format(sections=listed)
+
+def with_json_output(critic_template: str, names=SECTIONS) -> str:
+    """Swaps the template's free-text OUTPUT FORMAT block (to its end) for the JSON instructions."""
+    head = re.split(r"^OUTPUT FORMAT\b", critic_template, maxsplit=1, flags=re.MULTILINE)[0]
+    tail = "\n\n{{TEXT}}" if "{{TEXT}}" in critic_template and "{{TEXT}}" not in head else ""
+    return f"{head.rstrip()}\n\n{output_instructions(names)}{tail}\n"
@@ -0,0 +1,193 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Resident review worker. `python -m reviewer.daemon` imports the pipeline once,
+# keeps templates and the pooled Ollama session warm, and accepts reviews from
+# `reviewer.cli` over localhost HTTP:
+#   GET  /health  -> {"ok": true, ...}
+#   POST /review  {"argv": [...cli args...]} -> JSON-lines progress events
+#   POST /cancel  {"out": "<absolute --out dir>"} -> {"cancelled": bool}
+
+from reviewer import cli
+from reviewer.cancel import CancelToken
+from reviewer.progress import PROGRESS_FILE, ProgressReporter
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+class _ClientLogHandler(logging.Handler):
+    """Forwards one run's log records to the client that submitted it."""
+
+    def __init__(self, send, ident: int):
+        super().__init__(level=logging.INFO)
+        self.send = send
+        self.addFilter(lambda record: record.thread == ident)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.send({"event": "log", "message": self.format(record)})
+        except Exception:
+            pass
+
+class ReviewDaemon:
+    def __init__(self):
+        self.started = time.time()
+        self.warm: list[str] = []
+        self.active = 0
+        self.completed = 0
+        self._runs: dict[str, CancelToken] = {}  # keyed by resolved --out dir
+        self._lock = threading.Lock()
+        self._preload()
+
+    def _preload(self) -> None:
+        # Pay import and first-load costs once, up front.
+        import fitz  # noqa: F401
+        self.warm.append("pymupdf")
+        try:
+            import docx  # noqa: F401
+            self.warm.append("python-docx")
+        except ImportError:
+            pass
+        from reviewer.ollama import session
+        session()
+        self.warm.append("ollama-session")
+        for name in ("critic_prompt", "writer_prompt", "vlm_prompt"):
+            cli.load_template(name)
+        self.warm.append("templates")
+
+    def health(self) -> dict:
+        return {
+            "ok": True,
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "warm": self.warm,
+            "active": self.active,
+            "completed": self.completed,
+        }
+
+    def review(self, argv: list[str], send) -> None:
+        args = cli.build_parser().parse_args(argv)
+        pdf_path = Path(args.input)
+        out_dir = Path(args.out)
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        ident = threading.get_ident()
+        file_handler = cli.setup_logging(out_dir, this_thread_only=True)
+        client_handler = _ClientLogHandler(send, ident)
+        client_handler.setFormatter(logging.Formatter(cli.LOG_FORMAT))
+        logging.getLogger().addHandler(client_handler)
+
+        progress = ProgressReporter(args.progress_file or out_dir / PROGRESS_FILE, listeners=[send])
+        token = CancelToken()
+        key = str(out_dir.resolve())
+        with self._lock:
+            self.active += 1
+            self._runs[key] = token
+        try:
+            cli.execute(args, pdf_path, out_dir, progress, token)
+        except BaseException:
+            pass  # already reported through the progress stream's end event
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self._runs.pop(key, None)
+            logging.getLogger().removeHandler(client_handler)
+            logging.getLogger().removeHandler(file_handler)
+            file_handler.close()
+
+    def cancel(self, out_dir: str) -> bool:
+        with self._lock:
+            token = self._runs.get(str(Path(out_dir).resolve()))
+        return bool(token and token.cancel("cancelled by client"))
+
+def _make_handler(daemon: ReviewDaemon):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def log_message(self, fmt, *a):
+            logging.debug("daemon: " + fmt, *a)
+
+        def _json(self, code: int, body: dict) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._json(200, daemon.health())
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path == "/cancel":
+                try:
+                    n = int(self.headers.get("Content-Length") or 0)
+                    out = json.loads(self.rfile.read(n) or b"{}")["out"]
+                except (ValueError, KeyError) as e:
+                    self._json(400, {"error": f"bad cancel request: {e}"})
+                    return
+                self._json(200, {"cancelled": daemon.cancel(out)})
+                return
+            if self.path != "/review":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                n = int(self.headers.get("Content-Length") or 0)
+                argv = json.loads(self.rfile.read(n) or b"{}")["argv"]
+                cli.build_parser().parse_args(argv)  # validate before streaming
+            except (ValueError, KeyError, SystemExit) as e:
+                self._json(400, {"error": f"bad review request: {e}"})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            write_lock = threading.Lock()
+            client_gone = threading.Event()
+
+            def send(rec: dict) -> None:
+                if client_gone.is_set():
+                    return
+                try:
+                    with write_lock:
+                        self.wfile.write((json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8"))
+                        self.wfile.flush()
+                except OSError:
+                    client_gone.set()  # keep reviewing; results still land in the out dir
+
+            daemon.review(argv, send)
+
+    return Handler
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    daemon = ReviewDaemon()
+    server = ThreadingHTTPServer((host, port), _make_handler(daemon))
+    server.daemon_threads = True
+    print(f"Reviewer daemon listening on http://{host}:{port} (warm: {', '.join(daemon.warm)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Resident reviewer worker")
+    ap.add_argument("--host", default=DEFAULT_HOST,
+                    help="Keep this on localhost; manuscripts must not leave the machine.")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format=cli.LOG_FORMAT, stream=sys.stdout)
+    serve(args.host, args.port)
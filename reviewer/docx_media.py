@@ -0,0 +1,168 @@
+from __future__ import annotations
+import logging
+import posixpath
+import re
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+from .context import image_size
+from .prompting import excerpt
+from .pdf_images import VLM_PATCH, VisionBudget, fit_budget
+
+# Figures straight from a DOCX package.
+#
+# A .docx is a zip: the images sit in word/media and word/document.xml says
+# where each one is placed (a:blip r:embed, or v:imagedata r:id in older
+# files), resolved through word/_rels/document.xml.rels. Walking the body in
+# order gives every image its position, so the caption comes from the nearest
+# "Figure N" paragraph, and PNG/JPEG bytes go to the VLM as they are; nothing
+# is converted to PDF or rendered.
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+V_IMAGEDATA = "{urn:schemas-microsoft-com:vml}imagedata"
+R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+_CAPTION = re.compile(r"^\s*(?:Fig(?:ure)?\.?|Supplementa(?:l|ry) Fig(?:ure)?\.?)\s*S?\d+", re.IGNORECASE)
+CAPTION_REACH = 3  # paragraphs either side of the image
+MIN_FIGURE_PIXELS = 150 * 150  # smaller images are logos and icons
+DIRECT_FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg"}
+DECODE_FORMATS = {".gif", ".bmp", ".tif", ".tiff"}  # re-encoded as PNG; EMF/WMF/SVG are skipped
+
+@dataclass
+class DocxFigure:
+    name: str  # word/media/... inside the package
+    caption: str = ""
+    pointer: str = ""  # [paraN] of the caption, matching load_manuscript's units
+    width: int = 0
+    height: int = 0
+    path: str = ""  # set once written out
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    @property
+    def tokens(self) -> int:
+        return max(1, self.pixels // (VLM_PATCH * VLM_PATCH))
+
+def _text(el: ET.Element) -> str:
+    return "".join(t.text or "" for t in el.iter(W + "t"))
+
+def _image_ids(el: ET.Element) -> list[str]:
+    ids = [b.get(R + "embed") for b in el.iter(A_BLIP)]
+    ids += [v.get(R + "id") for v in el.iter(V_IMAGEDATA)]
+    return [i for i in ids if i]
+
+def _relationships(z: zipfile.ZipFile) -> dict[str, str]:
+    try:
+        root = ET.fromstring(z.read("word/_rels/document.xml.rels"))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(PKG_REL):
+        if rel.get("TargetMode") == "External":
+            continue  # linked, not embedded
+        target = rel.get("Target", "")
+        rels[rel.get("Id")] = target.lstrip("/") if target.startswith("/") else posixpath.normpath(f"word/{target}")
+    return rels
+
+def _caption_for(blocks: list[tuple[str, str, list[str]]], i: int) -> tuple[str, str]:
+    # Figure captions normally sit below the image, so look there first.
+    order = [i] + [i + d for d in range(1, CAPTION_REACH + 1)] + [i - d for d in range(1, CAPTION_REACH + 1)]
+    for j in order:
+        if 0 <= j < len(blocks) and _CAPTION.match(blocks[j][1]):
+            return blocks[j][1], blocks[j][0]
+    return "", ""
+
+def docx_figures(path: str | Path) -> list[DocxFigure]:
+    """Embedded images of the document body in reading order, with their captions."""
+    with zipfile.ZipFile(path) as z:
+        rels = _relationships(z)
+        body = ET.fromstring(z.read("word/document.xml")).find(W + "body")
+        # (pointer, text, image targets) per top-level paragraph or table
+        blocks: list[tuple[str, str, list[str]]] = []
+        n_para = 0
+        for el in body if body is not None else []:
+            if el.tag not in (W + "p", W + "tbl"):
+                continue
+            text = " ".join(_text(el).split()) if el.tag == W + "p" else ""
+            pointer = ""
+            if text:
+                n_para += 1
+                pointer = f"[para{n_para}]"
+            blocks.append((pointer, text, [rels[r] for r in _image_ids(el) if r in rels]))
+        figures: list[DocxFigure] = []
+        seen: set[str] = set()
+        for i, (_, _, targets) in enumerate(blocks):
+            for name in targets:
+                if name in seen:
+                    continue  # the same image placed twice
+                seen.add(name)
+                caption, pointer = _caption_for(blocks, i)
+                figures.append(DocxFigure(name=name, caption=caption, pointer=pointer))
+    return figures
+
+def _decode_to_png(data: bytes) -> bytes | None:
+    try:
+        import fitz  # PyMuPDF decodes GIF/BMP/TIFF without any page rendering
+        pix = fitz.Pixmap(data)
+        if pix.alpha or pix.n > 3:
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        return pix.tobytes("png")
+    except Exception as e:
+        logging.info(f"Could not decode image: {e}")
+        return None
+
+def extract_docx_figures(
+    path: str | Path,
+    output_dir: Path,
+    budget: VisionBudget | None = None,
+) -> list[DocxFigure]:
+    """Writes the DOCX's figures for the VLM, in document order and within the budget.
+
+    Captioned images come first when the budget cannot take them all.
+    """
+    budget = budget or VisionBudget()
+    output_dir.mkdir(parents=True, exist_ok=True)
+    candidates: list[tuple[DocxFigure, bytes, str]] = []
+    skipped: list[str] = []
+    with zipfile.ZipFile(path) as z:
+        for fig in docx_figures(path):
+            ext = posixpath.splitext(fig.name)[1].lower()
+            try:
+                data = z.read(fig.name)
+            except KeyError:
+                continue
+            if ext in DIRECT_FORMATS:
+                out_ext = ".jpg" if DIRECT_FORMATS[ext] == "jpeg" else ".png"
+            elif ext in DECODE_FORMATS:
+                data, out_ext = _decode_to_png(data), ".png"
+            else:
+                data = None
+            size = image_size(data) if data else None
+            if not size:
+                skipped.append(posixpath.basename(fig.name))
+                continue
+            fig.width, fig.height = size
+            if fig.pixels >= MIN_FIGURE_PIXELS:
+                candidates.append((fig, data, out_ext))
+    if skipped:
+        logging.warning(f"⚠️ DOCX: {len(skipped)} image(s) in formats the VLM cannot read were skipped: {', '.join(skipped[:5])}")
+    order = sorted(range(len(candidates)), key=lambda k: (not candidates[k][0].caption, k))
+    chosen = {id(f) for f in fit_budget([candidates[k][0] for k in order], budget)}
+    figures = []
+    for k, (fig, data, out_ext) in enumerate(candidates):
+        if id(fig) not in chosen:
+            continue
+        out_path = output_dir / f"figure_{k + 1}{out_ext}"
+        out_path.write_bytes(data)
+        fig.path = str(out_path)
+        figures.append(fig)
+    return figures
+
+def caption_label(fig: DocxFigure) -> str:
+    return f"{excerpt(fig.caption, 200)} {fig.pointer}" if fig.caption else "(no caption found)"
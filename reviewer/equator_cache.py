@@ -1,25 +1,64 @@
 from __future__ import annotations
+import functools
+import hashlib
 import json
+import logging
+import os
 import re
+import time
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-import requests
-from bs4 import BeautifulSoup
+
+# EQUATOR reporting-guideline index and the design -> guideline matcher.
+#
+# build_equator_index() scrapes the EQUATOR library page into
+# cache/equator_index.json. Refreshes are conditional (ETag /
+# Last-Modified): a 304, an unchanged page or a failed download keeps the
+# previous index, so a flaky network never leaves the pipeline without one.
+# The file also carries compiled lookups (normalized acronym, title token and
+# acronym trigram -> item ids) so loading it is a json.loads, not a re-parse.
+#
+# match_guidelines() maps the intake (--study_design, --has_ai) onto
+# config/guidelines/equator_mapping.json and links each named guideline to its
+# EQUATOR page. It is a few dict lookups, memoized per (design, AI) pair;
+# choosing the guideline never costs an LLM call.
 
 EQUATOR_URL = "https://www.equator-network.org/reporting-guidelines/"
+EQUATOR_SITE = "https://www.equator-network.org"
+INDEX_VERSION = 2
+
+_ROOT = Path(__file__).parent.parent
+DEFAULT_INDEX = _ROOT / "cache" / "equator_index.json"
+MAPPING_PATH = _ROOT / "config" / "guidelines" / "equator_mapping.json"
+
+# AI-in-imaging overlay added to whatever the design calls for when --has_ai.
+AI_IMAGING_GUIDELINE = "CLAIM"
 
 def _acronym_from_title(title: str) -> str | None:
     m = re.search(r"\(([^)]+)\)", title)
-    if not m:
-        return None
-    cand = m.group(1).strip()
-    if 2 <= len(cand) <= 25:
-        return cand
-    return None
-
-def build_equator_index(out: str | Path) -> None:
-    r = requests.get(EQUATOR_URL, timeout=60)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "lxml")
+    if m:
+        cand = m.group(1).strip()
+        if 2 <= len(cand) <= 25:
+            return cand
+    # "STARD 2015: An updated list ..." / "CONSORT 2010 Statement: ..."
+    m = re.match(r"([A-Z][A-Z0-9+\-]{2,24})\b", title)
+    return m.group(1) if m else None
+
+def normalize_acronym(name: str) -> str:
+    """'STARD 2015' -> 'STARD2015'; 'TRIPOD+AI', 'tripod-ai' -> 'TRIPODAI'."""
+    return re.sub(r"[^A-Z0-9]", "", name.upper())
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def _trigrams(text: str) -> set[str]:
+    s = f"  {text} "
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def _parse_items(html: str) -> list[dict]:
+    # Only the refresh needs BeautifulSoup; the review imports this module for matching.
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "lxml")
     items = []
     seen = set()
     for a in soup.select("a[href^='/reporting-guidelines/']"):
@@ -27,19 +66,281 @@ def build_equator_index(out: str | Path) -> None:
         text = " ".join((a.get_text() or "").split())
         if not text or href == "/reporting-guidelines/":
             continue
-        url = "https://www.equator-network.org" + href
+        url = EQUATOR_SITE + href
         key = (text, url)
         if key in seen:
             continue
         seen.add(key)
         items.append({"title": text, "url": url, "acronym": _acronym_from_title(text)})
-    Path(out).parent.mkdir(parents=True, exist_ok=True)
-    Path(out).write_text(json.dumps({"source": EQUATOR_URL, "count": len(items), "items": items}, indent=2), encoding="utf-8")
+    return items
+
+def compile_index(items: list[dict]) -> dict:
+    acronyms: dict[str, list[int]] = {}
+    tokens: dict[str, list[int]] = {}
+    trigrams: dict[str, list[int]] = {}
+    for i, it in enumerate(items):
+        acr = normalize_acronym(it.get("acronym") or "")
+        if acr:
+            acronyms.setdefault(acr, []).append(i)
+            for g in _trigrams(acr):
+                trigrams.setdefault(g, []).append(i)
+        for t in sorted(set(_tokens(it.get("title") or ""))):
+            tokens.setdefault(t, []).append(i)
+    return {"acronyms": acronyms, "tokens": tokens, "trigrams": trigrams}
+
+def _digest(items: list[dict]) -> str:
+    return hashlib.sha256(json.dumps(items, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _read_index(path: Path) -> dict | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def _write_index(path: Path, data: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+def build_equator_index(out: str | Path = DEFAULT_INDEX, url: str = EQUATOR_URL, force: bool = False,
+                        timeout: float = 60) -> str:
+    """Refreshes the index at `out`; returns 'updated', 'unchanged' or 'kept' (download failed)."""
+    import requests  # like bs4, only a refresh needs it; the review imports this module for matching
+    out = Path(out)
+    prev = _read_index(out)
+    usable = prev is not None and prev.get("version") == INDEX_VERSION and prev.get("items")
+    headers = {}
+    if usable and not force:
+        if prev.get("etag"):
+            headers["If-None-Match"] = prev["etag"]
+        if prev.get("last_modified"):
+            headers["If-Modified-Since"] = prev["last_modified"]
+
+    try:
+        r = requests.get(url, headers=headers, timeout=timeout)
+        if r.status_code == 304 and usable:
+            prev["checked_at"] = time.time()
+            _write_index(out, prev)
+            return "unchanged"
+        r.raise_for_status()
+        items = _parse_items(r.text)
+        if not items:
+            raise ValueError("no guideline links found on the page")
+    except (requests.RequestException, ValueError) as e:
+        if not usable:
+            raise
+        logging.warning(f"⚠️ EQUATOR refresh failed ({e}); keeping the index from {out}.")
+        return "kept"
+
+    digest = _digest(items)
+    status = "unchanged" if usable and prev.get("digest") == digest else "updated"
+    data = prev if status == "unchanged" else {
+        "version": INDEX_VERSION, "source": url, "count": len(items), "digest": digest,
+        "items": items, "compiled": compile_index(items),
+    }
+    data.update(etag=r.headers.get("ETag"), last_modified=r.headers.get("Last-Modified"), checked_at=time.time())
+    _write_index(out, data)
+    return status
+
+class EquatorIndex:
+    def __init__(self, items: list[dict], compiled: dict | None = None):
+        self.items = items
+        compiled = compiled or compile_index(items)
+        self.acronyms: dict[str, list[int]] = compiled["acronyms"]
+        self.tokens: dict[str, list[int]] = compiled["tokens"]
+        self.trigrams: dict[str, list[int]] = compiled["trigrams"]
+
+    def by_acronym(self, name: str) -> dict | None:
+        ids = self.acronyms.get(normalize_acronym(name))
+        return self.items[ids[0]] if ids else None
+
+    def search(self, query: str, k: int = 5) -> list[dict]:
+        """Items whose titles contain the most query tokens (ties keep page order)."""
+        hits: dict[int, int] = {}
+        for t in set(_tokens(query)):
+            for i in self.tokens.get(t, ()):
+                hits[i] = hits.get(i, 0) + 1
+        ranked = sorted(hits, key=lambda i: (-hits[i], i))
+        return [self.items[i] for i in ranked[:k]]
+
+    def lookup(self, name: str, min_similarity: float = 0.75) -> dict | None:
+        """Best item for a guideline name: exact acronym, then without the year, then trigram match.
+
+        The similarity floor is high on purpose: "CONSORT-AI" must not resolve to CONSORT's page.
+        """
+        hit = self.by_acronym(name)
+        if hit:
+            return hit
+        bare = re.sub(r"\s+(19|20)\d\d$", "", name.strip())
+        if bare != name.strip() and (hit := self.by_acronym(bare)):
+            return hit
+        grams = _trigrams(normalize_acronym(bare))
+        counts: dict[int, int] = {}
+        for g in grams:
+            for i in self.trigrams.get(g, ()):
+                counts[i] = counts.get(i, 0) + 1
+        best, best_sim = None, min_similarity
+        for i, shared in counts.items():
+            other = len(_trigrams(normalize_acronym(self.items[i]["acronym"])))
+            sim = shared / (len(grams) + other - shared)
+            if sim > best_sim:
+                best, best_sim = i, sim
+        return self.items[best] if best is not None else None
+
+@functools.lru_cache(maxsize=4)
+def _load_index(path: Path, mtime_ns: int) -> EquatorIndex | None:
+    data = _read_index(path)
+    if not data or not data.get("items"):
+        return None
+    # Version-1 files (plain item list) are compiled in memory.
+    compiled = data.get("compiled") if data.get("version") == INDEX_VERSION else None
+    return EquatorIndex(data["items"], compiled)
+
+def load_index(path: str | Path = DEFAULT_INDEX) -> EquatorIndex | None:
+    path = Path(path)
+    try:
+        return _load_index(path, path.stat().st_mtime_ns)
+    except OSError:
+        return None
+
+# ---------------------------------------------------------------------------
+# Study design -> guideline
+# ---------------------------------------------------------------------------
+
+# The app's STUDY_DESIGNS, then keyword rules for free-text --study_design.
+DESIGN_KEYS = {
+    "prospective cohort": "observational",
+    "retrospective cohort": "observational",
+    "case-control": "observational",
+    "cross-sectional": "observational",
+    "randomized controlled trial": "rct",
+    "non-randomized interventional": "observational",
+    "diagnostic accuracy": "diagnostic_accuracy",
+    "systematic review / meta-analysis": "systematic_review",
+    "quality improvement / audit": "quality_improvement",
+    "educational intervention": "education",
+    "phantom / simulation study": None,
+    "technical development / validation": None,
+    "not specified": None,
+}
+DESIGN_RULES = [
+    (re.compile(r"\brandomi[sz]ed|\brct\b"), "rct"),
+    (re.compile(r"systematic|meta-?analy|scoping"), "systematic_review"),
+    (re.compile(r"diagnos|accuracy|sensitivity|specificity|reader study"), "diagnostic_accuracy"),
+    (re.compile(r"predict|prognos|risk model"), "prediction_model"),
+    (re.compile(r"quality improvement|\baudit"), "quality_improvement"),
+    (re.compile(r"qualitative|interview|focus group"), "qualitative"),
+    (re.compile(r"educat|curricul|training|learner"), "education"),
+    (re.compile(r"cohort|case-control|cross-sectional|observational|registry"), "observational"),
+]
+
+@dataclass
+class GuidelineSelection:
+    design: str
+    key: str | None
+    primary: str | None = None
+    extensions: list[str] = field(default_factory=list)
+    conditional: list[str] = field(default_factory=list)  # "NAME (when ...)" to apply if the manuscript fits
+    notes: list[str] = field(default_factory=list)
+    links: dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def to_prompt(self) -> str:
+        if not self.primary:
+            lines = [f"Design: {self.design or 'Not specified'} (no design-specific guideline pre-selected)",
+                     "Identify the design from the manuscript, then select 1 primary guideline + 0–2 extensions."]
+            if self.extensions:
+                lines.append("Always apply: " + "; ".join(self._linked(n) for n in self.extensions))
+            return "\n".join(lines)
+        lines = [f"Design: {self.design}", f"Primary: {self._linked(self.primary)}"]
+        if self.extensions:
+            lines.append("Extensions: " + "; ".join(self._linked(n) for n in self.extensions))
+        if self.conditional:
+            lines.append("If applicable: " + "; ".join(self.conditional))
+        if self.notes:
+            lines.append("Focus: " + "; ".join(self.notes))
+        return "\n".join(lines)
+
+    def _linked(self, name: str) -> str:
+        url = self.links.get(name)
+        return f"{name} <{url}>" if url else name
+
+def _split_extension(ext: str) -> tuple[str, str]:
+    m = re.match(r"(.+?)\s*\(([^)]*)\)\s*$", ext)
+    return (m.group(1).strip(), m.group(2).strip()) if m else (ext.strip(), "")
+
+class GuidelineMatcher:
+    def __init__(self, mapping: dict, index: EquatorIndex | None = None):
+        self.mapping = mapping
+        self.index = index
+        self._memo: dict[tuple[str, bool], GuidelineSelection] = {}
+
+    def design_key(self, design: str | None) -> str | None:
+        d = " ".join((design or "").lower().split())
+        if d in DESIGN_KEYS:
+            return DESIGN_KEYS[d]
+        for pattern, key in DESIGN_RULES:
+            if pattern.search(d):
+                return key
+        return None
+
+    def match(self, design: str | None, has_ai: bool = False) -> GuidelineSelection:
+        memo_key = (design or "", bool(has_ai))
+        if memo_key not in self._memo:
+            self._memo[memo_key] = self._match(design or "", bool(has_ai))
+        return self._memo[memo_key]
+
+    def _match(self, design: str, has_ai: bool) -> GuidelineSelection:
+        key = self.design_key(design)
+        entry = self.mapping.get(key) if key else None
+        sel = GuidelineSelection(design=design, key=key if entry else None)
+        if entry:
+            sel.primary = entry.get("primary")
+            sel.notes = list(entry.get("notes", []))
+            for ext in entry.get("extensions", []):
+                name, cond = _split_extension(ext)
+                ai_only = "if AI" in cond
+                rest = ", ".join(p.strip() for p in cond.split(",") if p.strip() and p.strip() != "if AI")
+                if ai_only and not has_ai:
+                    continue
+                if rest:
+                    sel.conditional.append(f"{name} ({rest})")
+                else:
+                    sel.extensions.append(name)
+        if has_ai and AI_IMAGING_GUIDELINE not in sel.extensions:
+            sel.extensions.append(AI_IMAGING_GUIDELINE)
+        if self.index is not None:
+            for name in [sel.primary or "", *sel.extensions]:
+                for part in name.split("/"):
+                    hit = self.index.lookup(part) if part else None
+                    if hit:
+                        sel.links[name] = hit["url"]
+                        break
+        return sel
+
+@functools.lru_cache(maxsize=4)
+def _matcher(mapping_path: Path, mapping_mtime_ns: int, index: EquatorIndex | None) -> GuidelineMatcher:
+    return GuidelineMatcher(json.loads(mapping_path.read_text(encoding="utf-8")), index)
+
+def match_guidelines(study_design: str | None, has_ai: bool = False, mapping_path: str | Path = MAPPING_PATH,
+                     index_path: str | Path = DEFAULT_INDEX) -> GuidelineSelection:
+    """Guideline selection for the intake; the EQUATOR links are omitted if no index has been built."""
+    mapping_path = Path(mapping_path)
+    try:
+        mtime = mapping_path.stat().st_mtime_ns
+    except OSError:
+        logging.warning(f"⚠️ {mapping_path} not found; no guideline pre-selection.")
+        return GuidelineSelection(design=study_design or "", key=None)
+    return _matcher(mapping_path, mtime, load_index(index_path)).match(study_design, has_ai)
 
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="cache/equator_index.json")
+    ap.add_argument("--force", action="store_true", help="Re-download even if the page is unchanged")
     args = ap.parse_args()
-    build_equator_index(args.out)
-    print(f"Wrote {args.out}")
+    status = build_equator_index(args.out, force=args.force)
+    print(f"{args.out}: {status}")
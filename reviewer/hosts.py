@@ -0,0 +1,235 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator
+from urllib.parse import urlparse
+
+# Several Ollama hosts behind one Transport.
+#
+# Hosts come from --ollama_url "http://a:11434,http://b:11434" or from
+# $OLLAMA_HOSTS. Each request is routed by its "model": first to a healthy
+# host that already has it loaded (/api/ps), then one that has it installed
+# (/api/tags), then any healthy host, fewest requests in flight first. A host
+# that refuses the connection, times out or answers 5xx/404 is marked down and
+# the request is retried on the next candidate.
+
+DEFAULT_HOST = "http://localhost:11434"
+DEFAULT_DAEMON_URL = "http://127.0.0.1:8765"
+PROBE_INTERVAL_S = 10.0
+PROBE_TIMEOUT_S = 2.0
+
+def normalize_url(host: str) -> str:
+    # Accept "host:port" without a scheme, the way the ollama CLI reads OLLAMA_HOST
+    host = host.strip()
+    if "://" not in host:
+        host = f"http://{host}"
+    return host.rstrip("/")
+
+def parse_hosts(value: str | None) -> list[str]:
+    return [normalize_url(h) for h in (value or "").split(",") if h.strip()]
+
+def ollama_hosts() -> list[str]:
+    """$OLLAMA_HOSTS (comma-separated), else $OLLAMA_HOST, else localhost."""
+    return parse_hosts(os.environ.get("OLLAMA_HOSTS")) or parse_hosts(os.environ.get("OLLAMA_HOST")) or [DEFAULT_HOST]
+
+def daemon_url() -> str:
+    """The resident reviewer daemon (reviewer/daemon.py): $REVIEWER_DAEMON_URL, else localhost:8765."""
+    return normalize_url(os.environ.get("REVIEWER_DAEMON_URL") or DEFAULT_DAEMON_URL)
+
+def model_key(name: str) -> str:
+    return name if ":" in name else f"{name}:latest"
+
+def _get_json(url: str, timeout: float) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+@dataclass
+class HostState:
+    url: str
+    healthy: bool = True
+    loaded: set[str] = field(default_factory=set)
+    installed: set[str] = field(default_factory=set)
+    inflight: int = 0
+    requests: int = 0
+    failures: int = 0
+    last_error: str = ""
+    checked_at: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "loaded": sorted(self.loaded),
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+class HostPool:
+    def __init__(self, urls: list[str], probe_interval_s: float = PROBE_INTERVAL_S):
+        if not urls:
+            raise ValueError("HostPool needs at least one base URL")
+        self.hosts = [HostState(normalize_url(u)) for u in urls]
+        self.probe_interval_s = probe_interval_s
+        self._lock = threading.Lock()
+        self._probing = threading.Lock()
+        self._probed_at = 0.0
+
+    def _probe(self, host: HostState) -> None:
+        try:
+            ps = _get_json(f"{host.url}/api/ps", PROBE_TIMEOUT_S)
+            tags = _get_json(f"{host.url}/api/tags", PROBE_TIMEOUT_S)
+        except (OSError, ValueError) as e:
+            with self._lock:
+                host.healthy = False
+                host.last_error = str(e)
+                host.checked_at = time.time()
+            return
+        with self._lock:
+            host.healthy = True
+            host.loaded = {model_key(m.get("name") or m.get("model", "")) for m in ps.get("models", [])}
+            host.installed = {model_key(m.get("name") or m.get("model", "")) for m in tags.get("models", [])}
+            host.checked_at = time.time()
+
+    def refresh(self, force: bool = False) -> None:
+        """Re-probes every host (concurrently) if the last probe is older than probe_interval_s."""
+        with self._probing:
+            if not force and time.time() - self._probed_at < self.probe_interval_s:
+                return
+            with ThreadPoolExecutor(max_workers=len(self.hosts)) as pool:
+                list(pool.map(self._probe, self.hosts))
+            self._probed_at = time.time()
+
+    def candidates(self, model: str | None, exclude: set[str] = frozenset()) -> list[HostState]:
+        """Healthy hosts in routing order for this model; all hosts if none look healthy."""
+        self.refresh()
+        key = model_key(model) if model else None
+        with self._lock:
+            pool = [h for h in self.hosts if h.url not in exclude]
+            healthy = [h for h in pool if h.healthy] or pool
+
+            def rank(h: HostState):
+                residency = 0 if key in h.loaded else (1 if key in h.installed else 2)
+                return (residency, h.inflight, self.hosts.index(h))
+
+            return sorted(healthy, key=rank) if key else sorted(healthy, key=lambda h: h.inflight)
+
+    def started(self, host: HostState) -> None:
+        with self._lock:
+            host.inflight += 1
+            host.requests += 1
+
+    def finished(self, host: HostState, model: str | None, error: Exception | None = None) -> None:
+        with self._lock:
+            host.inflight -= 1
+            if error is None:
+                host.healthy = True
+                if model:
+                    # Ollama keeps the model resident after a call, so later stages stick to this host.
+                    host.loaded.add(model_key(model))
+            else:
+                host.failures += 1
+                host.last_error = str(error)
+                if _status(error) == 404:
+                    # The host is fine, it just does not have this model.
+                    host.installed.discard(model_key(model or ""))
+                else:
+                    host.healthy = False
+                if model:
+                    host.loaded.discard(model_key(model))
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            return [h.to_dict() for h in self.hosts]
+
+_POOLS: dict[tuple[str, ...], HostPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+def get_pool(urls: list[str]) -> HostPool:
+    """One pool per host list per process, so the daemon keeps health/residency between reviews."""
+    key = tuple(normalize_url(u) for u in urls)
+    with _POOLS_LOCK:
+        if key not in _POOLS:
+            _POOLS[key] = HostPool(list(key))
+        return _POOLS[key]
+
+def _status(e: Exception) -> int | None:
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+def _retryable(e: Exception) -> bool:
+    # requests' exceptions derive from OSError; 4xx other than 404 ("model not
+    # found" on that host) would fail the same way everywhere.
+    if not isinstance(e, OSError):
+        return False
+    status = _status(e)
+    return status is None or status >= 500 or status == 404
+
+class PoolTransport:
+    """Transport that sends each request to the best host in a HostPool, failing over on errors."""
+
+    def __init__(self, pool: HostPool, inner=None):
+        from .ollama import HTTP
+        self.pool = pool
+        self.inner = inner or HTTP
+
+    @staticmethod
+    def _on(host: HostState, url: str) -> str:
+        return host.url + urlparse(url).path
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict:
+        model = payload.get("model")
+        tried: set[str] = set()
+        while True:
+            hosts = self.pool.candidates(model, tried)
+            if not hosts:
+                raise ConnectionError(f"No Ollama host left to try for {model}")
+            host = hosts[0]
+            tried.add(host.url)
+            self.pool.started(host)
+            try:
+                body = self.inner.post_json(self._on(host, url), payload, timeout)
+            except Exception as e:
+                self.pool.finished(host, model, e)
+                if not _retryable(e) or len(tried) == len(self.pool.hosts):
+                    raise
+                logging.warning(f"⚠️ {host.url} failed for {model} ({e}); retrying on another host.")
+                continue
+            except BaseException:  # cancelled: not the host's fault
+                self.pool.finished(host, model)
+                raise
+            self.pool.finished(host, model)
+            return body
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]:
+        model = payload.get("model")
+        tried: set[str] = set()
+        while True:
+            hosts = self.pool.candidates(model, tried)
+            if not hosts:
+                raise ConnectionError(f"No Ollama host left to try for {model}")
+            host = hosts[0]
+            tried.add(host.url)
+            self.pool.started(host)
+            started = False
+            try:
+                for chunk in self.inner.post_stream(self._on(host, url), payload, timeout):
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self.pool.finished(host, model, e)
+                # Once tokens have been handed to the caller a retry would duplicate them.
+                if started or not _retryable(e) or len(tried) == len(self.pool.hosts):
+                    raise
+                logging.warning(f"⚠️ {host.url} failed for {model} ({e}); retrying on another host.")
+                continue
+            except BaseException:  # closed by the reader, or cancelled
+                self.pool.finished(host, model)
+                raise
+            self.pool.finished(host, model)
+            return
@@ -1,41 +1,95 @@
 from __future__ import annotations
-from dataclasses import dataclass
+import re
+from dataclasses import dataclass, field
 from pathlib import Path
-import fitz  # pymupdf
-from docx import Document
 
 @dataclass
 class TextUnit:
     pointer: str
     text: str
+    page: int | None = None  # 0-based PDF page
+
+@dataclass
+class Table:
+    pointer: str
+    rows: list[list[str]]
+    page: int | None = None  # 0-based PDF page; None for DOCX tables
+    bbox: tuple[float, float, float, float] | None = None
+
+    def to_markdown(self) -> str:
+        width = max(len(r) for r in self.rows)
+
+        def line(cells: list[str]) -> str:
+            cells = [c.replace("|", "\\|") for c in cells] + [""] * (width - len(cells))
+            return "| " + " | ".join(cells) + " |"
+
+        return "\n".join([self.pointer, line(self.rows[0]), "|" + "---|" * width, *(line(r) for r in self.rows[1:])])
+
+def tables_markdown(tables: list[Table], max_chars: int = 8000) -> str:
+    """The tables as Markdown, in page order, stopping before max_chars."""
+    parts: list[str] = []
+    used = 0
+    for i, t in enumerate(tables):
+        md = t.to_markdown()
+        if used + len(md) > max_chars:
+            parts.append(f"({len(tables) - i} more table(s) omitted: {', '.join(x.pointer for x in tables[i:])})")
+            break
+        parts.append(md)
+        used += len(md) + 2
+    return "\n\n".join(parts)
 
 @dataclass
 class Manuscript:
     path: Path
     units: list[TextUnit]
+    tables: list[Table] = field(default_factory=list)
 
 def _clean(s: str) -> str:
     return " ".join(s.replace("\x00", " ").split())
 
-def load_manuscript(path: str | Path) -> Manuscript:
+# Table detection costs ~10 ms a page, so it only runs where a caption is mentioned.
+_TABLE_MENTION = re.compile(r"\btable\s*\d", re.IGNORECASE)
+
+def _pdf_tables(page, pointer: str) -> list[Table]:
+    out = []
+    for k, t in enumerate(page.find_tables().tables, start=1):
+        rows = [[_clean(c or "") for c in row] for row in t.extract()]
+        rows = [r for r in rows if any(r)]
+        if len(rows) >= 2:
+            out.append(Table(pointer=f"{pointer}t{k}", rows=rows, page=page.number, bbox=tuple(t.bbox)))
+    return out
+
+def load_manuscript(path: str | Path, tables: bool = False) -> Manuscript:
+    """Text units per page/paragraph; with tables=True also the tables (PyMuPDF-detected for PDFs, native for DOCX)."""
     p = Path(path).expanduser().resolve()
     suf = p.suffix.lower()
     units: list[TextUnit] = []
+    found: list[Table] = []
     if suf == ".pdf":
+        import fitz  # pymupdf; heavy, so only loaded for PDFs
         doc = fitz.open(p)
         for i, page in enumerate(doc):
             txt = _clean(page.get_text("text") or "")
             if txt:
-                units.append(TextUnit(pointer=f"[p{i+1}]", text=txt))
+                units.append(TextUnit(pointer=f"[p{i+1}]", text=txt, page=i))
+            if tables and _TABLE_MENTION.search(txt):
+                found.extend(_pdf_tables(page, f"[p{i+1}]"))
     elif suf == ".docx":
+        from docx import Document
         doc = Document(str(p))
         paras = [x.text for x in doc.paragraphs if x.text and x.text.strip()]
         for i, t in enumerate(paras):
             units.append(TextUnit(pointer=f"[para{i+1}]", text=_clean(t)))
+        if tables:
+            for k, t in enumerate(doc.tables, start=1):
+                rows = [[_clean(c.text) for c in row.cells] for row in t.rows]
+                rows = [r for r in rows if any(r)]
+                if len(rows) >= 2:
+                    found.append(Table(pointer=f"[table{k}]", rows=rows))
     elif suf in {".txt", ".md"}:
         txt = _clean(p.read_text(encoding="utf-8", errors="ignore"))
         if txt:
             units.append(TextUnit(pointer="[full]", text=txt))
     else:
         raise ValueError(f"Unsupported file type: {suf}")
-    return Manuscript(path=p, units=units)
+    return Manuscript(path=p, units=units, tables=found)
@@ -0,0 +1,433 @@
+from __future__ import annotations
+import json
+import os
+import signal
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+# Local job queue shared by every app session on this workstation.
+# The app only inserts rows; a single detached worker process claims them and
+# runs `reviewer.cli`, so reviews survive browser refreshes and Streamlit reruns.
+# The worker holds a lease (its heartbeat row), taken and renewed in a
+# BEGIN IMMEDIATE transaction, so of two workers started by concurrent reruns
+# one gets it and the other exits. Jobs are only claimed while the number of
+# running rows is below max_concurrency, checked in the claiming transaction.
+# Cancelling a running job sets it to 'cancelling'; the worker then signals the
+# review process, which aborts its model calls and marks its partial outputs,
+# and kills it if it has not exited after CANCEL_GRACE_S.
+
+ACTIVE_STATES = ("queued", "running", "cancelling")
+FINAL_STATES = ("done", "failed", "cancelled")
+HEARTBEAT_STALE_S = 15.0
+CANCEL_GRACE_S = 20.0
+CLAIM_GRACE_S = 30.0  # a just-claimed job has no pid until its process has been started
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    label TEXT NOT NULL,
+    owner TEXT NOT NULL DEFAULT '',
+    cmd TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'queued',
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    returncode INTEGER,
+    pid INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, id);
+CREATE TABLE IF NOT EXISTS settings (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+@dataclass
+class Job:
+    id: int
+    label: str
+    owner: str
+    cmd: list[str]
+    output_dir: Path
+    state: str
+    created_at: float
+    started_at: float | None
+    finished_at: float | None
+    returncode: int | None
+    pid: int | None
+    error: str | None
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+def _row_to_job(row: sqlite3.Row) -> Job:
+    return Job(
+        id=row["id"],
+        label=row["label"],
+        owner=row["owner"],
+        cmd=json.loads(row["cmd"]),
+        output_dir=Path(row["output_dir"]),
+        state=row["state"],
+        created_at=row["created_at"],
+        started_at=row["started_at"],
+        finished_at=row["finished_at"],
+        returncode=row["returncode"],
+        pid=row["pid"],
+        error=row["error"],
+    )
+
+def _pid_alive(pid: int | None) -> bool:
+    if not pid:
+        return False
+    if os.name == "nt":
+        import ctypes
+        PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+        STILL_ACTIVE = 259
+        h = ctypes.windll.kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not h:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(h, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(h)
+        return code.value == STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _lease_live(hb: dict) -> bool:
+    return time.time() - float(hb.get("ts", 0)) < HEARTBEAT_STALE_S and _pid_alive(hb.get("pid"))
+
+def _concurrency(value: str | None) -> int:
+    try:
+        return max(1, int(value or 1))
+    except ValueError:
+        return 1
+
+_RUNNING_SQL = "SELECT COUNT(*) FROM jobs WHERE state IN ('running', 'cancelling')"
+
+class JobQueue:
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        con = self._connect()
+        try:
+            con.executescript(_SCHEMA)
+        finally:
+            con.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        con = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("PRAGMA synchronous=NORMAL")
+        return con
+
+    @contextmanager
+    def _tx(self):
+        con = self._connect()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+
+    # --- settings ---
+    def get_setting(self, key: str, default: str | None = None) -> str | None:
+        con = self._connect()
+        try:
+            row = con.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
+        finally:
+            con.close()
+        return row["value"] if row else default
+
+    def set_setting(self, key: str, value: str) -> None:
+        with self._tx() as con:
+            con.execute(
+                "INSERT INTO settings(key, value) VALUES(?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (key, value),
+            )
+
+    @property
+    def max_concurrency(self) -> int:
+        return _concurrency(self.get_setting("max_concurrency"))
+
+    @max_concurrency.setter
+    def max_concurrency(self, n: int) -> None:
+        self.set_setting("max_concurrency", str(max(1, int(n))))
+
+    # --- jobs ---
+    def submit(self, label: str, cmd: list[str], output_dir: str | Path, owner: str = "") -> int:
+        with self._tx() as con:
+            cur = con.execute(
+                "INSERT INTO jobs(label, owner, cmd, output_dir, state, created_at) VALUES(?, ?, ?, ?, 'queued', ?)",
+                (label, owner, json.dumps(cmd), str(output_dir), time.time()),
+            )
+            return int(cur.lastrowid)
+
+    def get(self, job_id: int) -> Job | None:
+        con = self._connect()
+        try:
+            row = con.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+        finally:
+            con.close()
+        return _row_to_job(row) if row else None
+
+    def list_jobs(self, limit: int = 50) -> list[Job]:
+        con = self._connect()
+        try:
+            rows = con.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        finally:
+            con.close()
+        return [_row_to_job(r) for r in rows]
+
+    def position(self, job_id: int) -> int | None:
+        """1-based place in the queue, or None once the job has left the queue."""
+        con = self._connect()
+        try:
+            row = con.execute("SELECT state FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if not row or row["state"] != "queued":
+                return None
+            n = con.execute("SELECT COUNT(*) FROM jobs WHERE state='queued' AND id<?", (job_id,)).fetchone()[0]
+        finally:
+            con.close()
+        return int(n) + 1
+
+    def running_count(self) -> int:
+        """Jobs holding a slot: running, or cancelling until their process exits."""
+        con = self._connect()
+        try:
+            return int(con.execute(_RUNNING_SQL).fetchone()[0])
+        finally:
+            con.close()
+
+    def claim_next(self) -> Job | None:
+        """Atomically move the next queued job to 'running', if fewer than max_concurrency hold a slot.
+
+        Owners with fewer running jobs go first, so one person's batch cannot
+        starve a colleague's single review; ties are broken by submission order.
+        """
+        with self._tx() as con:
+            limit = con.execute("SELECT value FROM settings WHERE key='max_concurrency'").fetchone()
+            if con.execute(_RUNNING_SQL).fetchone()[0] >= _concurrency(limit["value"] if limit else None):
+                return None
+            row = con.execute(
+                """
+                SELECT q.* FROM jobs q
+                LEFT JOIN (SELECT owner, COUNT(*) AS n FROM jobs WHERE state='running' GROUP BY owner) r
+                  ON r.owner = q.owner
+                WHERE q.state='queued'
+                ORDER BY COALESCE(r.n, 0), q.id
+                LIMIT 1
+                """
+            ).fetchone()
+            if not row:
+                return None
+            con.execute("UPDATE jobs SET state='running', started_at=? WHERE id=?", (time.time(), row["id"]))
+        return self.get(row["id"])
+
+    def set_pid(self, job_id: int, pid: int) -> None:
+        with self._tx() as con:
+            con.execute("UPDATE jobs SET pid=? WHERE id=?", (pid, job_id))
+
+    def finish(self, job_id: int, returncode: int | None, error: str | None = None) -> None:
+        state = "done" if returncode == 0 else "failed"
+        with self._tx() as con:
+            con.execute(
+                "UPDATE jobs SET state=CASE state WHEN 'cancelling' THEN 'cancelled' ELSE ? END, "
+                "returncode=?, error=?, finished_at=? WHERE id=? AND state IN ('running', 'cancelling')",
+                (state, returncode, error, time.time(), job_id),
+            )
+
+    def cancel(self, job_id: int) -> None:
+        """Cancel a queued job outright; a running one becomes 'cancelling' until its process exits."""
+        with self._tx() as con:
+            con.execute(
+                "UPDATE jobs SET state='cancelled', finished_at=? WHERE id=? AND state='queued'",
+                (time.time(), job_id),
+            )
+            con.execute("UPDATE jobs SET state='cancelling' WHERE id=? AND state='running'", (job_id,))
+
+    def cancelling_ids(self) -> set[int]:
+        con = self._connect()
+        try:
+            return {int(r["id"]) for r in con.execute("SELECT id FROM jobs WHERE state='cancelling'")}
+        finally:
+            con.close()
+
+    def fail_orphans(self) -> int:
+        """Mark running jobs whose process is gone (e.g. worker killed) as failed, or cancelled if that was asked.
+
+        Jobs claimed less than CLAIM_GRACE_S ago are left alone: their pid may not be recorded yet.
+        """
+        now = time.time()
+        orphans = [j for j in self.list_jobs(limit=1000)
+                   if j.state in ("running", "cancelling") and not _pid_alive(j.pid)
+                   and now - (j.started_at or 0) >= CLAIM_GRACE_S]
+        for j in orphans:
+            self.finish(j.id, j.returncode if j.returncode not in (None, 0) else -1, error="worker lost")
+        return len(orphans)
+
+    # --- worker liveness ---
+    def heartbeat(self) -> bool:
+        """Takes or renews this process's worker lease; False if another live worker holds it."""
+        with self._tx() as con:
+            row = con.execute("SELECT value FROM settings WHERE key='worker_heartbeat'").fetchone()
+            hb = json.loads(row["value"]) if row else {}
+            if hb.get("pid") != os.getpid() and _lease_live(hb):
+                return False
+            con.execute(
+                "INSERT INTO settings(key, value) VALUES('worker_heartbeat', ?) "
+                "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+                (json.dumps({"pid": os.getpid(), "ts": time.time()}),),
+            )
+        return True
+
+    def worker_alive(self) -> bool:
+        raw = self.get_setting("worker_heartbeat")
+        return bool(raw) and _lease_live(json.loads(raw))
+
+def _spawn_job(job: Job, cwd: Path) -> subprocess.Popen:
+    job.output_dir.mkdir(parents=True, exist_ok=True)
+    console = open(job.output_dir / "console_log.txt", "a", encoding="utf-8")
+    kwargs: dict = {}
+    if os.name == "nt":
+        # Own process group, so CTRL_BREAK reaches only this review
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    try:
+        return subprocess.Popen(
+            job.cmd,
+            cwd=str(cwd),
+            stdout=console,
+            stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL,
+            **kwargs,
+        )
+    finally:
+        console.close()
+
+def _interrupt(pid: int | None) -> None:
+    """Asks a review to stop cleanly (see reviewer/cancel.py)."""
+    if not pid:
+        return
+    try:
+        os.kill(pid, signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGTERM)
+    except OSError:
+        pass
+
+def _kill(pid: int | None) -> None:
+    if not pid:
+        return
+    try:
+        os.kill(pid, signal.SIGTERM if os.name == "nt" else signal.SIGKILL)  # TerminateProcess on Windows
+    except OSError:
+        pass
+
+def _adopted_result(job: Job) -> int:
+    # We are not the parent of an adopted review, so its exit code is lost;
+    # a written review file is the best evidence that it completed.
+    return 0 if any(job.output_dir.glob("Review_*.md")) else -1
+
+def run_worker(queue: JobQueue, cwd: Path, poll_s: float = 1.0, idle_exit_s: float = 600.0) -> None:
+    if not queue.heartbeat():
+        return  # another worker holds the lease
+    children: dict[int, subprocess.Popen] = {}
+    queue.fail_orphans()
+    # Reviews started by a previous worker that are still running keep their slot.
+    adopted = {j.id: j for j in queue.list_jobs(limit=1000) if j.state in ("running", "cancelling")}
+    interrupted: dict[int, float] = {}  # job id -> when it was signalled
+    idle_since = time.time()
+    while True:
+        if not queue.heartbeat():
+            # Our lease lapsed (e.g. the machine slept) and a new worker took over and adopted our reviews.
+            return
+        for job_id in queue.cancelling_ids():
+            pid = children[job_id].pid if job_id in children else adopted[job_id].pid if job_id in adopted else None
+            if job_id not in interrupted:
+                _interrupt(pid)
+                interrupted[job_id] = time.time()
+            elif time.time() - interrupted[job_id] > CANCEL_GRACE_S:
+                _kill(pid)
+        for job_id, proc in list(children.items()):
+            rc = proc.poll()
+            if rc is not None:
+                queue.finish(job_id, rc)
+                del children[job_id]
+                interrupted.pop(job_id, None)
+        for job_id, job in list(adopted.items()):
+            if job.pid is None and time.time() - (job.started_at or 0) < CLAIM_GRACE_S:
+                # Claimed by the previous worker just before it stopped; its pid may still be recorded
+                job = adopted[job_id] = queue.get(job_id) or job
+                if job.pid is None:
+                    continue
+            if not _pid_alive(job.pid):
+                queue.finish(job_id, _adopted_result(job))
+                del adopted[job_id]
+                interrupted.pop(job_id, None)
+
+        while True:
+            job = queue.claim_next()
+            if job is None:
+                break
+            try:
+                proc = _spawn_job(job, cwd)
+            except Exception as e:
+                queue.finish(job.id, -1, error=str(e))
+                continue
+            queue.set_pid(job.id, proc.pid)
+            children[job.id] = proc
+
+        if children or adopted:
+            idle_since = time.time()
+        elif time.time() - idle_since > idle_exit_s:
+            return
+        time.sleep(poll_s)
+
+def ensure_worker(db_path: str | Path, cwd: str | Path) -> None:
+    """Start the detached queue worker unless a live one is already heartbeating."""
+    queue = JobQueue(db_path)
+    if queue.worker_alive():
+        return
+    cmd = [sys.executable, "-m", "reviewer.jobs", "--db", str(db_path)]
+    kwargs: dict = {"cwd": str(cwd), "stdin": subprocess.DEVNULL, "stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    subprocess.Popen(cmd, **kwargs)
+    # A twin spawned by a concurrent rerun exits on its own (see heartbeat); waiting
+    # for the lease spares the next rerun from spawning another.
+    deadline = time.time() + 5
+    while time.time() < deadline and not queue.worker_alive():
+        time.sleep(0.1)
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Local review job worker")
+    ap.add_argument("--db", default="outputs/_jobs.sqlite3")
+    ap.add_argument("--max_concurrency", type=int, default=None)
+    ap.add_argument("--idle_exit_s", type=float, default=600.0)
+    args = ap.parse_args()
+    q = JobQueue(args.db)
+    if not q.heartbeat():
+        print("A worker is already running for this queue.")
+        sys.exit(0)
+    if args.max_concurrency:
+        q.max_concurrency = args.max_concurrency
+    run_worker(q, cwd=Path(__file__).resolve().parent.parent, idle_exit_s=args.idle_exit_s)
@@ -0,0 +1,465 @@
+from __future__ import annotations
+import gzip
+import heapq
+import json
+import logging
+import mmap
+import re
+import struct
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from .novelty_search import Paper
+
+# Offline literature index for the novelty check on machines without network.
+#
+#   python -m reviewer.literature_index build --out cache/literature_index pubmed25n0001.xml.gz ... works.jsonl
+#   python -m reviewer.literature_index search --index cache/literature_index "PET/CT triage deep learning"
+#
+# Inputs are PubMed baseline XML (.xml / .xml.gz) or JSON lines with title,
+# abstract, doi, year, venue/journal, authors and url/pmid. Title and abstract
+# are indexed for BM25; only the citation fields are stored.
+#
+# On-disk layout (all little-endian, opened with mmap so a query touches only
+# the pages it needs):
+#   meta.json                    counts, avgdl, BM25 parameters, embedding model
+#   terms.bin / terms.off        sorted vocabulary (utf-8) and uint64 offsets
+#   post.off                     uint64 offsets of each term's postings
+#   post.doc / post.imp          uint32 doc ids and uint8 quantized BM25 tf-impacts
+#   docs.bin / docs.off          compact JSON citation per doc and uint64 offsets
+#   vectors.f16                  optional unit-length embeddings, N x dim float16
+#
+# The tf/length part of BM25 is precomputed per posting, so a query is idf x
+# impact summed over a handful of postings lists. The build is SPIMI-style:
+# postings are spilled to sorted blocks every block_docs documents and merged,
+# so memory stays flat for multi-million-record dumps.
+
+INDEX_VERSION = 1
+K1 = 1.2
+B = 0.75
+TITLE_BOOST = 2
+BLOCK_DOCS = 200_000
+RRF_K = 60
+
+STOPWORDS = frozenset("""
+a about after all also an and are as at be been between but by can could did do does for from had has have
+he her his how however if in into is it its may more most no not of on or our she should so such than that
+the their them then there these they this those through to under using was we were what when where which
+while who will with within would
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+# ----------------------------
+# Input readers
+# ----------------------------
+def _authors(value) -> list[str]:
+    if isinstance(value, str):
+        return [a.strip() for a in value.split(";") if a.strip()][:5]
+    out = []
+    for a in value or []:
+        out.append(a if isinstance(a, str) else (a.get("name") or " ".join(filter(None, [a.get("given"), a.get("family")]))))
+    return [a for a in out if a][:5]
+
+def read_jsonl(path: Path) -> Iterator[dict]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            pmid = rec.get("pmid")
+            yield {
+                "title": rec.get("title") or "",
+                "abstract": rec.get("abstract") or "",
+                "doi": rec.get("doi"),
+                "year": str(rec["year"]) if rec.get("year") else None,
+                "venue": rec.get("venue") or rec.get("journal"),
+                "authors": _authors(rec.get("authors")),
+                "url": rec.get("url") or (f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else None),
+            }
+
+def _text(el) -> str:
+    return " ".join("".join(el.itertext()).split()) if el is not None else ""
+
+def read_pubmed_xml(path: Path) -> Iterator[dict]:
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, "rb") as f:
+        for _, el in ET.iterparse(f, events=("end",)):
+            if el.tag != "PubmedArticle":
+                continue
+            art = el.find("MedlineCitation/Article")
+            pmid = _text(el.find("MedlineCitation/PMID"))
+            doi = None
+            for loc in el.iterfind("PubmedData/ArticleIdList/ArticleId"):
+                if loc.get("IdType") == "doi":
+                    doi = _text(loc)
+            if doi is None and art is not None:
+                for loc in art.iterfind("ELocationID"):
+                    if loc.get("EIdType") == "doi":
+                        doi = _text(loc)
+            year = _text(art.find("Journal/JournalIssue/PubDate/Year")) if art is not None else ""
+            if not year and art is not None:
+                year = _text(art.find("Journal/JournalIssue/PubDate/MedlineDate"))[:4]
+            authors = []
+            if art is not None:
+                for a in art.iterfind("AuthorList/Author"):
+                    name = " ".join(filter(None, [_text(a.find("LastName")), _text(a.find("Initials"))])) or _text(a.find("CollectiveName"))
+                    if name:
+                        authors.append(name)
+            yield {
+                "title": _text(art.find("ArticleTitle")) if art is not None else "",
+                "abstract": " ".join(_text(t) for t in art.iterfind("Abstract/AbstractText")) if art is not None else "",
+                "doi": doi,
+                "year": year or None,
+                "venue": _text(art.find("Journal/Title")) if art is not None else None,
+                "authors": authors[:5],
+                "url": f"https://pubmed.ncbi.nlm.nih.gov/{pmid}/" if pmid else None,
+            }
+            el.clear()
+
+def read_records(path: str | Path) -> Iterator[dict]:
+    p = Path(path)
+    name = p.name.lower()
+    if name.endswith((".xml", ".xml.gz")):
+        return read_pubmed_xml(p)
+    if name.endswith((".jsonl", ".jsonl.gz", ".json", ".ndjson")):
+        return read_jsonl(p)
+    raise ValueError(f"Unsupported literature dump: {p} (expected PubMed XML or JSON lines)")
+
+# ----------------------------
+# Build
+# ----------------------------
+_BLOCK_HEAD = struct.Struct("<HI")
+
+def _write_block(path: Path, block: dict[str, tuple[array, array]]) -> None:
+    with open(path, "wb") as f:
+        for term in sorted(block):
+            docs, tfs = block[term]
+            raw = term.encode("utf-8")
+            f.write(_BLOCK_HEAD.pack(len(raw), len(docs)))
+            f.write(raw)
+            f.write(docs.tobytes())
+            f.write(tfs.tobytes())
+
+def _read_block(path: Path) -> Iterator[tuple[bytes, bytes, bytes]]:
+    with open(path, "rb") as f:
+        while True:
+            head = f.read(_BLOCK_HEAD.size)
+            if not head:
+                return
+            tlen, n = _BLOCK_HEAD.unpack(head)
+            yield f.read(tlen), f.read(4 * n), f.read(2 * n)
+
+def build_index(inputs: Iterable[str | Path], out_dir: str | Path, block_docs: int = BLOCK_DOCS,
+                embed_model: str | None = None, embed_backend=None, embed_batch: int = 64) -> dict:
+    """Builds the index in out_dir (replacing any previous one) and returns its meta."""
+    inputs = list(inputs)
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    t0 = time.perf_counter()
+    doclen = array("I")
+    seen_doi: set[str] = set()
+    block: dict[str, tuple[array, array]] = {}
+    blocks: list[Path] = []
+    tmp = Path(tempfile.mkdtemp(prefix="litindex_", dir=out))
+    embed_texts: list[str] = []
+    vec_file = open(out / "vectors.f16", "wb") if embed_model else None
+    dim = 0
+
+    def flush_vectors() -> None:
+        nonlocal dim
+        if not embed_texts:
+            return
+        vecs = np.asarray(embed_backend.embed(embed_model, embed_texts), dtype=np.float32)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-9
+        dim = vecs.shape[1]
+        vec_file.write(vecs.astype(np.float16).tobytes())
+        embed_texts.clear()
+
+    with open(out / "docs.bin", "wb") as docs_bin, open(out / "docs.off", "wb") as docs_off:
+        docs_off.write(struct.pack("<Q", 0))
+        for path in inputs:
+            for rec in read_records(path):
+                title = rec["title"].strip()
+                if not title:
+                    continue
+                doi = (rec.get("doi") or "").strip().lower() or None
+                if doi:
+                    # Baseline updates repeat records; keep the first copy.
+                    if doi in seen_doi:
+                        continue
+                    seen_doi.add(doi)
+                doc_id = len(doclen)
+                tf: dict[str, int] = {}
+                for t in tokenize(title):
+                    tf[t] = tf.get(t, 0) + TITLE_BOOST
+                for t in tokenize(rec.get("abstract") or ""):
+                    tf[t] = tf.get(t, 0) + 1
+                doclen.append(sum(tf.values()))
+                for term, n in tf.items():
+                    entry = block.get(term)
+                    if entry is None:
+                        entry = block[term] = (array("I"), array("H"))
+                    entry[0].append(doc_id)
+                    entry[1].append(min(n, 65535))
+
+                stored = {k: rec.get(k) for k in ("title", "year", "venue", "authors", "doi", "url")}
+                stored["title"] = title
+                docs_bin.write(json.dumps(stored, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                docs_off.write(struct.pack("<Q", docs_bin.tell()))
+                if vec_file is not None:
+                    embed_texts.append(f"{title}. {rec.get('abstract') or ''}"[:2000])
+                    if len(embed_texts) >= embed_batch:
+                        flush_vectors()
+                if len(doclen) % block_docs == 0:
+                    blocks.append(tmp / f"block{len(blocks)}.bin")
+                    _write_block(blocks[-1], block)
+                    block = {}
+                    logging.info(f"Indexed {len(doclen)} records...")
+    if block:
+        blocks.append(tmp / f"block{len(blocks)}.bin")
+        _write_block(blocks[-1], block)
+        block = {}
+    if vec_file is not None:
+        flush_vectors()
+        vec_file.close()
+
+    n_docs = len(doclen)
+    dl = np.frombuffer(doclen, dtype=np.uint32).astype(np.float32) if n_docs else np.zeros(0, np.float32)
+    avgdl = float(dl.mean()) if n_docs else 0.0
+    n_terms = 0
+    with open(out / "terms.bin", "wb") as terms_bin, open(out / "terms.off", "wb") as terms_off, \
+         open(out / "post.off", "wb") as post_off, open(out / "post.doc", "wb") as post_doc, \
+         open(out / "post.imp", "wb") as post_imp:
+        terms_off.write(struct.pack("<Q", 0))
+        post_off.write(struct.pack("<Q", 0))
+        n_post = 0
+        current: bytes | None = None
+        docs_parts: list[bytes] = []
+        tf_parts: list[bytes] = []
+
+        def emit() -> None:
+            nonlocal n_post, n_terms
+            docs = np.frombuffer(b"".join(docs_parts), dtype=np.uint32)
+            tfs = np.frombuffer(b"".join(tf_parts), dtype=np.uint16).astype(np.float32)
+            w = tfs * (K1 + 1) / (tfs + K1 * (1 - B + B * dl[docs] / avgdl))
+            imp = np.clip(np.rint(w / (K1 + 1) * 255), 1, 255).astype(np.uint8)
+            terms_bin.write(current)
+            terms_off.write(struct.pack("<Q", terms_bin.tell()))
+            post_doc.write(docs.tobytes())
+            post_imp.write(imp.tobytes())
+            n_post += len(docs)
+            post_off.write(struct.pack("<Q", n_post))
+            n_terms += 1
+
+        # Blocks hold increasing doc ids, so a stable merge keeps each list sorted.
+        for term, docs_b, tfs_b in heapq.merge(*(_read_block(p) for p in blocks), key=lambda r: r[0]):
+            if term != current:
+                if current is not None:
+                    emit()
+                current, docs_parts, tf_parts = term, [], []
+            docs_parts.append(docs_b)
+            tf_parts.append(tfs_b)
+        if current is not None:
+            emit()
+
+    for p in blocks:
+        p.unlink()
+    tmp.rmdir()
+    meta = {
+        "version": INDEX_VERSION,
+        "docs": n_docs,
+        "terms": n_terms,
+        "avgdl": avgdl,
+        "k1": K1,
+        "b": B,
+        "title_boost": TITLE_BOOST,
+        "inputs": [str(p) for p in inputs],
+        "embed_model": embed_model if dim else None,
+        "dim": dim,
+        "built_at": time.time(),
+        "build_s": round(time.perf_counter() - t0, 1),
+    }
+    if not dim and (out / "vectors.f16").exists():
+        (out / "vectors.f16").unlink()
+    (out / "meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return meta
+
+# ----------------------------
+# Query
+# ----------------------------
+def _map(path: Path, dtype) -> np.ndarray:
+    if not path.exists() or path.stat().st_size == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r")
+
+class LocalIndex:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if not meta_path.exists():
+            raise FileNotFoundError(f"No literature index at {self.path} (build one with `python -m reviewer.literature_index build`)")
+        self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        self.n_docs = int(self.meta["docs"])
+        self.terms_off = _map(self.path / "terms.off", np.uint64)
+        self.post_off = _map(self.path / "post.off", np.uint64)
+        self.post_doc = _map(self.path / "post.doc", np.uint32)
+        self.post_imp = _map(self.path / "post.imp", np.uint8)
+        self.docs_off = _map(self.path / "docs.off", np.uint64)
+        self._terms = self._mmap_bytes(self.path / "terms.bin")
+        self._docs = self._mmap_bytes(self.path / "docs.bin")
+        self.vectors = None
+        if self.meta.get("dim"):
+            self.vectors = np.memmap(self.path / "vectors.f16", dtype=np.float16, mode="r").reshape(-1, self.meta["dim"])
+
+    @staticmethod
+    def _mmap_bytes(path: Path):
+        if not path.exists() or path.stat().st_size == 0:
+            return b""
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _term(self, i: int) -> bytes:
+        return self._terms[int(self.terms_off[i]):int(self.terms_off[i + 1])]
+
+    def term_id(self, term: str) -> int | None:
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.terms_off) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.terms_off) - 1 and self._term(lo) == key else None
+
+    def postings(self, term_id: int) -> tuple[np.ndarray, np.ndarray]:
+        a, b = int(self.post_off[term_id]), int(self.post_off[term_id + 1])
+        return self.post_doc[a:b], self.post_imp[a:b]
+
+    def doc(self, doc_id: int) -> dict:
+        a, b = int(self.docs_off[doc_id]), int(self.docs_off[doc_id + 1])
+        return json.loads(self._docs[a:b])
+
+    def paper(self, doc_id: int) -> Paper:
+        d = self.doc(doc_id)
+        return Paper(title=d.get("title") or "", year=d.get("year"), venue=d.get("venue"),
+                     authors=d.get("authors") or [], doi=d.get("doi"), url=d.get("url"))
+
+    def bm25(self, query: str, k: int = 10) -> list[tuple[int, float]]:
+        if not self.n_docs:
+            return []
+        k1 = self.meta.get("k1", K1)
+        lists: list[tuple[np.ndarray, np.ndarray]] = []
+        for term in set(tokenize(query)):
+            tid = self.term_id(term)
+            if tid is None:
+                continue
+            docs, imp = self.postings(tid)
+            df = len(docs)
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            lists.append((docs, np.float32(idf * (k1 + 1) / 255.0) * imp))
+        if not lists:
+            return []
+        total = sum(len(d) for d, _ in lists)
+        if total * 8 < self.n_docs:
+            # Rare terms: only touch the candidates rather than a score per document.
+            cand, inverse = np.unique(np.concatenate([d for d, _ in lists]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([w for _, w in lists])).astype(np.float32)
+        else:
+            cand = None
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            for docs, w in lists:
+                scores[docs] += w
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = cand[top] if cand is not None else top
+        return [(int(i), float(s)) for i, s in zip(ids, scores[top]) if s > 0]
+
+    def embedding_search(self, query_vec, k: int = 10, chunk: int = 262_144) -> list[tuple[int, float]]:
+        if self.vectors is None:
+            raise RuntimeError(f"Index at {self.path} was built without embeddings (--embed_model)")
+        q = np.asarray(query_vec, dtype=np.float32)
+        q /= np.linalg.norm(q) + 1e-9
+        best_ids: list[np.ndarray] = []
+        best_sims: list[np.ndarray] = []
+        for start in range(0, len(self.vectors), chunk):
+            sims = self.vectors[start:start + chunk].astype(np.float32) @ q
+            kk = min(k, len(sims))
+            idx = np.argpartition(-sims, kk - 1)[:kk]
+            best_ids.append(idx + start)
+            best_sims.append(sims[idx])
+        if not best_ids:
+            return []
+        ids, sims = np.concatenate(best_ids), np.concatenate(best_sims)
+        order = np.argsort(-sims)[:k]
+        return [(int(ids[i]), float(sims[i])) for i in order]
+
+    def search(self, query: str, k: int = 10, mode: str = "bm25", embed_backend=None) -> list[Paper]:
+        """mode: "bm25", "embed" or "hybrid" (reciprocal-rank fusion of both)."""
+        if mode == "bm25" or self.vectors is None or embed_backend is None:
+            hits = self.bm25(query, k)
+        else:
+            qvec = embed_backend.embed(self.meta["embed_model"], [query])[0]
+            dense = self.embedding_search(qvec, k if mode == "embed" else 2 * k)
+            if mode == "embed":
+                hits = dense
+            else:
+                fused: dict[int, float] = {}
+                for ranking in (self.bm25(query, 2 * k), dense):
+                    for rank, (doc_id, _) in enumerate(ranking):
+                        fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+                hits = sorted(fused.items(), key=lambda kv: -kv[1])[:k]
+        return [self.paper(doc_id) for doc_id, _ in hits]
+
+if __name__ == "__main__":
+    import argparse
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    ap = argparse.ArgumentParser(description="Offline literature index for the novelty check")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Index PubMed XML / JSON-lines dumps")
+    b.add_argument("inputs", nargs="+")
+    b.add_argument("--out", default="cache/literature_index")
+    b.add_argument("--block_docs", type=int, default=BLOCK_DOCS)
+    b.add_argument("--embed_model", default=None, help="Also store embeddings from this model (e.g. nomic-embed-text)")
+    b.add_argument("--llm_api", default="ollama")
+    b.add_argument("--llm_url", default=None)
+    s = sub.add_parser("search", help="Query an index")
+    s.add_argument("query")
+    s.add_argument("--index", default="cache/literature_index")
+    s.add_argument("-k", type=int, default=10)
+    s.add_argument("--mode", choices=["bm25", "embed", "hybrid"], default="bm25")
+    s.add_argument("--llm_api", default="ollama")
+    s.add_argument("--llm_url", default=None)
+    args = ap.parse_args()
+
+    backend = None
+    if getattr(args, "embed_model", None) or getattr(args, "mode", "bm25") != "bm25":
+        from .backends import make_backend
+        backend = make_backend(args.llm_api, args.llm_url)
+    if args.cmd == "build":
+        meta = build_index(args.inputs, args.out, args.block_docs, args.embed_model, backend)
+        print(f"Indexed {meta['docs']} records, {meta['terms']} terms in {meta['build_s']}s -> {args.out}")
+    else:
+        index = LocalIndex(args.index)
+        t0 = time.perf_counter()
+        papers = index.search(args.query, args.k, args.mode, backend)
+        ms = (time.perf_counter() - t0) * 1000
+        for p in papers:
+            print(f"• {p.title} ({p.year or ''}) {p.venue or ''} DOI:{p.doi or ''}")
+        print(f"({len(papers)} results in {ms:.1f} ms from {index.n_docs} records)")
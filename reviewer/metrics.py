@@ -0,0 +1,131 @@
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+# Per-run timing and LLM token metrics, written to <out>/metrics.json and
+# optionally appended to a JSON-lines history shared across runs.
+
+METRICS_FILE = "metrics.json"
+NS = 1e9
+
+@dataclass
+class LLMCall:
+    stage: str
+    model: str
+    load_s: float = 0.0
+    prompt_tokens: int = 0
+    prompt_eval_s: float = 0.0
+    gen_tokens: int = 0
+    gen_s: float = 0.0
+    total_s: float = 0.0
+    prompt_chars: int = 0
+
+    @property
+    def prompt_tok_s(self) -> float | None:
+        return self.prompt_tokens / self.prompt_eval_s if self.prompt_eval_s > 0 else None
+
+    @property
+    def gen_tok_s(self) -> float | None:
+        return self.gen_tokens / self.gen_s if self.gen_s > 0 else None
+
+    @classmethod
+    def from_ollama(cls, stage: str, model: str, stats: dict, prompt_chars: int = 0) -> "LLMCall":
+        return cls(
+            stage=stage,
+            model=model,
+            load_s=stats.get("load_duration", 0) / NS,
+            prompt_tokens=int(stats.get("prompt_eval_count", 0)),
+            prompt_eval_s=stats.get("prompt_eval_duration", 0) / NS,
+            gen_tokens=int(stats.get("eval_count", 0)),
+            gen_s=stats.get("eval_duration", 0) / NS,
+            total_s=stats.get("total_duration", 0) / NS,
+            prompt_chars=prompt_chars,
+        )
+
+    def to_dict(self) -> dict:
+        d = asdict(self)
+        d["prompt_tok_s"] = round(self.prompt_tok_s, 2) if self.prompt_tok_s else None
+        d["gen_tok_s"] = round(self.gen_tok_s, 2) if self.gen_tok_s else None
+        return d
+
+@dataclass
+class RunMetrics:
+    run: dict = field(default_factory=dict)
+    stages: dict[str, float] = field(default_factory=dict)
+    llm: list[LLMCall] = field(default_factory=list)
+    started_at: float = field(default_factory=time.time)
+    status: str = "running"
+    profiler: object | None = field(default=None, repr=False)  # profiling.StageProfiler under --profile
+
+    @contextmanager
+    def stage(self, name: str):
+        """Times a block; repeated names accumulate (e.g. several vision batches)."""
+        t0 = time.perf_counter()
+        try:
+            with self.profiler.stage(name) if self.profiler else nullcontext():
+                yield
+        finally:
+            self.stages[name] = round(self.stages.get(name, 0.0) + time.perf_counter() - t0, 4)
+
+    def record_llm(self, stage: str, model: str, stats: dict, prompt_chars: int = 0) -> LLMCall:
+        call = LLMCall.from_ollama(stage, model, stats or {}, prompt_chars)
+        self.llm.append(call)
+        return call
+
+    def to_dict(self) -> dict:
+        return {
+            "run": self.run,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_s": round(time.time() - self.started_at, 3),
+            "stages": self.stages,
+            "llm": [c.to_dict() for c in self.llm],
+        }
+
+    def write(self, out_dir: str | Path) -> Path:
+        path = Path(out_dir) / METRICS_FILE
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding="utf-8")
+        return path
+
+    def append_history(self, history_path: str | Path) -> None:
+        p = Path(history_path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with open(p, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.to_dict(), ensure_ascii=False) + "\n")
+
+def load_metrics(out_dir: str | Path) -> dict | None:
+    p = Path(out_dir) / METRICS_FILE
+    if not p.exists():
+        return None
+    try:
+        return json.loads(p.read_text(encoding="utf-8"))
+    except ValueError:
+        return None
+
+def stage_table(metrics: dict) -> list[dict]:
+    """One row per stage: wall time plus load/prompt/generation figures for LLM stages."""
+    rows: list[dict] = []
+    calls_by_stage: dict[str, list[dict]] = {}
+    for c in metrics.get("llm") or []:
+        calls_by_stage.setdefault(c["stage"], []).append(c)
+    for stage, seconds in (metrics.get("stages") or {}).items():
+        row = {"stage": stage, "wall_s": round(seconds, 1)}
+        calls = calls_by_stage.get(stage) or []
+        if calls:
+            gen_tokens = sum(c["gen_tokens"] for c in calls)
+            gen_s = sum(c["gen_s"] for c in calls)
+            prompt_tokens = sum(c["prompt_tokens"] for c in calls)
+            prompt_s = sum(c["prompt_eval_s"] for c in calls)
+            row.update({
+                "model": calls[0]["model"],
+                "load_s": round(sum(c["load_s"] for c in calls), 1),
+                "prompt_tokens": prompt_tokens,
+                "prompt_tok_s": round(prompt_tokens / prompt_s, 1) if prompt_s else None,
+                "gen_tokens": gen_tokens,
+                "gen_tok_s": round(gen_tokens / gen_s, 1) if gen_s else None,
+            })
+        rows.append(row)
+    return rows
@@ -0,0 +1,229 @@
+from __future__ import annotations
+import functools
+import json
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from .ingest import TextUnit
+
+# Deterministic radiopharmaceutical nomenclature check.
+#
+# config/guidelines/nomenclature_rules.json holds the checkable parts of
+# config/prompts/nuclear_nomenclature_guide.txt: the radionuclides (each one
+# yields "18F" and "F-18" patterns whose context decides the rule) and plain
+# preferred/deprecated terms. All patterns go into one Aho-Corasick automaton,
+# so each TextUnit is scanned once however many rules there are, and every
+# occurrence is reported with its pointer; the critic gets that list instead
+# of the whole guide.
+
+RULES_PATH = Path(__file__).parent.parent / "config" / "guidelines" / "nomenclature_rules.json"
+
+# Length-preserving lower-casing, so match offsets index the original text too.
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+_NAME = re.compile(r"[^\s,;:()]+")
+
+class Automaton:
+    """Aho-Corasick multi-pattern matcher: all occurrences of all patterns in one pass."""
+
+    def __init__(self):
+        self.goto: list[dict[str, int]] = [{}]
+        self.fail: list[int] = [0]
+        self.out: list[list[tuple[int, object]]] = [[]]
+
+    def add(self, pattern: str, payload: object) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append((len(pattern), payload))
+
+    def build(self) -> "Automaton":
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def finditer(self, text: str) -> Iterator[tuple[int, int, object]]:
+        """(start, end, payload) for every match, in order of end position."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for n, payload in out[state]:
+                    yield i + 1 - n, i + 1, payload
+
+@dataclass
+class Finding:
+    pointer: str
+    rule: str  # section of the style guide
+    found: str
+    use: str
+
+@dataclass(frozen=True)
+class _Nuclide:
+    mass: str
+    symbol: str
+    element: str
+    metal: bool
+
+    @property
+    def bracket(self) -> str:
+        return f"[{self.mass}{self.symbol}]"
+
+    @property
+    def spelled(self) -> str:
+        return f"{self.element}-{self.mass}"
+
+    def name(self, compound: str) -> str:
+        # Radiometals repeat the element symbol, joined to the ligand with a hyphen
+        if self.metal and self.symbol not in compound:
+            return f"{self.bracket}{self.symbol}-{compound}"
+        return f"{self.bracket}{compound}"
+
+@dataclass(frozen=True)
+class _Term:
+    match: str
+    use: str
+    rule: str
+    case: bool = False
+    unless_parenthesized: bool = False
+
+class NomenclatureChecker:
+    def __init__(self, rules: dict):
+        self.process_words = tuple(w.lower() for w in rules.get("process_words", []))
+        self.automaton = Automaton()
+        for r in rules.get("radionuclides", []):
+            n = _Nuclide(r["mass"], r["symbol"], r["element"], bool(r.get("metal")))
+            self.automaton.add(f"{n.mass}{n.symbol}".translate(_ASCII_LOWER), ("short", n))
+            self.automaton.add(f"{n.symbol}-{n.mass}".translate(_ASCII_LOWER), ("symbol_first", n))
+        for t in rules.get("terms", []):
+            for m in t["match"]:
+                term = _Term(m, t["use"], t.get("rule", ""), t.get("case", False), t.get("unless_parenthesized", False))
+                self.automaton.add(m.translate(_ASCII_LOWER), ("term", term))
+        self.automaton.build()
+
+    def _is_process(self, word: str) -> bool:
+        return word.lower().startswith(self.process_words)
+
+    def check_text(self, text: str, pointer: str = "") -> list[Finding]:
+        findings = []
+        for start, end, (kind, rule) in self.automaton.finditer(text.translate(_ASCII_LOWER)):
+            before = text[start - 1] if start else " "
+            after = text[end] if end < len(text) else " "
+            if kind == "term":
+                f = self._term(text, start, end, before, after, rule)
+            elif kind == "short":
+                f = self._short(text, start, end, before, after, rule)
+            else:
+                f = self._symbol_first(text, start, end, before, after, rule)
+            if f:
+                f.pointer = pointer
+                findings.append(f)
+        return findings
+
+    def check_units(self, units: list[TextUnit]) -> list[Finding]:
+        out: list[Finding] = []
+        for u in units:
+            out.extend(self.check_text(u.text, u.pointer))
+        return out
+
+    def _term(self, text, start, end, before, after, term: _Term) -> Finding | None:
+        found = text[start:end]
+        if before.isalnum() or after.isalnum() or (term.case and found != term.match):
+            return None
+        if term.unless_parenthesized:
+            window = text[max(0, start - 60):start]
+            if window.rfind("(") > window.rfind(")"):
+                return None
+        return Finding("", term.rule, found, term.use)
+
+    def _short(self, text, start, end, before, after, n: _Nuclide) -> Finding | None:
+        # "18F" as written in the manuscript; the context decides which rule applies.
+        if text[start:end] != f"{n.mass}{n.symbol}" or before.isalnum():
+            return None
+        if before == "[" and after == "]":
+            m = _NAME.match(text, end + 1)
+            compound = m.group(0).rstrip(".") if m else ""
+            if compound.startswith("-"):
+                tail = compound[1:]
+                return Finding("", "2.1", f"{n.bracket}{compound}", f"{n.name(tail)} (no hyphen after the bracket)")
+            if compound and self._is_process(compound):
+                return Finding("", "3.1", f"{n.bracket}{compound}",
+                               f"{n.mass}{n.symbol}-{compound} (no brackets for a process)")
+            if compound and n.metal and n.symbol not in compound:
+                return Finding("", "2.2", f"{n.bracket}{compound}", f"{n.name(compound)} (metal symbol missing)")
+            return None
+        if after == "-":
+            m = _NAME.match(text, end + 1)
+            compound = m.group(0).rstrip(".") if m else ""
+            if not compound or self._is_process(compound):
+                return None  # "18F-labeled", "68Ga-labelling" are correct
+            return Finding("", "2.1", f"{n.mass}{n.symbol}-{compound}", n.name(compound))
+        if after.isalnum() or after in "]":
+            return None
+        return Finding("", "2.3", f"{n.mass}{n.symbol}", f"{n.spelled} (radionuclide alone)")
+
+    def _symbol_first(self, text, start, end, before, after, n: _Nuclide) -> Finding | None:
+        # "F-18", "Tc-99m": never correct; which fix depends on whether a name follows.
+        found = text[start:end]
+        if found != f"{n.symbol}-{n.mass}" or before.isalnum() or after.isalnum():
+            return None
+        m = _NAME.match(text, end + 1) if after in " -" else None
+        compound = m.group(0).rstrip(".") if m else ""
+        if compound and re.match(r"[A-Z][A-Z0-9]", compound) and not self._is_process(compound):
+            return Finding("", "2.1", f"{found}{after}{compound}", n.name(compound))
+        return Finding("", "2.3", found, f"{n.spelled} (radionuclide alone)")
+
+@functools.lru_cache(maxsize=2)
+def _checker(path: Path, mtime_ns: int) -> NomenclatureChecker:
+    return NomenclatureChecker(json.loads(path.read_text(encoding="utf-8")))
+
+def get_checker(path: str | Path = RULES_PATH) -> NomenclatureChecker:
+    """Compiled once per rules-file version, so the daemon does not rebuild the automaton per review."""
+    path = Path(path)
+    return _checker(path, path.stat().st_mtime_ns)
+
+def check_nomenclature(units: list[TextUnit], path: str | Path = RULES_PATH) -> list[Finding]:
+    return get_checker(path).check_units(units)
+
+def format_findings(findings: list[Finding], max_items: int = 40, max_pointers: int = 6) -> str:
+    """One line per distinct problem with its count and pointers, most frequent first."""
+    if not findings:
+        return "Automated check found no nomenclature problems."
+    groups: dict[tuple[str, str, str], list[str]] = {}
+    for f in findings:
+        groups.setdefault((f.rule, f.found, f.use), []).append(f.pointer)
+    ranked = sorted(groups.items(), key=lambda kv: -len(kv[1]))
+    lines = [f"Automated check ({len(findings)} occurrence(s); every occurrence is listed by pointer):"]
+    for (rule, found, use), pointers in ranked[:max_items]:
+        uniq = list(dict.fromkeys(p for p in pointers if p))
+        where = ", ".join(uniq[:max_pointers]) + (f" +{len(uniq) - max_pointers} more" if len(uniq) > max_pointers else "")
+        lines.append(f"- {found} → {use} [guide {rule}] ×{len(pointers)}" + (f" at {where}" if where else ""))
+    if len(ranked) > max_items:
+        lines.append(f"- … {len(ranked) - max_items} more distinct item(s) omitted")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    from .ingest import load_manuscript
+    ap = argparse.ArgumentParser(description="List radiopharmaceutical nomenclature problems in a manuscript.")
+    ap.add_argument("input")
+    args = ap.parse_args()
+    print(format_findings(check_nomenclature(load_manuscript(args.input).units)))
@@ -1,8 +1,41 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from urllib.parse import quote_plus
+import json
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
+from pathlib import Path
 import requests
 
+# Literature lookups for the novelty check.
+#
+# All three sources are queried at once on a pooled session, so a bundle takes
+# as long as the slowest source. 429/5xx answers are retried with backoff that
+# honours Retry-After, and parsed results are kept in a small SQLite cache
+# (DEFAULT_CACHE unless the caller passes another or cache=False) for
+# CACHE_TTL_S, keyed by source + normalized query. Base URLs can be pointed at
+# local stand-ins (benchmarks/fake_literature.py) through Endpoints or the
+# NOVELTY_*_URL environment variables.
+#
+# Offline machines use a local index instead (reviewer.literature_index):
+# pass local_index=, or set NOVELTY_LOCAL_INDEX, plus offline=True /
+# NOVELTY_OFFLINE=1 to skip the network sources entirely.
+
+DEFAULT_CACHE = Path(__file__).parent.parent / "cache" / "novelty_cache.sqlite3"
+CACHE_TTL_S = 7 * 24 * 3600
+SOURCES = ("pubmed", "crossref", "semantic_scholar")
+LOCAL_SOURCE = "local_index"
+SOURCE_LABELS = {"pubmed": "PubMed", "crossref": "Crossref", "semantic_scholar": "Semantic Scholar",
+                 LOCAL_SOURCE: "local index"}
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
 @dataclass
 class Paper:
     title: str
@@ -11,12 +44,136 @@ class Paper:
     authors: list[str]
     doi: str | None
     url: str | None
+    sources: list[str] = field(default_factory=list)
+
+@dataclass
+class Endpoints:
+    pubmed: str = field(default_factory=lambda: os.environ.get(
+        "NOVELTY_PUBMED_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils"))
+    crossref: str = field(default_factory=lambda: os.environ.get(
+        "NOVELTY_CROSSREF_URL", "https://api.crossref.org"))
+    semantic_scholar: str = field(default_factory=lambda: os.environ.get(
+        "NOVELTY_S2_URL", "https://api.semanticscholar.org/graph/v1"))
+
+def normalize_query(query: str) -> str:
+    """Case, punctuation, word order and repeats do not change what the sources return much."""
+    words = re.findall(r"[\w-]+", query.lower())
+    return " ".join(sorted(set(words)))
+
+def normalize_doi(doi: str | None) -> str | None:
+    if not doi:
+        return None
+    d = doi.strip().lower()
+    d = re.sub(r"^(https?://(dx\.)?doi\.org/|doi:\s*)", "", d)
+    return d or None
+
+class ResultCache:
+    """Persistent TTL cache; one short-lived connection per call so threads can share it."""
+
+    def __init__(self, path: str | Path = DEFAULT_CACHE, ttl_s: float = CACHE_TTL_S):
+        self.path = Path(path)
+        self.ttl_s = ttl_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        # sqlite3's own context manager commits but does not close
+        con = sqlite3.connect(self.path, timeout=10)
+        try:
+            con.execute("PRAGMA journal_mode=WAL")
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def get(self, key: str):
+        with self._connect() as con:
+            row = con.execute("SELECT value, stored_at FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl_s:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: str, value) -> None:
+        with self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO results (key, value, stored_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), time.time()))
+
+    def purge(self) -> int:
+        with self._connect() as con:
+            return con.execute("DELETE FROM results WHERE stored_at < ?", (time.time() - self.ttl_s,)).rowcount
+
+class Fetcher:
+    """Pooled GETs with rate-limit-aware retries."""
+
+    def __init__(self, retries: int = 3, backoff_s: float = 1.0, max_wait_s: float = 30.0, timeout_s: float = 30.0):
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.max_wait_s = max_wait_s
+        self.timeout_s = timeout_s
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=len(SOURCES), pool_maxsize=8)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "Local-Manuscript-Reviewer (novelty check)"
 
-def search_crossref(query: str, rows: int = 8) -> list[Paper]:
-    url = f"https://api.crossref.org/works?query={quote_plus(query)}&rows={rows}"
-    r = requests.get(url, timeout=30)
-    r.raise_for_status()
-    items = (r.json().get("message") or {}).get("items") or []
+    def _wait(self, attempt: int, r: requests.Response | None) -> float:
+        retry_after = r.headers.get("Retry-After") if r is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0.0
+            if wait > 0:
+                return min(wait, self.max_wait_s)
+        return min(self.backoff_s * 2 ** attempt * (0.5 + random.random()), self.max_wait_s)
+
+    def get_json(self, url: str, params: dict | None = None) -> dict:
+        attempt = 0
+        while True:
+            r = None
+            try:
+                r = self.session.get(url, params=params, timeout=self.timeout_s)
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    return r.json()
+                err: Exception = requests.HTTPError(f"{r.status_code} from {url}", response=r)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = e
+            if attempt >= self.retries:
+                raise err
+            wait = self._wait(attempt, r)
+            logging.info(f"Literature lookup {url} failed ({err}); retrying in {wait:.1f}s.")
+            time.sleep(wait)
+            attempt += 1
+
+_FETCHER: Fetcher | None = None
+_FETCHER_LOCK = threading.Lock()
+
+def default_fetcher() -> Fetcher:
+    global _FETCHER
+    with _FETCHER_LOCK:
+        if _FETCHER is None:
+            _FETCHER = Fetcher()
+        return _FETCHER
+
+_CACHE: ResultCache | None = None
+
+def default_cache() -> ResultCache:
+    global _CACHE
+    with _FETCHER_LOCK:
+        if _CACHE is None:
+            _CACHE = ResultCache(DEFAULT_CACHE)
+        return _CACHE
+
+def search_crossref(query: str, rows: int = 8, fetcher: Fetcher | None = None, base: str | None = None) -> list[Paper]:
+    base = base or Endpoints().crossref
+    data = (fetcher or default_fetcher()).get_json(f"{base}/works", {"query": query, "rows": rows})
+    items = (data.get("message") or {}).get("items") or []
     out: list[Paper] = []
     for it in items:
         title = (it.get("title") or [""])[0]
@@ -32,17 +189,14 @@ def search_crossref(query: str, rows: int = 8) -> list[Paper]:
         out.append(Paper(title=title, year=year, venue=(it.get("container-title") or [None])[0], authors=authors[:5], doi=doi, url=it.get("URL")))
     return out
 
-def search_pubmed(query: str, retmax: int = 8) -> list[Paper]:
-    es = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi?db=pubmed&retmode=json&retmax={retmax}&term={quote_plus(query)}"
-    r = requests.get(es, timeout=30)
-    r.raise_for_status()
-    ids = ((r.json().get("esearchresult") or {}).get("idlist") or [])
+def search_pubmed(query: str, retmax: int = 8, fetcher: Fetcher | None = None, base: str | None = None) -> list[Paper]:
+    fetcher = fetcher or default_fetcher()
+    base = base or Endpoints().pubmed
+    found = fetcher.get_json(f"{base}/esearch.fcgi", {"db": "pubmed", "retmode": "json", "retmax": retmax, "term": query})
+    ids = ((found.get("esearchresult") or {}).get("idlist") or [])
     if not ids:
         return []
-    summ = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
-    r2 = requests.get(summ, params={"db":"pubmed","retmode":"json","id":",".join(ids)}, timeout=30)
-    r2.raise_for_status()
-    data = r2.json().get("result") or {}
+    data = fetcher.get_json(f"{base}/esummary.fcgi", {"db": "pubmed", "retmode": "json", "id": ",".join(ids)}).get("result") or {}
     out: list[Paper] = []
     for pid in ids:
         it = data.get(pid) or {}
@@ -58,12 +212,10 @@ def search_pubmed(query: str, retmax: int = 8) -> list[Paper]:
         out.append(Paper(title=title, year=year, venue=it.get("fulljournalname"), authors=authors[:5], doi=doi, url=url))
     return out
 
-def search_semantic_scholar(query: str, limit: int = 8) -> list[Paper]:
-    url = "https://api.semanticscholar.org/graph/v1/paper/search"
+def search_semantic_scholar(query: str, limit: int = 8, fetcher: Fetcher | None = None, base: str | None = None) -> list[Paper]:
+    base = base or Endpoints().semantic_scholar
     params = {"query": query, "limit": limit, "fields": "title,year,venue,authors,externalIds,url"}
-    r = requests.get(url, params=params, timeout=30)
-    r.raise_for_status()
-    items = (r.json().get("data") or [])
+    items = (fetcher or default_fetcher()).get_json(f"{base}/paper/search", params).get("data") or []
     out: list[Paper] = []
     for it in items:
         ext = it.get("externalIds") or {}
@@ -73,14 +225,115 @@ def search_semantic_scholar(query: str, limit: int = 8) -> list[Paper]:
                          venue=it.get("venue"), authors=authors[:5], doi=doi, url=it.get("url")))
     return out
 
-def novelty_bundle(keywords: list[str]) -> dict:
+_SEARCHES = {
+    "pubmed": search_pubmed,
+    "crossref": search_crossref,
+    "semantic_scholar": search_semantic_scholar,
+}
+
+def _title_key(title: str | None) -> str:
+    return " ".join(re.findall(r"\w+", (title or "").lower()))
+
+def merge_by_doi(results: dict[str, list[dict]]) -> list[dict]:
+    """One entry per work across sources: same DOI, or same title when a source has no DOI."""
+    merged: list[dict] = []
+    by_doi: dict[str, dict] = {}
+    by_title: dict[str, dict] = {}
+    for source in (*SOURCES, LOCAL_SOURCE):
+        for p in results.get(source) or []:
+            doi = normalize_doi(p.get("doi"))
+            title = _title_key(p.get("title"))
+            if not doi and not title:
+                continue
+            cur = by_doi.get(doi) if doi else None
+            if cur is None and title:
+                found = by_title.get(title)
+                # Same title but two different DOIs are two works (e.g. preprint and article).
+                if found is not None and not (doi and found.get("doi") and normalize_doi(found["doi"]) != doi):
+                    cur = found
+            if cur is None:
+                cur = {**p, "doi": doi, "sources": [source]}
+                merged.append(cur)
+            else:
+                if source not in cur["sources"]:
+                    cur["sources"].append(source)
+                for k in ("title", "year", "venue", "url", "doi"):
+                    if not cur.get(k) and (doi if k == "doi" else p.get(k)):
+                        cur[k] = doi if k == "doi" else p[k]
+                if not cur.get("authors") and p.get("authors"):
+                    cur["authors"] = p["authors"]
+            if doi:
+                by_doi.setdefault(doi, cur)
+            if title:
+                by_title.setdefault(title, cur)
+    # Works that several sources agree on first; stable otherwise.
+    return sorted(merged, key=lambda p: -len(p["sources"]))
+
+_LOCAL_INDEXES: dict[str, object] = {}
+
+def _local_search(index, query: str, limit: int) -> list[Paper]:
+    from .literature_index import LocalIndex
+    if not isinstance(index, LocalIndex):
+        key = str(Path(index).resolve())
+        if key not in _LOCAL_INDEXES:
+            _LOCAL_INDEXES[key] = LocalIndex(key)
+        index = _LOCAL_INDEXES[key]
+    return index.search(query, limit)
+
+def novelty_bundle(keywords: list[str], limit: int = 8, cache: ResultCache | bool = True,
+                   fetcher: Fetcher | None = None, endpoints: Endpoints | None = None,
+                   local_index=None, offline: bool | None = None) -> dict:
+    """Queries every source concurrently; a failing source is reported under "errors" instead of raising.
+
+    local_index is a LocalIndex or its directory; offline=True skips the network sources.
+    cache=True uses the shared cache at DEFAULT_CACHE; cache=False looks everything up afresh.
+    """
     q = " ".join(keywords)
-    return {
-        "query": q,
-        "pubmed": [p.__dict__ for p in search_pubmed(q, 8)],
-        "crossref": [p.__dict__ for p in search_crossref(q, 8)],
-        "semantic_scholar": [p.__dict__ for p in search_semantic_scholar(q, 8)],
-    }
+    norm = normalize_query(q)
+    endpoints = endpoints or Endpoints()
+    local_index = local_index or os.environ.get("NOVELTY_LOCAL_INDEX") or None
+    if offline is None:
+        offline = os.environ.get("NOVELTY_OFFLINE", "").lower() in ("1", "true", "yes")
+    sources = () if offline else SOURCES
+    if local_index is not None:
+        sources = (*sources, LOCAL_SOURCE)
+    if not offline:
+        fetcher = fetcher or default_fetcher()
+    if cache is True:
+        cache = default_cache()
+    cache = cache or None
+
+    def run(source: str):
+        key = f"{source}|{limit}|{norm}"
+        t0 = time.perf_counter()
+        if cache is not None and source != LOCAL_SOURCE:
+            hit = cache.get(key)
+            if hit is not None:
+                return source, hit, None, 0.0, True
+        try:
+            if source == LOCAL_SOURCE:
+                found = _local_search(local_index, q, limit)
+            else:
+                found = _SEARCHES[source](q, limit, fetcher, getattr(endpoints, source))
+            papers = [asdict(p) for p in found]
+        except Exception as e:
+            return source, [], f"{type(e).__name__}: {e}", time.perf_counter() - t0, False
+        if cache is not None and source != LOCAL_SOURCE:
+            cache.put(key, papers)
+        return source, papers, None, time.perf_counter() - t0, False
+
+    bundle: dict = {"query": q, "sources": list(sources), "errors": {}, "timings_s": {}, "cached": []}
+    with ThreadPoolExecutor(max_workers=max(len(sources), 1)) as pool:
+        for source, papers, error, elapsed, cached in pool.map(run, sources):
+            bundle[source] = papers
+            bundle["timings_s"][source] = round(elapsed, 3)
+            if error:
+                bundle["errors"][source] = error
+                logging.warning(f"⚠️ Novelty search: {source} failed ({error}).")
+            if cached:
+                bundle["cached"].append(source)
+    bundle["merged"] = merge_by_doi(bundle)
+    return bundle
 
 def format_novelty_block(bundle: dict, claimed_novelty: str | None = None, key_refs: list[str] | None = None) -> str:
     lines: list[str] = []
@@ -89,18 +342,25 @@ def format_novelty_block(bundle: dict, claimed_novelty: str | None = None, key_r
     if key_refs:
         lines.append(f"- Key refs provided: {', '.join(key_refs)}")
     lines.append(f"- Search query: {bundle.get('query','')}")
-    def add(name, items):
+    def add(name, items, limit=8):
         if not items:
             return
-        lines.append(f"\n{name} (top {min(len(items),8)}):")
-        for it in items[:8]:
+        lines.append(f"\n{name} (top {min(len(items),limit)}):")
+        for it in items[:limit]:
             title = (it.get('title') or '').strip()
             year = it.get('year') or ''
             venue = it.get('venue') or ''
             doi = it.get('doi') or ''
             url = it.get('url') or ''
-            lines.append(f"  • {title} ({year}) {venue} DOI:{doi} {url}".strip())
-    add("PubMed", bundle.get("pubmed") or [])
-    add("Crossref", bundle.get("crossref") or [])
-    add("Semantic Scholar", bundle.get("semantic_scholar") or [])
+            found_in = f" [{', '.join(it['sources'])}]" if len(it.get('sources') or []) > 1 else ""
+            lines.append(f"  • {title} ({year}) {venue} DOI:{doi} {url}{found_in}".strip())
+    if "merged" in bundle:
+        searched = ", ".join(SOURCE_LABELS.get(s, s) for s in bundle.get("sources") or SOURCES)
+        add(f"Related work ({searched}; duplicates merged by DOI)", bundle["merged"], 15)
+    else:
+        add("PubMed", bundle.get("pubmed") or [])
+        add("Crossref", bundle.get("crossref") or [])
+        add("Semantic Scholar", bundle.get("semantic_scholar") or [])
+    if bundle.get("errors"):
+        lines.append(f"\n(Unavailable: {', '.join(bundle['errors'])})")
     return "\n".join(lines) if lines else "(none)"
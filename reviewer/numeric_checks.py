@@ -0,0 +1,310 @@
+from __future__ import annotations
+import bisect
+import re
+from dataclasses import dataclass
+from typing import Iterator
+
+from .ingest import Manuscript, Table, TextUnit
+
+# Deterministic numeric-consistency checks.
+#
+# Sample sizes, percentages (with their x/y fractions), p-values, CIs and
+# named estimates (AUC, sensitivity, OR, ...) are pulled from the text units
+# and from PyMuPDF-detected tables, each tagged with its pointer, section and
+# a few context words. Two kinds of problems are reported:
+#   - internal: x/y (z%) that does not compute, an estimate outside its CI,
+#     a reversed CI, an impossible p-value
+#   - abstract vs body: an abstract value that appears nowhere in the
+#     Results/tables, listed with the body value whose context matches best
+# The critic gets the short discrepancy list instead of re-deriving it.
+
+_DIGIT = re.compile(r"\d")
+_SENTENCE_END = re.compile(r"(?<=[.;!?])\s+")
+_NUM = r"(?:\d{1,3}(?:,\d{3})+|\d+)(?:\.\d+)?|\.\d+"
+_SNUM = r"[-−]?\d+(?:\.\d+)?"
+_CI = re.compile(
+    rf"(?:(?P<est>{_SNUM})\s*[(\[,;]\s*)?(?:9[059](?:\.\d)?)\s*%\s*(?:CI|C\.I\.|confidence intervals?)\s*[:=,]?\s*"
+    rf"[(\[]?\s*(?P<lo>{_SNUM})\s*(?:–|—|-|to|,)\s*(?P<hi>{_SNUM})"
+)
+_FRAC_PCT = re.compile(rf"(?<![\d.])(?P<x>{_NUM})\s*(?:/|of)\s*(?P<y>{_NUM})\s*[(\[,;]\s*(?P<pct>{_NUM})\s*%")
+_PCT_FRAC = re.compile(rf"(?<![\d.])(?P<pct>{_NUM})\s*%\s*[(\[]\s*(?P<x>{_NUM})\s*(?:/|of)\s*(?P<y>{_NUM})\s*[)\]]")
+_PCT = re.compile(rf"(?<![\d.])(?P<pct>{_NUM})\s*%(?!\s*(?:CI\b|C\.I\.|confidence))")
+_P = re.compile(r"\b[pP]\s*(?:[-\s]?values?)?\s*(?P<op>[=<>≤≥]=?)\s*(?P<v>\d*\.?\d+)")
+_N = re.compile(
+    rf"\b[nN]\s*=\s*(?P<n>{_NUM})|(?<![\d.])(?P<m>{_NUM})\s+(?P<noun>patients|participants|subjects|cases|controls|"
+    r"individuals|men|women|children|residents|students|trainees|readers|lesions|scans|examinations|exams|studies)\b"
+)
+# Spelled-out metrics match in any case; abbreviations only as written ("OR 2.1", not "or 2").
+_METRIC = re.compile(
+    r"\b(?P<metric>(?i:auroc|auc|sensitivity|specificity|accuracy|kappa|dice|slope|odds ratio|hazard ratio|risk ratio)"
+    r"|PPV|NPV|ICC|OR|HR|RR|F1|r)\b"
+    rf"(?:\s+(?:of|was|were|is))?\s*[=:]?\s*(?P<v>{_SNUM})(?!\.?\d)(?!\s*%)"
+)
+_METRIC_ALIASES = {"auc": "auroc", "odds ratio": "or", "hazard ratio": "hr", "risk ratio": "rr"}
+_HEADING = re.compile(
+    r"\b(ABSTRACT|Abstract|INTRODUCTION|Introduction|BACKGROUND|Background|MATERIALS AND METHODS|Materials and Methods|"
+    r"METHODS|Methods|RESULTS|Results|DISCUSSION|Discussion|CONCLUSIONS?|Conclusions?|REFERENCES|References)\b"
+)
+_SECTIONS = {"abstract": "abstract", "introduction": "introduction", "background": "introduction",
+             "materials and methods": "methods", "methods": "methods", "results": "results",
+             "discussion": "discussion", "conclusion": "discussion", "conclusions": "discussion",
+             "references": "references"}
+_STOP = set("the and for with was were are this that from than into each all per its their our who which "
+            "between among after before during both using used had has have been not".split())
+
+@dataclass
+class Quantity:
+    kind: str  # n | pct | p | ci | metric
+    value: tuple[float, ...]
+    decimals: int
+    pointer: str
+    section: str
+    context: tuple[str, ...]
+    text: str
+    label: str = ""  # metric name, p-value operator or the "x/y" behind a percentage
+
+    def close_to(self, other: "Quantity") -> bool:
+        """Same quantity up to the rounding of the less precise of the two."""
+        # A percentage's label is its optional "x/y"; every other label must agree.
+        if self.kind != other.kind or (self.kind != "pct" and self.label != other.label):
+            return False
+        a, b = self.value, other.value
+        if self.kind == "ci":
+            a, b = a[-2:], b[-2:]  # either side may omit the point estimate
+        if len(a) != len(b):
+            return False
+        tol = 0.5 * 10 ** -min(self.decimals, other.decimals) + 1e-9
+        return all(abs(x - y) <= tol for x, y in zip(a, b))
+
+@dataclass
+class Discrepancy:
+    pointer: str
+    kind: str  # arithmetic | ci | p_value | abstract
+    detail: str
+
+def _num(s: str) -> float:
+    return float(s.replace(",", "").replace("−", "-"))
+
+def _decimals(*nums: str) -> int:
+    return max((len(n.split(".")[1]) if "." in n else 0) for n in nums)
+
+def _context(text: str, start: int, extra: str = "") -> tuple[str, ...]:
+    window = re.split(r"[.;]\s", text[max(0, start - 80):start])[-1]  # same sentence only
+    words = re.findall(r"[A-Za-z][A-Za-z\-]{1,}", window + " " + extra)
+    out = []
+    for w in words:
+        short_ok = w.isupper()  # "OR", "HR" carry meaning; "of", "in" do not
+        w = w.lower()
+        if (len(w) < 3 and not short_ok) or w in _STOP:
+            continue
+        out.append(w[:-1] if len(w) > 4 and w.endswith("s") else w)
+    return tuple(out[-6:])
+
+def section_segments(units: list[TextUnit]) -> Iterator[tuple[str, str, str]]:
+    """(pointer, section, text) runs; a structured abstract's "Results:" stays in the abstract."""
+    section = "front"
+    for u in units:
+        pos = 0
+        for m in _HEADING.finditer(u.text):
+            name = m.group(1).lower()
+            follow = u.text[m.end():m.end() + 2].lstrip()[:1]
+            if follow and not (follow == ":" or follow.isupper()):
+                continue  # "Results were ..." is prose, not a heading
+            if section == "front":
+                new = "abstract" if name == "abstract" else None
+            elif section == "abstract":
+                new = None if follow == ":" or name == "abstract" else _SECTIONS[name]
+            else:
+                new = _SECTIONS[name]
+            if new and new != section:
+                yield u.pointer, section, u.text[pos:m.start()]
+                section, pos = new, m.end()
+        yield u.pointer, section, u.text[pos:]
+
+def extract_quantities(text: str, pointer: str, section: str, extra_context: str = "") -> list[Quantity]:
+    """Quantities sentence by sentence; most prose sentences carry no digit and are skipped outright."""
+    out: list[Quantity] = []
+    for sentence in _SENTENCE_END.split(text):
+        if _DIGIT.search(sentence):
+            out.extend(_extract(sentence, pointer, section, extra_context))
+    return out
+
+def _extract(text: str, pointer: str, section: str, extra_context: str) -> list[Quantity]:
+    out: list[Quantity] = []
+    taken: list[tuple[int, int]] = []
+
+    def add(kind, value, decimals, m, label="", ctx_extra=""):
+        # Shown with a couple of the words before it, so the critic can find it
+        lead = text[max(0, m.start() - 24):m.start()]
+        lead = lead.split(" ", 1)[-1] if m.start() > 24 else lead
+        lead = re.split(r"[.;:]\s|[()]", lead)[-1]
+        out.append(Quantity(kind, value, decimals, pointer, section,
+                            _context(text, m.start(), extra_context + " " + ctx_extra + " " + label),
+                            " ".join((lead + m.group(0)).split()).lstrip(",; "), label))
+        taken.append(m.span())
+
+    def free(m) -> bool:
+        return not any(a < m.end() and m.start() < b for a, b in taken)
+
+    percent = "%" in text
+    for m in _CI.finditer(text) if percent else ():
+        lo, hi = _num(m["lo"]), _num(m["hi"])
+        add("ci", (_num(m["est"]), lo, hi) if m["est"] else (lo, hi), _decimals(m["lo"], m["hi"]), m)
+    for rx in (_FRAC_PCT, _PCT_FRAC) if percent else ():
+        for m in rx.finditer(text):
+            if free(m):
+                add("pct", (_num(m["pct"]),), _decimals(m["pct"]), m, label=f"{m['x']}/{m['y']}")
+    for m in _PCT.finditer(text) if percent else ():
+        if free(m):
+            add("pct", (_num(m["pct"]),), _decimals(m["pct"]), m)
+    for m in _P.finditer(text):
+        if free(m):
+            add("p", (_num(m["v"]),), _decimals(m["v"]), m, label=m["op"])
+    for m in _N.finditer(text):
+        if free(m):
+            n = m["n"] or m["m"]
+            add("n", (_num(n),), 0, m, ctx_extra=m["noun"] or "")
+    for m in _METRIC.finditer(text):
+        if free(m):
+            metric = m["metric"].lower()
+            add("metric", (_num(m["v"]),), _decimals(m["v"]), m, label=_METRIC_ALIASES.get(metric, metric))
+    return out
+
+def table_quantities(table: Table) -> list[Quantity]:
+    """Cells read with the text patterns; context is the row label plus the column header."""
+    header = table.rows[0]
+    out: list[Quantity] = []
+    for row in table.rows[1:]:
+        label = row[0] if row else ""
+        for j, cell in enumerate(row[1:], start=1):
+            col = header[j] if j < len(header) else ""
+            ctx = f"{label} {col}"
+            found = extract_quantities(cell, table.pointer, "table", ctx)
+            if not found and re.fullmatch(_SNUM, cell or ""):
+                # A bare estimate under a metric column ("AUC", "Sensitivity")
+                m = _METRIC.search(f"{col} {cell}") or _METRIC.search(f"{label} {cell}")
+                if m:
+                    metric = m["metric"].lower()
+                    found = [Quantity("metric", (_num(cell),), _decimals(cell), table.pointer, "table",
+                                      _context(ctx, len(ctx)), f"{label}: {cell}", _METRIC_ALIASES.get(metric, metric))]
+            out.extend(found)
+    return out
+
+class QuantityIndex:
+    """Body quantities by (kind, label) sorted by value, and by context word for counterpart lookup."""
+
+    def __init__(self, quantities: list[Quantity]):
+        self.by_value: dict[tuple[str, str], list[tuple[float, int]]] = {}
+        self.by_word: dict[tuple[str, str], list[int]] = {}
+        self.items = quantities
+        for i, q in enumerate(quantities):
+            self.by_value.setdefault(self._key(q), []).append((self._head(q), i))
+            for w in set(q.context):
+                self.by_word.setdefault((q.kind, w), []).append(i)
+        for rows in self.by_value.values():
+            rows.sort()
+
+    @staticmethod
+    def _key(q: Quantity) -> tuple[str, str]:
+        return (q.kind, q.label if q.kind == "metric" else "")
+
+    @staticmethod
+    def _head(q: Quantity) -> float:
+        # CIs are stored as (lo, hi) or (est, lo, hi) and compared on their bounds, so they sort by lo
+        return q.value[-2] if q.kind == "ci" else q.value[0]
+
+    def supports(self, q: Quantity) -> bool:
+        rows = self.by_value.get(self._key(q), [])
+        head = self._head(q)
+        i = bisect.bisect_left(rows, (head - 1.0, -1))
+        while i < len(rows) and rows[i][0] <= head + 1.0:
+            if _same_value(q, self.items[rows[i][1]]):
+                return True
+            i += 1
+        return False
+
+    def counterpart(self, q: Quantity) -> Quantity | None:
+        scores: dict[int, int] = {}
+        for w in set(q.context):
+            for i in self.by_word.get((q.kind, w), ()):
+                if self._key(self.items[i]) == self._key(q):
+                    scores[i] = scores.get(i, 0) + 1
+        if not scores:
+            return None
+        best = max(scores, key=lambda i: (scores[i], -i))
+        return self.items[best] if scores[best] * 2 >= min(len(q.context), 4) else None
+
+def _same_value(a: Quantity, b: Quantity) -> bool:
+    if a.kind == "pct" and a.label and b.label and a.label != b.label:
+        return False  # 45.0% of 54/120 is not 45.0% of 9/20
+    return a.close_to(b)
+
+def internal_checks(quantities: list[Quantity]) -> list[Discrepancy]:
+    out: list[Discrepancy] = []
+    for q in quantities:
+        if q.kind == "pct" and "/" in q.label:
+            x, y = (_num(v) for v in q.label.split("/"))
+            if y and abs(100 * x / y - q.value[0]) > 0.5 * 10 ** -q.decimals + 0.05:
+                out.append(Discrepancy(q.pointer, "arithmetic", f"'{q.text}': {q.label} is {100 * x / y:.{max(q.decimals, 1)}f}%"))
+        elif q.kind == "ci":
+            est, lo, hi = (q.value if len(q.value) == 3 else (float("nan"), *q.value))
+            if lo > hi:
+                out.append(Discrepancy(q.pointer, "ci", f"'{q.text}': lower bound above upper bound"))
+            elif est == est and not lo <= est <= hi:
+                out.append(Discrepancy(q.pointer, "ci", f"'{q.text}': estimate outside its interval"))
+        elif q.kind == "p":
+            v = q.value[0]
+            if v > 1:
+                out.append(Discrepancy(q.pointer, "p_value", f"'{q.text}': a p-value cannot exceed 1"))
+            elif v == 0 and q.label.startswith("="):
+                out.append(Discrepancy(q.pointer, "p_value", f"'{q.text}': report as p < 0.001"))
+    return out
+
+def abstract_checks(abstract: list[Quantity], body: list[Quantity]) -> list[Discrepancy]:
+    if not abstract:
+        return []
+    index = QuantityIndex(body)
+    out: list[Discrepancy] = []
+    for q in abstract:
+        if index.supports(q):
+            continue
+        other = index.counterpart(q)
+        hint = f"; closest in body: '{other.text}' at {other.pointer}" if other else ""
+        out.append(Discrepancy(q.pointer, "abstract", f"abstract '{q.text}' not found in Results/tables{hint}"))
+    return out
+
+def check_numbers(manuscript: Manuscript) -> list[Discrepancy]:
+    abstract: list[Quantity] = []
+    results: list[Quantity] = []
+    other: list[Quantity] = []
+    has_results = False
+    for pointer, section, text in section_segments(manuscript.units):
+        if section in ("front", "references"):
+            continue
+        has_results = has_results or section == "results"
+        qs = extract_quantities(text, pointer, section)
+        (abstract if section == "abstract" else results if section == "results" else other).extend(qs)
+    tables = [q for t in manuscript.tables for q in table_quantities(t)]
+    body = results + tables if has_results else other + tables
+    found = internal_checks(abstract + results + other + tables)
+    if has_results or body:
+        # Without a Results heading or any body numbers the section split probably failed
+        found += abstract_checks(abstract, body)
+    return found
+
+def format_discrepancies(found: list[Discrepancy], max_items: int = 30) -> str:
+    if not found:
+        return "Automated check found no numeric inconsistencies."
+    lines = [f"Automated check ({len(found)} item(s); verify each before citing):"]
+    lines += [f"- {d.pointer} {d.detail}" for d in found[:max_items]]
+    if len(found) > max_items:
+        lines.append(f"- … {len(found) - max_items} more omitted")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    import argparse
+    from .ingest import load_manuscript
+    ap = argparse.ArgumentParser(description="List numeric inconsistencies in a manuscript.")
+    ap.add_argument("input")
+    args = ap.parse_args()
+    print(format_discrepancies(check_numbers(load_manuscript(args.input, tables=True))))
@@ -1,9 +1,127 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import base64
+import json
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Sequence
-import requests
+from typing import TYPE_CHECKING, Callable, Iterator, Protocol, Sequence
+
+from .reasoning import generate_with_budget, merged_stats, split_reasoning
+
+if TYPE_CHECKING:
+    import requests
+
+TokenCallback = Callable[[int, float], None]
+
+# Timing/count fields Ollama attaches to every final response (durations in ns).
+STAT_KEYS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+def _stats(body: dict) -> dict:
+    return {k: body[k] for k in STAT_KEYS if body.get(k) is not None}
+
+_SESSION: requests.Session | None = None
+
+# Set by cancel.CancellableTransport around each call. Every pooled connection
+# the call takes is handed to it (watch), so a cancel can shut the socket even
+# while a read is blocked, e.g. during a long image prompt before Ollama sends
+# any header; the resulting connection error is then re-raised as Cancelled
+# (check).
+CALL_WATCHER: ContextVar = ContextVar("call_watcher", default=None)
+
+def _watched(pool_cls: type) -> type:
+    class WatchedPool(pool_cls):
+        def _get_conn(self, timeout=None):
+            conn = super()._get_conn(timeout)
+            watcher = CALL_WATCHER.get()
+            if watcher is not None:
+                watcher.watch(conn)
+            return conn
+
+    return WatchedPool
+
+@contextmanager
+def _cancel_aware():
+    try:
+        yield
+    except Exception:
+        watcher = CALL_WATCHER.get()
+        if watcher is not None:
+            watcher.check()
+        raise
+
+def session() -> requests.Session:
+    """Process-wide pooled HTTP session, so a resident daemon reuses connections."""
+    global _SESSION
+    if _SESSION is None:
+        import requests  # deferred: thin-client CLI runs never make HTTP calls here
+        from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+        s = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        adapter.poolmanager.pool_classes_by_scheme = {
+            "http": _watched(HTTPConnectionPool),
+            "https": _watched(HTTPSConnectionPool),
+        }
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        _SESSION = s
+    return _SESSION
+
+class Transport(Protocol):
+    """How the clients below reach the server; swapped out for record/replay."""
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict: ...
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]: ...
+
+def _raise_for_status(r: requests.Response) -> None:
+    """raise_for_status, with the server's own error (e.g. Ollama's out-of-memory reason) in the message."""
+    if r.status_code < 400:
+        return
+    try:
+        detail = r.json().get("error") or r.text
+    except ValueError:
+        detail = r.text
+    import requests
+    raise requests.HTTPError(f"{r.status_code} {r.reason} for url: {r.url}: {str(detail)[:500]}", response=r)
+
+class HttpTransport:
+    """Ollama streams JSON lines; OpenAI-compatible servers stream SSE "data:" lines."""
+
+    def __init__(self, headers: dict | None = None):
+        self.headers = headers or None
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict:
+        with _cancel_aware():
+            r = session().post(url, json=payload, timeout=timeout, headers=self.headers)
+            _raise_for_status(r)
+            return r.json()
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]:
+        with _cancel_aware(), session().post(url, json=payload, timeout=timeout, stream=True, headers=self.headers) as r:
+            _raise_for_status(r)
+            for line in r.iter_lines():
+                if not line or line.startswith((b":", b"event:")):
+                    continue
+                if line.startswith(b"data:"):
+                    line = line[5:].strip()
+                    if line == b"[DONE]":
+                        return
+                chunk = json.loads(line)
+                if chunk.get("error"):
+                    raise RuntimeError(chunk["error"])
+                yield chunk
+                if chunk.get("done"):
+                    return
+
+HTTP = HttpTransport()
 
 @dataclass
 class OllamaText:
@@ -13,22 +131,58 @@ class OllamaText:
     num_ctx: int = 16384
     num_predict: int = 3500
     timeout_s: int = 1800
+    keep_alive: str | int | None = None
+    format: dict | str | None = None  # "json" or a JSON schema the reply must follow
+    think: bool | None = None  # Ollama >= 0.9: trace in its own field (True) or none (False); None leaves it inline
+    think_budget: int | None = None  # thinking tokens allowed on top of num_predict
+    transport: Transport = field(default=HTTP, repr=False)
+    last_stats: dict = field(default_factory=dict, repr=False)
+    last_calls: list[tuple[int, dict]] = field(default_factory=list, repr=False)  # (prompt chars, stats) per server call
+    last_thinking: str = field(default="", repr=False)
 
-    def generate(self, prompt: str) -> str:
-        url = f"{self.base_url}/api/generate"
+    def _payload(self, prompt: str, stream: bool, think: bool | None) -> dict:
         payload = {
             "model": self.model,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             "options": {
                 "temperature": self.temperature,
                 "num_ctx": self.num_ctx,
-                "num_predict": self.num_predict,
+                "num_predict": self.num_predict + (self.think_budget or 0),
             },
         }
-        r = requests.post(url, json=payload, timeout=self.timeout_s)
-        r.raise_for_status()
-        return (r.json().get("response") or "").strip()
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.format is not None:
+            payload["format"] = self.format
+        if think is not None:
+            payload["think"] = think
+        return payload
+
+    def _chunks(self, prompt: str, think: bool | None) -> Iterator[tuple[str, str, dict | None]]:
+        stream = self.transport.post_stream(f"{self.base_url}/api/generate", self._payload(prompt, True, think), self.timeout_s)
+        try:
+            for chunk in stream:
+                yield chunk.get("response") or "", chunk.get("thinking") or "", _stats(chunk) if chunk.get("done") else None
+        finally:
+            stream.close()
+
+    def generate(self, prompt: str, on_tokens: TokenCallback | None = None) -> str:
+        """Blocking generate; with `on_tokens`, streams and reports (tokens_so_far, elapsed_s).
+
+        Returns the answer only; a reasoning trace goes to last_thinking.
+        """
+        if on_tokens is None and not self.think_budget:
+            body = self.transport.post_json(f"{self.base_url}/api/generate", self._payload(prompt, False, self.think), self.timeout_s)
+            self.last_stats = _stats(body)
+            self.last_calls = [(len(prompt), self.last_stats)]
+            self.last_thinking, answer = split_reasoning(body.get("response") or "", body.get("thinking") or "")
+            return answer
+        answer, self.last_thinking, self.last_calls = generate_with_budget(
+            self._chunks, prompt, self.think, self.think_budget, on_tokens, self.model,
+        )
+        self.last_stats = merged_stats(self.last_calls)
+        return answer
 
 @dataclass
 class OllamaVLM:
@@ -37,6 +191,9 @@ class OllamaVLM:
     temperature: float = 0.2
     num_ctx: int = 8192
     timeout_s: int = 1800
+    keep_alive: str | int | None = None
+    transport: Transport = field(default=HTTP, repr=False)
+    last_stats: dict = field(default_factory=dict, repr=False)
 
     def analyze_images(self, prompt: str, image_paths: Sequence[str]) -> str:
         url = f"{self.base_url}/api/chat"
@@ -50,7 +207,9 @@ class OllamaVLM:
             "stream": False,
             "options": {"temperature": self.temperature, "num_ctx": self.num_ctx},
         }
-        r = requests.post(url, json=payload, timeout=self.timeout_s)
-        r.raise_for_status()
-        msg = r.json().get("message") or {}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        body = self.transport.post_json(url, payload, self.timeout_s)
+        self.last_stats = _stats(body)
+        msg = body.get("message") or {}
         return (msg.get("content") or "").strip()
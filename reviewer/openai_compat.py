@@ -0,0 +1,137 @@
+from __future__ import annotations
+from dataclasses import dataclass, field
+import base64
+import time
+from pathlib import Path
+from typing import Iterator, Sequence
+
+from .ollama import HTTP, TokenCallback, Transport
+from .reasoning import generate_with_budget, merged_stats, split_reasoning
+
+# Clients for local OpenAI-compatible servers (llama.cpp's llama-server, vLLM,
+# LM Studio, llama-swap, ...). They mirror OllamaText/OllamaVLM, including
+# last_stats in Ollama's field names, so the pipeline and metrics do not care
+# which server answered.
+#
+# num_ctx is accepted for interface parity but these servers fix the context
+# size at launch (e.g. llama-server -c 32768 --parallel 4), and keep_alive has
+# no equivalent.
+
+NS = 1_000_000_000
+
+def api_root(base_url: str) -> str:
+    """Accepts "http://host:8080" or "http://host:8080/v1"."""
+    base = base_url.rstrip("/")
+    return base if base.endswith("/v1") else f"{base}/v1"
+
+def _stats(body: dict, elapsed_s: float) -> dict:
+    usage = body.get("usage") or {}
+    stats = {"total_duration": int(elapsed_s * NS)}
+    if usage.get("prompt_tokens") is not None:
+        stats["prompt_eval_count"] = usage["prompt_tokens"]
+    if usage.get("completion_tokens") is not None:
+        stats["eval_count"] = usage["completion_tokens"]
+    # llama-server adds per-request timings; other servers only report usage.
+    timings = body.get("timings") or {}
+    if timings.get("prompt_ms") is not None:
+        stats["prompt_eval_duration"] = int(timings["prompt_ms"] * 1_000_000)
+        stats.setdefault("prompt_eval_count", timings.get("prompt_n", 0))
+    if timings.get("predicted_ms") is not None:
+        stats["eval_duration"] = int(timings["predicted_ms"] * 1_000_000)
+        stats.setdefault("eval_count", timings.get("predicted_n", 0))
+    return stats
+
+def _response_format(fmt: dict | str) -> dict:
+    # llama-server, vLLM and LM Studio all take the json_schema form
+    if fmt == "json":
+        return {"type": "json_object"}
+    return {"type": "json_schema", "json_schema": {"name": "reply", "schema": fmt}}
+
+def _payload(client, messages: list[dict], max_tokens: int | None, stream: bool) -> dict:
+    payload = {
+        "model": client.model,
+        "messages": messages,
+        "temperature": client.temperature,
+        "stream": stream,
+    }
+    if max_tokens:
+        payload["max_tokens"] = max_tokens
+    if getattr(client, "format", None) is not None:
+        payload["response_format"] = _response_format(client.format)
+    if stream:
+        payload["stream_options"] = {"include_usage": True}
+    return payload
+
+def _chunks(client, messages: list[dict], max_tokens: int | None) -> Iterator[tuple[str, str, dict | None]]:
+    # llama-server (--reasoning-format) and vLLM put the trace in reasoning_content
+    t0 = time.time()
+    url = f"{api_root(client.base_url)}/chat/completions"
+    stream = client.transport.post_stream(url, _payload(client, messages, max_tokens, True), client.timeout_s)
+    try:
+        for chunk in stream:
+            for choice in chunk.get("choices") or []:
+                delta = choice.get("delta") or {}
+                yield delta.get("content") or "", delta.get("reasoning_content") or "", None
+            if chunk.get("usage") or chunk.get("timings"):
+                yield "", "", _stats(chunk, time.time() - t0)
+    finally:
+        stream.close()
+
+def _chat(client, messages: list[dict], max_tokens: int | None) -> tuple[str, str]:
+    """(trace, answer) of one non-streamed reply."""
+    t0 = time.time()
+    url = f"{api_root(client.base_url)}/chat/completions"
+    body = client.transport.post_json(url, _payload(client, messages, max_tokens, False), client.timeout_s)
+    client.last_stats = _stats(body, time.time() - t0)
+    message = (body.get("choices") or [{}])[0].get("message") or {}
+    return split_reasoning(message.get("content") or "", message.get("reasoning_content") or "")
+
+@dataclass
+class OpenAIText:
+    model: str
+    base_url: str = "http://localhost:8080"
+    temperature: float = 0.2
+    num_ctx: int = 16384
+    num_predict: int = 3500
+    timeout_s: int = 1800
+    keep_alive: str | int | None = None
+    format: dict | str | None = None  # "json" or a JSON schema the reply must follow
+    think: bool | None = None  # accepted for parity; the server's launch flags decide
+    think_budget: int | None = None  # thinking tokens allowed on top of num_predict
+    transport: Transport = field(default=HTTP, repr=False)
+    last_stats: dict = field(default_factory=dict, repr=False)
+    last_calls: list[tuple[int, dict]] = field(default_factory=list, repr=False)  # (prompt chars, stats) per server call
+    last_thinking: str = field(default="", repr=False)
+
+    def generate(self, prompt: str, on_tokens: TokenCallback | None = None) -> str:
+        """Returns the answer only; a reasoning trace goes to last_thinking."""
+        if on_tokens is None and not self.think_budget:
+            self.last_thinking, answer = _chat(self, [{"role": "user", "content": prompt}], self.num_predict)
+            self.last_calls = [(len(prompt), self.last_stats)]
+            return answer
+        max_tokens = self.num_predict + (self.think_budget or 0)
+        answer, self.last_thinking, self.last_calls = generate_with_budget(
+            lambda p, think: _chunks(self, [{"role": "user", "content": p}], max_tokens),
+            prompt, None, self.think_budget, on_tokens, self.model,
+        )
+        self.last_stats = merged_stats(self.last_calls)
+        return answer
+
+@dataclass
+class OpenAIVLM:
+    model: str
+    base_url: str = "http://localhost:8080"
+    temperature: float = 0.2
+    num_ctx: int = 8192
+    timeout_s: int = 1800
+    keep_alive: str | int | None = None
+    transport: Transport = field(default=HTTP, repr=False)
+    last_stats: dict = field(default_factory=dict, repr=False)
+
+    def analyze_images(self, prompt: str, image_paths: Sequence[str]) -> str:
+        content: list[dict] = [{"type": "text", "text": prompt}]
+        for p in image_paths:
+            b64 = base64.b64encode(Path(p).read_bytes()).decode("utf-8")
+            mime = "image/jpeg" if Path(p).suffix.lower() in (".jpg", ".jpeg") else "image/png"
+            content.append({"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64}"}})
+        return _chat(self, [{"role": "user", "content": content}], None)[1]
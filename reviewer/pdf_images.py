@@ -3,7 +3,10 @@ from __future__ import annotations
 from dataclasses import dataclass
 from pathlib import Path
 import re
-import fitz  # PyMuPDF
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import fitz  # PyMuPDF
 
 
 @dataclass
@@ -30,6 +33,132 @@ def pages_with_embedded_images(doc: fitz.Document) -> list[int]:
     return pages
 
 
+# Tables with a text layer are read by ingest (Table.to_markdown); only pages
+# with raster figures (scanned tables included) or vector graphics outside
+# those tables are worth a VLM call.
+MIN_IMAGE_AREA = 0.02  # of the page; smaller rasters are logos and icons
+MIN_FIGURE_PATHS = 12  # vector paths outside tables before a page counts as a chart
+
+
+def _inside(rect, boxes: list[tuple[float, float, float, float]], pad: float = 3.0) -> bool:
+    return any(
+        rect.x0 >= b[0] - pad and rect.y0 >= b[1] - pad and rect.x1 <= b[2] + pad and rect.y1 <= b[3] + pad
+        for b in boxes
+    )
+
+
+# Page selection for the VLM: every page is scored for how likely it is to
+# carry a figure, and the best pages are taken until the page, pixel or
+# estimated-time budget runs out. Logos, headers and text pages score zero.
+_CAPTION = re.compile(r"\b(?:Fig(?:ure)?\.?|Table)\s*\d+[A-Za-z]?\s*[.:|]")
+DENSE_TEXT_CHARS = 3500  # a full page of running text
+VLM_PATCH = 28  # Qwen2.5-VL: one vision token per 28x28 pixels
+
+
+@dataclass
+class PageScore:
+    index: int
+    kind: str | None = None  # "raster" | "vector" | None
+    image_frac: float = 0.0
+    paths: int = 0
+    captions: int = 0
+    text_chars: int = 0
+    pixels: int = 0
+
+    @property
+    def score(self) -> float:
+        if not self.kind:
+            return 0.0
+        return (
+            3.0 * min(self.image_frac / 0.25, 1.0)
+            + 2.0 * min(self.paths / 60, 1.0)
+            + 1.5 * min(self.captions, 2) / 2
+            + 1.0 * (1.0 - min(self.text_chars / DENSE_TEXT_CHARS, 1.0))
+        )
+
+    @property
+    def tokens(self) -> int:
+        return max(1, self.pixels // (VLM_PATCH * VLM_PATCH))
+
+
+@dataclass
+class VisionBudget:
+    max_pages: int = 10
+    megapixels: float | None = None
+    seconds: float | None = None
+    tokens_per_s: float = 400.0  # VLM prompt processing, see context.vision_prompt_rate
+
+
+def fit_budget(candidates: list, budget: VisionBudget) -> list:
+    """Greedily takes candidates (anything with .pixels and .tokens) in order until the budget runs out."""
+    chosen = []
+    pixels = 0
+    seconds = 0.0
+    for c in candidates:
+        if len(chosen) >= budget.max_pages:
+            break
+        cost_s = c.tokens / budget.tokens_per_s
+        over_pixels = budget.megapixels is not None and pixels + c.pixels > budget.megapixels * 1e6
+        over_time = budget.seconds is not None and seconds + cost_s > budget.seconds
+        if chosen and (over_pixels or over_time):
+            continue  # a smaller one further down may still fit
+        chosen.append(c)
+        pixels += c.pixels
+        seconds += cost_s
+    return chosen
+
+
+def score_page(
+    page: fitz.Page,
+    table_boxes: list[tuple[float, float, float, float]] = (),
+    text: str | None = None,
+    dpi: int = 200,
+) -> PageScore:
+    import fitz  # PyMuPDF
+
+    area = abs(page.rect)
+    s = PageScore(index=page.number)
+    if page.get_images():  # cheap resource listing gates the slower placement lookup
+        covered = sum(abs(fitz.Rect(info["bbox"]) & page.rect) for info in page.get_image_info())
+        s.image_frac = min(covered / area, 1.0)
+    s.paths = sum(1 for d in page.get_drawings() if not _inside(d["rect"], table_boxes))
+    text = page.get_text("text") if text is None else text
+    s.captions = len(_CAPTION.findall(text))
+    s.text_chars = len(text)
+    s.pixels = int(page.rect.width * dpi / 72) * int(page.rect.height * dpi / 72)
+    if s.image_frac >= MIN_IMAGE_AREA:
+        s.kind = "raster"
+    elif s.paths >= MIN_FIGURE_PATHS:
+        s.kind = "vector"
+    return s
+
+
+def select_figure_pages(
+    doc: fitz.Document,
+    tables: list = (),
+    budget: VisionBudget | None = None,
+    page_text: dict[int, str] | None = None,
+    dpi: int = 200,
+) -> list[PageScore]:
+    """Best-scoring figure pages within the budget, returned in page order.
+
+    `tables` are ingest.Table objects (their areas do not count as figures);
+    `page_text` reuses ingest's text so pages are not read twice.
+    """
+    budget = budget or VisionBudget()
+    boxes: dict[int, list] = {}
+    for t in tables:
+        if t.page is not None and t.bbox:
+            boxes.setdefault(t.page, []).append(t.bbox)
+    page_text = page_text or {}
+    scored = [
+        score_page(doc.load_page(i), boxes.get(i, []), page_text.get(i), dpi)
+        for i in range(doc.page_count)
+    ]
+    ranked = sorted((s for s in scored if s.kind), key=lambda s: (-s.score, s.index))
+    return sorted(fit_budget(ranked, budget), key=lambda s: s.index)
+
+
 def fallback_pages(doc: fitz.Document, mode: str) -> list[int]:
     n = doc.page_count
     if n == 0:
@@ -52,6 +181,8 @@ def render_pages_to_png(
     """
     Returns: (image_paths, page_indices_0based, reason)
     """
+    import fitz  # PyMuPDF
+
     pdf_path = pdf_path.resolve()
     out_dir.mkdir(parents=True, exist_ok=True)
 
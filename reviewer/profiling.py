@@ -0,0 +1,243 @@
+from __future__ import annotations
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Per-stage profile of our own Python work (reviewer.cli --profile).
+#
+# A sampling thread reads every thread's stack each few milliseconds and
+# charges it with the CPU time that thread used since the previous sample
+# (its pthread CPU clock; wall time on Windows). Threads waiting on a model
+# server use no CPU, so the LLM calls drop out and what is left is
+# rendering, encoding, sentence splitting and the like. This covers the
+# vision worker threads too, which cProfile would not. Stacks are written
+# in the folded format that flamegraph.pl, inferno and speedscope read, with
+# the stage as the root frame.
+#
+# Around each stage the profiler also records CPU seconds, peak RSS and bytes
+# read and written. Peak RSS (the kernel's high-water mark, reset per stage
+# on Linux, otherwise the largest sample) includes PyMuPDF's and torch's own
+# buffers. tracemalloc would miss those and slows the PyMuPDF import twenty-fold.
+# The I/O counts are all read()/write() calls, sockets included.
+
+FOLDED_FILE = "profile.folded"
+SUMMARY_FILE = "profile.md"
+JSON_FILE = "profile.json"
+DEFAULT_INTERVAL_S = 0.005
+OUTSIDE = "(between stages)"
+TOP_FUNCTIONS = 25
+MB = 1024 * 1024
+PAGE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+@dataclass
+class StageCost:
+    stage: str
+    calls: int = 0
+    wall_s: float = 0.0
+    cpu_s: float = 0.0
+    sampled_cpu_s: float = 0.0  # CPU time the sampler attributed to stacks, all threads
+    peak_rss_mb: float = 0.0
+    read_mb: float | None = None
+    written_mb: float | None = None
+
+def _io_counters() -> tuple[int, int] | None:
+    """(bytes read, bytes written) by this process so far, or None where that cannot be read."""
+    try:
+        fields = dict(line.split(":", 1) for line in Path("/proc/self/io").read_text().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import psutil  # optional
+        io = psutil.Process().io_counters()
+        return getattr(io, "read_chars", io.read_bytes), getattr(io, "write_chars", io.write_bytes)
+    except Exception:
+        return None
+
+def _rss() -> int | None:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil  # optional
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+def _reset_peak_rss() -> bool:
+    """Restarts the kernel's RSS high-water mark (Linux); False where it cannot."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss() -> int | None:
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _thread_clock(ident: int):
+    """A function returning the thread's CPU seconds, or None where per-thread clocks are not available."""
+    try:
+        clock = time.pthread_getcpuclockid(ident)
+        time.clock_gettime(clock)
+    except (AttributeError, OSError):
+        return None
+    return lambda: time.clock_gettime(clock)
+
+def _frame_label(code) -> str:
+    parts = Path(code.co_filename).parts
+    short = "/".join(parts[-2:]) if len(parts) > 1 else code.co_filename
+    return f"{code.co_name} ({short}:{code.co_firstlineno})".replace(";", ":")
+
+class StageProfiler:
+    """Attach to RunMetrics.profiler; RunMetrics.stage then profiles each stage."""
+
+    def __init__(self, interval_s: float = DEFAULT_INTERVAL_S):
+        self.interval_s = interval_s
+        self.costs: dict[str, StageCost] = {}
+        self.stacks: dict[str, float] = {}  # folded stack -> CPU seconds
+        self.self_time: dict[tuple[str, str], float] = {}  # (stage, function) -> CPU seconds at the leaf
+        self._stage = OUTSIDE
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._clocks: dict[int, object] = {}
+        self._last: dict[int, float] = {}
+        self._labels: dict[object, str] = {}
+        self._rss_peak = 0  # largest RSS the sampler has seen in the current stage
+
+    def start(self) -> "StageProfiler":
+        self._last_wall = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stage-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @contextmanager
+    def stage(self, name: str):
+        cost = self.costs.setdefault(name, StageCost(name))
+        prev, self._stage = self._stage, name
+        hwm = _reset_peak_rss()
+        self._rss_peak = _rss() or 0
+        io0 = _io_counters()
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            cost.calls += 1
+            cost.wall_s += time.perf_counter() - wall0
+            cost.cpu_s += time.process_time() - cpu0
+            peak = max(self._rss_peak, (_peak_rss() or 0) if hwm else 0)
+            cost.peak_rss_mb = max(cost.peak_rss_mb, peak / MB)
+            io1 = _io_counters()
+            if io0 and io1:
+                cost.read_mb = (cost.read_mb or 0.0) + (io1[0] - io0[0]) / MB
+                cost.written_mb = (cost.written_mb or 0.0) + (io1[1] - io0[1]) / MB
+            self._stage = prev
+
+    # -- sampling --
+
+    def _used(self, ident: int, wall_elapsed: float) -> float:
+        if ident not in self._clocks:
+            self._clocks[ident] = _thread_clock(ident)
+        clock = self._clocks[ident]
+        if clock is None:
+            return wall_elapsed
+        try:
+            now = clock()
+        except OSError:  # the thread has exited; a new thread may reuse its ident
+            self._clocks.pop(ident, None)
+            self._last.pop(ident, None)
+            return 0.0
+        used = now - self._last.get(ident, now)
+        self._last[ident] = now
+        return used
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval_s):
+            now = time.perf_counter()
+            wall_elapsed, self._last_wall = now - self._last_wall, now
+            stage = self._stage
+            self._rss_peak = max(self._rss_peak, _rss() or 0)
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                used = self._used(ident, wall_elapsed)
+                if used <= 0:
+                    continue
+                names = []
+                while frame is not None:
+                    names.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                if not names:
+                    continue
+                key = ";".join([stage, *reversed(names)])
+                with self._lock:
+                    self.stacks[key] = self.stacks.get(key, 0.0) + used
+                    self.self_time[(stage, names[0])] = self.self_time.get((stage, names[0]), 0.0) + used
+                    if stage in self.costs:
+                        self.costs[stage].sampled_cpu_s += used
+
+    # -- output --
+
+    def top_functions(self, n: int = TOP_FUNCTIONS) -> list[dict]:
+        ranked = sorted(self.self_time.items(), key=lambda kv: -kv[1])[:n]
+        return [{"stage": s, "function": f, "self_cpu_s": round(t, 3)} for (s, f), t in ranked]
+
+    def summary(self) -> str:
+        lines = [
+            "| Stage | Calls | Wall s | CPU s | Sampled CPU s | Peak RSS MB | Read MB | Written MB |",
+            "| :--- | ---: | ---: | ---: | ---: | ---: | ---: | ---: |",
+        ]
+        fmt = lambda v: "–" if v is None else f"{v:.2f}"
+        for c in self.costs.values():
+            lines.append(f"| {c.stage} | {c.calls} | {c.wall_s:.2f} | {c.cpu_s:.2f} | {c.sampled_cpu_s:.2f} | "
+                         f"{c.peak_rss_mb:.1f} | {fmt(c.read_mb)} | {fmt(c.written_mb)} |")
+        lines += ["", "Top functions by self CPU time (all threads):", "",
+                  "| Stage | Function | Self CPU s |", "| :--- | :--- | ---: |"]
+        for row in self.top_functions():
+            lines.append(f"| {row['stage']} | `{row['function']}` | {row['self_cpu_s']:.3f} |")
+        return "\n".join(lines)
+
+    def write(self, out_dir: str | Path) -> Path:
+        """Writes profile.folded, profile.json and profile.md; returns the summary path."""
+        out = Path(out_dir)
+        with self._lock:
+            folded = [f"{stack} {max(1, round(s * 1e6))}" for stack, s in sorted(self.stacks.items())]
+        # Counts are CPU microseconds, so flame graph widths read as time
+        (out / FOLDED_FILE).write_text("\n".join(folded) + "\n", encoding="utf-8")
+        (out / JSON_FILE).write_text(json.dumps({
+            "interval_s": self.interval_s,
+            "stages": [asdict(c) for c in self.costs.values()],
+            "top_functions": self.top_functions(),
+        }, indent=2), encoding="utf-8")
+        path = out / SUMMARY_FILE
+        path.write_text("# Profile\n\n" + self.summary() + "\n", encoding="utf-8")
+        logging.info(f"Profile written to {path} and {out / FOLDED_FILE} (flame graph: flamegraph.pl, speedscope).")
+        return path
@@ -0,0 +1,198 @@
+from __future__ import annotations
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterator
+
+# Machine-readable progress side channel between reviewer.cli and the app.
+# One JSON object per line; consumers only need to understand "event":
+#   stage_start / stage_end  {"stage": ...}
+#   tokens                   {"stage", "tokens", "tok_s"}
+#   progress                 {"pct", "eta_s"} (emitted alongside the above)
+#   end                      {"status": "ok" | "error" | "cancelled", ...}
+
+PROGRESS_FILE = "progress.jsonl"
+
+# Rough share of wall time per stage on the default presets; only used to turn
+# stage boundaries and token counts into one overall percentage.
+STAGE_WEIGHTS = {
+    "ingest": 3,
+    "vision": 20,
+    "critic": 50,
+    "writer": 25,
+    "save": 2,
+}
+
+STAGE_LABELS = {
+    "ingest": "📄 Extracting manuscript text...",
+    "vision": "🖼️ Vision Agent: Checking figures and tables...",
+    "critic": "🧐 Critic Agent: Reading and analyzing manuscript...",
+    "writer": "✍️ Writer Agent: Drafting peer review report...",
+    "save": "💾 Finalizing and saving reports...",
+}
+
+class ProgressReporter:
+    def __init__(self, path: str | Path | None, stages: list[str] | None = None,
+                 listeners: list[Callable[[dict], None]] | None = None):
+        self.path = Path(path) if path else None
+        self._fh = open(self.path, "a", encoding="utf-8") if self.path else None
+        self.listeners = list(listeners or [])
+        self.stages = list(stages or STAGE_WEIGHTS)
+        self.t0 = time.time()
+        self._done: set[str] = set()
+        self._current: str | None = None
+        self._stage_t0 = self.t0
+
+    def _weight(self, stage: str) -> float:
+        return float(STAGE_WEIGHTS.get(stage, 1))
+
+    @property
+    def _total(self) -> float:
+        return sum(self._weight(s) for s in self.stages) or 1.0
+
+    def emit(self, event: str, **fields) -> None:
+        rec = {"ts": round(time.time(), 3), "event": event, **fields}
+        if self._fh:
+            self._fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._fh.flush()
+        for listener in self.listeners:
+            listener(rec)
+
+    def _overall(self, stage_fraction: float = 0.0) -> float:
+        done_w = sum(self._weight(s) for s in self._done)
+        cur_w = self._weight(self._current) * min(max(stage_fraction, 0.0), 1.0) if self._current else 0.0
+        return (done_w + cur_w) / self._total
+
+    def _eta(self, overall: float, stage_eta_s: float | None = None) -> float | None:
+        elapsed = time.time() - self.t0
+        if stage_eta_s is not None and self._current:
+            # Current stage from measured throughput, later stages pro rata.
+            later = [s for s in self.stages if s not in self._done and s != self._current]
+            done_w = sum(self._weight(s) for s in self._done) + self._weight(self._current)
+            per_w = elapsed / done_w if done_w else 0.0
+            return stage_eta_s + per_w * sum(self._weight(s) for s in later)
+        if overall <= 0.01:
+            return None
+        return elapsed / overall * (1.0 - overall)
+
+    def _progress(self, stage_fraction: float = 0.0, stage_eta_s: float | None = None) -> None:
+        overall = self._overall(stage_fraction)
+        eta = self._eta(overall, stage_eta_s)
+        self.emit("progress", stage=self._current, pct=round(100 * overall, 1),
+                  eta_s=round(eta, 1) if eta is not None else None)
+
+    @property
+    def current(self) -> str | None:
+        return self._current
+
+    def stage_start(self, stage: str, detail: str = "") -> None:
+        if stage not in self.stages:
+            self.stages.append(stage)
+        self._current = stage
+        self._stage_t0 = time.time()
+        self.emit("stage_start", stage=stage, detail=detail)
+        self._progress()
+
+    def stage_end(self, stage: str, status: str = "ok") -> None:
+        self._done.add(stage)
+        self.emit("stage_end", stage=stage, status=status, seconds=round(time.time() - self._stage_t0, 3))
+        self._current = None
+        self._progress()
+
+    def skip(self, stage: str) -> None:
+        """Drops a stage from the plan so it no longer weighs on pct/ETA."""
+        if stage in self.stages:
+            self.stages.remove(stage)
+        self.emit("stage_skip", stage=stage)
+
+    def tokens(self, stage: str, n_tokens: int, elapsed_s: float, expected: int | None = None) -> None:
+        tok_s = n_tokens / elapsed_s if elapsed_s > 0 else 0.0
+        self.emit("tokens", stage=stage, tokens=n_tokens, tok_s=round(tok_s, 2))
+        if expected and tok_s > 0:
+            self._progress(n_tokens / expected, max(expected - n_tokens, 0) / tok_s)
+
+    def end(self, status: str = "ok", **fields) -> None:
+        self.emit("end", status=status, seconds=round(time.time() - self.t0, 3), **fields)
+        if self._fh:
+            self._fh.close()
+            self._fh = None
+
+    def token_callback(self, stage: str, expected: int | None = None, every: int = 16):
+        """Returns an on_tokens(n, elapsed) hook that reports every `every` tokens."""
+        def _cb(n: int, elapsed: float) -> None:
+            if n % every == 0:
+                self.tokens(stage, n, elapsed, expected)
+        return _cb
+
+@dataclass
+class ProgressState:
+    pct: float = 0.0
+    stage: str | None = None
+    text: str = "Initializing reviewer..."
+    tok_s: float | None = None
+    eta_s: float | None = None
+    finished: bool = False
+    status: str | None = None
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+
+    def apply(self, ev: dict) -> None:
+        kind = ev.get("event")
+        if kind == "stage_start":
+            self.stage = ev.get("stage")
+            self.text = STAGE_LABELS.get(self.stage or "", f"Running {self.stage}...")
+            self.tok_s = None
+        elif kind == "stage_end":
+            self.stage_seconds[ev.get("stage", "")] = float(ev.get("seconds") or 0.0)
+        elif kind == "tokens":
+            self.tok_s = ev.get("tok_s")
+        elif kind == "progress":
+            self.pct = float(ev.get("pct") or 0.0)
+            self.eta_s = ev.get("eta_s")
+        elif kind == "end":
+            self.finished = True
+            self.status = ev.get("status")
+            if self.status == "ok":
+                self.pct = 100.0
+
+def read_events(path: str | Path, offset: int = 0) -> tuple[list[dict], int]:
+    """Reads complete lines after `offset`; returns (events, new_offset)."""
+    p = Path(path)
+    if not p.exists():
+        return [], offset
+    events: list[dict] = []
+    with open(p, "rb") as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break  # partial line still being written
+            offset += len(raw)
+            try:
+                events.append(json.loads(raw))
+            except ValueError:
+                continue
+    return events, offset
+
+def load_state(path: str | Path) -> ProgressState:
+    state = ProgressState()
+    for ev in read_events(path)[0]:
+        state.apply(ev)
+    return state
+
+def follow(path: str | Path, offset: int = 0, idle_s: float = 0.5, timeout_s: float | None = None) -> Iterator[dict]:
+    """Yields events as they are appended, until an "end" event or the timeout."""
+    deadline = time.time() + timeout_s if timeout_s else None
+    p = Path(path)
+    last_size = -1
+    while True:
+        size = p.stat().st_size if p.exists() else 0
+        if size != last_size:
+            last_size = size
+            events, offset = read_events(p, offset)
+            for ev in events:
+                yield ev
+                if ev.get("event") == "end":
+                    return
+        if deadline and time.time() >= deadline:
+            return
+        time.sleep(idle_s)
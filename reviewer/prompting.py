@@ -1,4 +1,5 @@
 from __future__ import annotations
+import re
 from pathlib import Path
 
 def load_text(path: str | Path) -> str:
@@ -7,3 +8,9 @@ def load_text(path: str | Path) -> str:
 def excerpt(text: str, max_chars: int = 1200) -> str:
     t = " ".join(text.split())
     return (t[:max_chars] + "…") if len(t) > max_chars else t
+
+_PLACEHOLDER = re.compile(r"\{([a-z_]+)\}")
+
+def fill_template(template: str, values: dict[str, str], missing: str = "(not provided)") -> str:
+    """Fills {name} placeholders in one pass; names without a value get `missing`."""
+    return _PLACEHOLDER.sub(lambda m: values.get(m.group(1)) or missing, template)
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import logging
+import re
+import time
+from typing import Callable, Iterator
+
+# Reasoning traces (deepseek-r1 and other thinking models).
+#
+# A thinking model's reply comes in two parts: Ollama >= 0.9 (with `think`)
+# and llama-server (--reasoning-format) send the trace in its own field, and
+# otherwise it arrives inline as <think>…</think> before the answer.
+# ReasoningSplit separates the two as the stream arrives, so the trace can
+# be counted against a thinking budget and saved on its own while only the
+# answer goes downstream. When the budget runs out the stream is closed, so
+# the server stops, and the model is asked for its answer with its
+# reasoning so far; the unchanged prompt prefix is still in Ollama's cache.
+
+OPEN, CLOSE = "<think>", "</think>"
+THINKING_FILE = "{stage}_thinking.md"
+THINK_CHOICES = {"auto": None, "on": True, "off": False}
+BUDGET_MARK = "[thinking budget reached; asked for the answer]"
+# Used when the server cannot say (OpenAI-compatible servers, Ollama < 0.9)
+_THINKING_NAMES = re.compile(r"deepseek-r1|qwq|qwen3|magistral|reasoning|thinking|gpt-oss|exaone-deep", re.IGNORECASE)
+
+ANSWER_NOW = """{prompt}
+
+---
+Your reasoning so far (stopped at the thinking budget):
+{thinking}
+
+Stop deliberating. Using the reasoning above, write the final answer now, in the required output format."""
+
+def _split_inline(raw: str) -> tuple[str, str]:
+    i, j = raw.find(OPEN), raw.find(CLOSE)
+    if i >= 0 and (j < 0 or i < j):
+        end = raw.find(CLOSE, i)
+        if end < 0:
+            return raw[i + len(OPEN):], raw[:i]  # cut off while still thinking
+        return raw[i + len(OPEN):end], raw[:i] + raw[end + len(CLOSE):]
+    if j >= 0:
+        return raw[:j], raw[j + len(CLOSE):]  # R1 templates open the trace themselves
+    return "", raw
+
+class ReasoningSplit:
+    """Separates trace and answer of a streamed reply; inline tags may be cut across chunks."""
+
+    def __init__(self):
+        self._raw: list[str] = []
+        self._field: list[str] = []
+        self._tail = ""  # end of the text so far, for tags split across chunks
+        self._state: str | None = None  # None (no tag yet), "think" or "answer"
+        self.thinking_chunks = 0  # ~ thinking tokens: Ollama streams one token per chunk
+
+    def feed(self, text: str = "", thinking: str = "") -> None:
+        was_thinking = self._state == "think"
+        if thinking:
+            self._field.append(thinking)
+        if text:
+            self._raw.append(text)
+            window = self._tail + text
+            if self._state is None and OPEN in window:
+                self._state, window = "think", window.split(OPEN, 1)[1]
+            if self._state != "answer" and CLOSE in window:
+                self._state, window = "answer", window.split(CLOSE, 1)[1]
+            self._tail = window[-(len(CLOSE) - 1):]
+        if thinking or was_thinking or self._state == "think":
+            self.thinking_chunks += 1
+
+    @property
+    def in_thinking(self) -> bool:
+        return self._state == "think"
+
+    @property
+    def answering(self) -> bool:
+        return self._state == "answer" or (self._state is None and any(t.strip() for t in self._raw))
+
+    @property
+    def separate_field(self) -> bool:
+        """The server sent the trace in its own field, so it also honours think=False."""
+        return bool(self._field)
+
+    def parts(self) -> tuple[str, str]:
+        """(trace, answer)."""
+        trace, answer = _split_inline("".join(self._raw))
+        return "\n".join(t for t in ("".join(self._field).strip(), trace.strip()) if t), answer.strip()
+
+def split_reasoning(text: str, thinking: str = "") -> tuple[str, str]:
+    """(trace, answer) of a complete reply."""
+    split = ReasoningSplit()
+    split.feed(text, thinking)
+    return split.parts()
+
+def answer_now_prompt(prompt: str, thinking: str) -> str:
+    return ANSWER_NOW.format(prompt=prompt, thinking=thinking)
+
+def is_thinking_model(show: dict | None, model: str) -> bool:
+    """Ollama >= 0.9 lists "thinking" in /api/show capabilities; otherwise go by the name."""
+    capabilities = (show or {}).get("capabilities")
+    if isinstance(capabilities, list):
+        return "thinking" in capabilities
+    return bool(_THINKING_NAMES.search(model))
+
+# stream(prompt, think) yields (text, thinking, final stats or None) per chunk
+Stream = Callable[[str, "bool | None"], Iterator[tuple[str, str, "dict | None"]]]
+
+def merged_stats(calls: list[tuple[int, dict]]) -> dict:
+    """Summed stats of the server calls behind one reply."""
+    out: dict = {}
+    for _, stats in calls:
+        for k, v in stats.items():
+            if isinstance(v, (int, float)) and isinstance(out.get(k, 0), (int, float)):
+                out[k] = out.get(k, 0) + v
+    return out
+
+def generate_with_budget(stream: Stream, prompt: str, think: bool | None, budget: int | None,
+                         on_tokens=None, label: str = "") -> tuple[str, str, list[tuple[int, dict]]]:
+    """(answer, trace, calls) of one streamed reply; calls are (prompt chars, stats) per server call.
+
+    Once the trace passes `budget` tokens the stream is closed and the model
+    is asked to answer from what it has. The answer may be empty; the trace is
+    never passed on in its place. The two calls are kept apart so each prompt
+    is measured against its own tokens.
+    """
+    t0 = time.time()
+    sent = 0
+
+    def once(p: str, think: bool | None) -> tuple[ReasoningSplit, dict, bool]:
+        nonlocal sent
+        split, stats, cut, n, t1 = ReasoningSplit(), None, False, 0, time.time()
+        chunks = stream(p, think)
+        try:
+            for text, thinking, final in chunks:
+                if final is not None:
+                    stats = final
+                if not (text or thinking):
+                    continue
+                split.feed(text, thinking)
+                n += 1
+                sent += 1
+                if on_tokens:
+                    on_tokens(sent, time.time() - t0)
+                if budget and split.thinking_chunks > budget and not split.answering:
+                    cut = True
+                    break
+        finally:
+            chunks.close()  # closes the response, so the server stops generating
+        if stats is None:
+            stats = {"eval_count": n, "eval_duration": int((time.time() - t1) * 1e9)}
+        return split, stats, cut
+
+    split, stats, cut = once(prompt, think)
+    trace, answer = split.parts()
+    if not cut:
+        return answer, trace, [(len(prompt), stats)]
+    logging.warning(f"⚠️ {label}: reasoning passed the {budget}-token thinking budget; asking for the answer now.")
+    second = answer_now_prompt(prompt, trace)
+    split2, stats2, _ = once(second, False if split.separate_field else think)
+    trace2, answer = split2.parts()
+    trace = "\n\n".join(t for t in (trace, BUDGET_MARK, trace2) if t)
+    return answer, trace, [(len(prompt), stats), (len(second), stats2)]
+
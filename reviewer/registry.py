@@ -0,0 +1,243 @@
+from __future__ import annotations
+import json
+import logging
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .hosts import model_key, normalize_url
+
+# Installed models and their details, shared by the app, the launcher and the
+# resource planner.
+#
+# The model list (/api/tags, or /v1/models on an OpenAI-compatible server) is
+# read at most once per TAGS_TTL_S for each host. Streamlit reruns the whole
+# app on every click, so this replaces one request per rerun and per preset.
+# /api/show is read once per model digest, so a re-pulled model is read again.
+# Names resolve exactly as Ollama resolves them: "llama3.3" is
+# "llama3.3:latest" and never matches "llama3.3-vision" or
+# "llama3.3:70b-instruct-q8_0". Pulls use /api/pull, so their progress can be
+# shown, and several run at once.
+
+TAGS_TTL_S = 30.0
+PROBE_TIMEOUT_S = 2.0
+SHOW_TIMEOUT_S = 10.0
+PULL_TIMEOUT_S = 600.0  # between streamed lines; verifying a large blob is silent for a while
+MAX_PARALLEL_PULLS = 3
+
+@dataclass(frozen=True)
+class InstalledModel:
+    name: str
+    size: int = 0  # weights on disk (bytes)
+    digest: str = ""
+    host: str = ""
+
+@dataclass(frozen=True)
+class ModelDetails:
+    name: str
+    context_length: int | None = None
+    parameter_count: int | None = None
+    quantization: str = ""
+    family: str = ""
+    capabilities: tuple[str, ...] = ()
+
+    @classmethod
+    def from_show(cls, name: str, body: dict | None) -> "ModelDetails":
+        info = (body or {}).get("model_info") or {}
+        details = (body or {}).get("details") or {}
+        arch = info.get("general.architecture", "")
+        context = info.get(f"{arch}.context_length")
+        if not isinstance(context, int):
+            context = next((v for k, v in info.items() if k.endswith(".context_length") and isinstance(v, int)), None)
+        return cls(
+            name=name,
+            context_length=context,
+            parameter_count=info.get("general.parameter_count"),
+            quantization=(details.get("quantization_level") or "").upper(),
+            family=details.get("family") or arch,
+            capabilities=tuple((body or {}).get("capabilities") or ()),
+        )
+
+@dataclass
+class PullProgress:
+    model: str
+    status: str = "starting"
+    completed: int = 0
+    total: int = 0
+    done: bool = False
+    error: str | None = None
+    _layers: dict[str, tuple[int, int]] = field(default_factory=dict, repr=False)
+
+    @property
+    def fraction(self) -> float | None:
+        return self.completed / self.total if self.total else None
+
+    def update(self, event: dict) -> None:
+        if event.get("error"):
+            self.error, self.done = str(event["error"]), True
+            return
+        self.status = event.get("status") or self.status
+        if event.get("digest") and event.get("total"):
+            # One event stream per layer; the bar is for the whole model
+            self._layers[event["digest"]] = (int(event.get("completed") or 0), int(event["total"]))
+            self.completed = sum(c for c, _ in self._layers.values())
+            self.total = sum(t for _, t in self._layers.values())
+        if self.status == "success":
+            self.done = True
+            self.completed = self.total
+
+def _get_json(url: str, timeout: float) -> dict:
+    with urllib.request.urlopen(url, timeout=timeout) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+def _request(url: str, payload: dict) -> urllib.request.Request:
+    return urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                  headers={"Content-Type": "application/json"}, method="POST")
+
+class ModelRegistry:
+    """Cached model list and details for one set of hosts; use get_registry() to share it."""
+
+    def __init__(self, urls: list[str], api: str = "ollama", ttl_s: float = TAGS_TTL_S):
+        if not urls:
+            raise ValueError("ModelRegistry needs at least one base URL")
+        self.urls = [normalize_url(u) for u in urls]
+        self.api = api
+        self.ttl_s = ttl_s
+        self._lock = threading.Lock()
+        self._tags: dict[str, tuple[float, dict[str, InstalledModel] | None]] = {}  # url -> (read at, models or None if down)
+        self._show: dict[tuple[str, str, str], dict | None] = {}  # (url, model, digest) -> /api/show body
+
+    # -- installed models --
+
+    def _list(self, url: str) -> dict[str, InstalledModel] | None:
+        try:
+            if self.api == "openai":
+                data = _get_json(f"{url}/v1/models", PROBE_TIMEOUT_S)
+                return {m["id"]: InstalledModel(m["id"], host=url) for m in data.get("data", [])}
+            data = _get_json(f"{url}/api/tags", PROBE_TIMEOUT_S)
+        except (OSError, ValueError, KeyError) as e:
+            logging.info(f"Could not list models at {url}: {e}")
+            return None
+        out = {}
+        for m in data.get("models", []):
+            name = model_key(m.get("name") or m.get("model", ""))
+            out[name] = InstalledModel(name, int(m.get("size") or 0), m.get("digest", ""), url)
+        return out
+
+    def _host_models(self, url: str, force: bool) -> dict[str, InstalledModel] | None:
+        with self._lock:
+            cached = self._tags.get(url)
+        if cached and not force and time.time() - cached[0] < self.ttl_s:
+            return cached[1]
+        models = self._list(url)
+        with self._lock:
+            self._tags[url] = (time.time(), models)
+        return models
+
+    def installed(self, force: bool = False) -> dict[str, InstalledModel] | None:
+        """Models on any of the hosts (first host wins for duplicates); None if no host answered."""
+        if len(self.urls) == 1:
+            per_host = [self._host_models(self.urls[0], force)]
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.urls)) as pool:
+                per_host = list(pool.map(lambda u: self._host_models(u, force), self.urls))
+        if all(m is None for m in per_host):
+            return None
+        out: dict[str, InstalledModel] = {}
+        for models in per_host:
+            for name, m in (models or {}).items():
+                out.setdefault(name, m)
+        return out
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._tags.clear()
+
+    def _key(self, name: str) -> str:
+        return model_key(name) if self.api == "ollama" else name
+
+    def resolve(self, name: str) -> InstalledModel | None:
+        """The installed model `name` refers to, matched exactly (a missing tag means :latest)."""
+        return (self.installed() or {}).get(self._key(name))
+
+    def missing(self, names) -> list[str]:
+        """Names in `names` that are not installed, in order and without repeats."""
+        installed = self.installed() or {}
+        return [n for n in dict.fromkeys(names) if self._key(n) not in installed]
+
+    # -- details --
+
+    def show(self, model: str, url: str | None = None) -> dict | None:
+        """Ollama's /api/show body for `model`, or None; cached until the model's digest changes."""
+        if self.api != "ollama":
+            return None
+        entry = self.resolve(model)
+        url = normalize_url(url) if url else (entry.host if entry else self.urls[0])
+        key = (url, self._key(model), entry.digest if entry else "")
+        with self._lock:
+            if key in self._show:
+                return self._show[key]
+        try:
+            with urllib.request.urlopen(_request(f"{url}/api/show", {"model": model}), timeout=SHOW_TIMEOUT_S) as r:
+                body = json.loads(r.read().decode("utf-8"))
+        except (OSError, ValueError) as e:
+            logging.info(f"No /api/show for {model}: {e}")
+            return None  # not cached, so a server that was down is asked again
+        with self._lock:
+            self._show[key] = body
+        return body
+
+    def details(self, model: str, url: str | None = None) -> ModelDetails | None:
+        body = self.show(model, url)
+        return ModelDetails.from_show(model, body) if body is not None else None
+
+    # -- pulls --
+
+    def pull(self, model: str, on_progress: Callable[[PullProgress], None] | None = None,
+             url: str | None = None) -> PullProgress:
+        """Pulls `model` onto `url` (default: the first host), reporting progress as it streams."""
+        url = normalize_url(url) if url else self.urls[0]
+        progress = PullProgress(model)
+        try:
+            req = _request(f"{url}/api/pull", {"model": model, "name": model, "stream": True})  # "name" for Ollama < 0.5
+            with urllib.request.urlopen(req, timeout=PULL_TIMEOUT_S) as r:
+                for raw in r:
+                    if not raw.strip():
+                        continue
+                    progress.update(json.loads(raw))
+                    if on_progress:
+                        on_progress(progress)
+                    if progress.done:
+                        break
+        except (OSError, ValueError) as e:
+            progress.error, progress.done = str(e), True
+            if on_progress:
+                on_progress(progress)
+        if not progress.done:
+            progress.error, progress.done = "the server ended the pull without reporting success", True
+        self.invalidate()
+        return progress
+
+    def pull_many(self, models: list[str], on_progress: Callable[[PullProgress], None] | None = None,
+                  max_parallel: int = MAX_PARALLEL_PULLS) -> dict[str, PullProgress]:
+        """Pulls several models at once; `on_progress` is called from the pulling threads."""
+        models = list(dict.fromkeys(models))
+        if not models:
+            return {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(models)))) as pool:
+            results = list(pool.map(lambda m: self.pull(m, on_progress), models))
+        return {p.model: p for p in results}
+
+_REGISTRIES: dict[tuple[str, tuple[str, ...]], ModelRegistry] = {}
+_REGISTRIES_LOCK = threading.Lock()
+
+def get_registry(urls: list[str], api: str = "ollama") -> ModelRegistry:
+    """One registry per host list per process, like hosts.get_pool."""
+    key = (api, tuple(normalize_url(u) for u in urls))
+    with _REGISTRIES_LOCK:
+        if key not in _REGISTRIES:
+            _REGISTRIES[key] = ModelRegistry(list(key[1]), api)
+        return _REGISTRIES[key]
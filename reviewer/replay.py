@@ -0,0 +1,254 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import urlparse
+
+from .ollama import HTTP, Transport
+
+# Record/replay transports for OllamaText/OllamaVLM.
+#
+# record: every request/response pair is appended to a gzip'd JSON-lines
+#         archive, keyed by a fingerprint of the endpoint path and payload.
+# replay: requests whose fingerprint is in the archive are served from it
+#         (optionally with the original timings); misses go to the live server
+#         unless strict, so e.g. only a changed writer prompt is re-generated.
+
+ARCHIVE_FILE = "llm_archive.jsonl.gz"
+
+# Payload fields that do not change what the model generates.
+_IGNORED_FIELDS = ("stream", "stream_options", "keep_alive")
+
+class ReplayMiss(KeyError):
+    pass
+
+def fingerprint(url: str, payload: dict) -> str:
+    """Stable key for a request: endpoint path + canonical payload, host ignored."""
+    body = {k: v for k, v in payload.items() if k not in _IGNORED_FIELDS}
+    canon = json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    h = hashlib.sha256(urlparse(url).path.encode("utf-8"))
+    h.update(b"\0")
+    h.update(canon.encode("utf-8"))
+    return h.hexdigest()[:32]
+
+def _text_of(chunk: dict) -> str:
+    if "choices" in chunk:  # OpenAI-compatible
+        choice = (chunk["choices"] or [{}])[0]
+        return (choice.get("delta") or choice.get("message") or {}).get("content") or ""
+    if "response" in chunk:
+        return chunk.get("response") or ""
+    return (chunk.get("message") or {}).get("content") or ""
+
+def _thinking_of(chunk: dict) -> str:
+    """Ollama's separate reasoning field; OpenAI-compatible streams are recorded whole."""
+    if "thinking" in chunk:
+        return chunk.get("thinking") or ""
+    return (chunk.get("message") or {}).get("thinking") or ""
+
+def _pieces(rec: dict) -> list[tuple[str, str]]:
+    """(text, thinking) per streamed chunk; older archives stored the text only."""
+    return [(p, "") if isinstance(p, str) else (p[0], p[1]) for p in rec["pieces"]]
+
+def _is_chat(rec: dict) -> bool:
+    if rec.get("path"):
+        return not rec["path"].endswith("/generate")
+    final = rec.get("final") or {}
+    return "message" in final or "response" not in final
+
+def _chunk(chat: bool, model: str | None, text: str, thinking: str) -> dict:
+    if chat:
+        message = {"role": "assistant", "content": text, **({"thinking": thinking} if thinking else {})}
+        return {"model": model, "done": False, "message": message}
+    return {"model": model, "done": False, "response": text, **({"thinking": thinking} if thinking else {})}
+
+def _with_text(final: dict, text: str, thinking: str = "", chat: bool | None = None) -> dict:
+    out = dict(final)
+    chat = ("message" in out or "response" not in out) if chat is None else chat
+    if chat:
+        out["message"] = {**(out.get("message") or {"role": "assistant"}), "content": text}
+        if thinking:
+            out["message"]["thinking"] = thinking
+    else:
+        out["response"] = text
+        if thinking:
+            out["thinking"] = thinking
+    return out
+
+class RecordingTransport:
+    def __init__(self, archive: str | Path, inner: Transport = HTTP):
+        self.archive = Path(archive)
+        self.archive.parent.mkdir(parents=True, exist_ok=True)
+        self.inner = inner
+        self._lock = threading.Lock()
+
+    def _write(self, rec: dict) -> None:
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            # Appending gzip members keeps the file valid after every call,
+            # so a crashed run still leaves a usable archive.
+            with gzip.open(self.archive, "ab") as f:
+                f.write(line)
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict:
+        t0 = time.perf_counter()
+        body = self.inner.post_json(url, payload, timeout)
+        self._write({
+            "fp": fingerprint(url, payload),
+            "path": urlparse(url).path,
+            "model": payload.get("model"),
+            "kind": "json",
+            "elapsed_s": round(time.perf_counter() - t0, 4),
+            "body": body,
+        })
+        return body
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]:
+        t0 = time.perf_counter()
+        first_s = None
+        pieces: list[list[str]] = []
+        chunks: list[dict] = []
+        final: dict = {}
+        complete = closed = False
+        try:
+            for chunk in self.inner.post_stream(url, payload, timeout):
+                if chunk.get("done"):
+                    final = {k: v for k, v in chunk.items()}
+                else:
+                    if first_s is None:
+                        first_s = time.perf_counter() - t0
+                    pieces.append([_text_of(chunk), _thinking_of(chunk)])
+                    chunks.append(chunk)
+                yield chunk
+            complete = True
+        except GeneratorExit:
+            # Closed by the reader: a thinking budget cut or a cancel. Replay serves the same prefix.
+            closed = True
+            raise
+        finally:
+            if complete or closed:
+                rec = {
+                    "fp": fingerprint(url, payload),
+                    "path": urlparse(url).path,
+                    "model": payload.get("model"),
+                    "first_token_s": round(first_s or 0.0, 4),
+                    "elapsed_s": round(time.perf_counter() - t0, 4),
+                    "partial": not complete,
+                }
+                if any("choices" in c for c in chunks):
+                    # SSE streams have no single final chunk (usage arrives separately), so keep them whole.
+                    rec.update(kind="chunks", chunks=chunks)
+                else:
+                    # Ollama: stored compactly as (text, thinking) pieces plus the final (stats) chunk.
+                    rec.update(kind="stream", pieces=pieces, final=final)
+                self._write(rec)
+
+def load_archive(path: str | Path) -> dict[str, list[dict]]:
+    entries: dict[str, list[dict]] = {}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rec = json.loads(line)
+                entries.setdefault(rec["fp"], []).append(rec)
+    return entries
+
+class ReplayTransport:
+    def __init__(self, archive: str | Path, timing: bool = False, strict: bool = False,
+                 fallback: Transport | None = HTTP):
+        self.archive = Path(archive)
+        self.entries = load_archive(self.archive)
+        self.timing = timing
+        self.strict = strict
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+        self._served: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, url: str, payload: dict) -> dict | None:
+        fp = fingerprint(url, payload)
+        recs = self.entries.get(fp)
+        if not recs:
+            with self._lock:
+                self.misses += 1
+            if self.strict or self.fallback is None:
+                raise ReplayMiss(f"No recorded response for {urlparse(url).path} ({payload.get('model')}), fingerprint {fp}")
+            logging.info(f"Replay miss for {payload.get('model')} {urlparse(url).path}; calling the live server.")
+            return None
+        with self._lock:
+            # Identical requests made several times are served in recorded order.
+            i = self._served.get(fp, 0)
+            self._served[fp] = i + 1
+            self.hits += 1
+        return recs[min(i, len(recs) - 1)]
+
+    def post_json(self, url: str, payload: dict, timeout: float) -> dict:
+        rec = self._lookup(url, payload)
+        if rec is None:
+            return self.fallback.post_json(url, payload, timeout)
+        if self.timing:
+            time.sleep(rec.get("elapsed_s", 0.0))
+        if rec["kind"] == "json":
+            return rec["body"]
+        if rec["kind"] == "chunks":
+            return _openai_body(rec["chunks"])
+        pieces = _pieces(rec)
+        return _with_text(rec["final"], "".join(t for t, _ in pieces), "".join(k for _, k in pieces), _is_chat(rec))
+
+    def post_stream(self, url: str, payload: dict, timeout: float) -> Iterator[dict]:
+        rec = self._lookup(url, payload)
+        if rec is None:
+            yield from self.fallback.post_stream(url, payload, timeout)
+            return
+        if rec["kind"] == "json":
+            body = rec["body"]
+            if self.timing:
+                time.sleep(rec.get("elapsed_s", 0.0))
+            if "choices" in body:
+                yield {"choices": [{"index": 0, "delta": {"content": _text_of(body)}}]}
+                yield {k: v for k, v in body.items() if k != "choices"}
+            else:
+                yield {**_with_text(body, _text_of(body), _thinking_of(body)), "done": True}
+            return
+
+        if rec["kind"] == "chunks":
+            yield from self._paced(rec, rec["chunks"])
+            return
+
+        chat = _is_chat(rec)
+        for text, thinking in self._paced(rec, _pieces(rec)):
+            yield _chunk(chat, payload.get("model"), text, thinking)
+        if rec["final"]:
+            yield rec["final"]  # a partial record ends where the reader stopped, without one
+
+    def _paced(self, rec: dict, items: list) -> Iterator:
+        per_item = 0.0
+        if self.timing:
+            time.sleep(rec.get("first_token_s", 0.0))
+            per_item = max(rec.get("elapsed_s", 0.0) - rec.get("first_token_s", 0.0), 0.0) / max(len(items), 1)
+        for item in items:
+            if per_item:
+                time.sleep(per_item)
+            yield item
+
+def _openai_body(chunks: list[dict]) -> dict:
+    """Non-streamed chat completion assembled from recorded SSE chunks."""
+    body: dict = {"choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(_text_of(c) for c in chunks)}}]}
+    for c in chunks:
+        for key in ("usage", "timings"):
+            if c.get(key):
+                body[key] = c[key]
+    return body
+
+def make_transport(mode: str, archive: str | Path, timing: bool = False, strict: bool = False,
+                   inner: Transport = HTTP) -> Transport:
+    if mode == "record":
+        return RecordingTransport(archive, inner=inner)
+    if mode == "replay":
+        return ReplayTransport(archive, timing=timing, strict=strict, fallback=inner)
+    return inner
@@ -0,0 +1,316 @@
+from __future__ import annotations
+import json
+import logging
+import math
+import os
+import re
+import subprocess
+import sys
+import urllib.request
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+from .context import CTX_BUCKETS
+from .hosts import model_key
+from .registry import ModelDetails, get_registry
+
+# Fitting a review to this machine.
+#
+# A preset whose largest model does not fit in free memory does not fail on
+# Ollama; it swaps and runs ~10x slower. The planner reads total and available
+# memory (psutil when installed, else /proc/meminfo, sysctl/vm_stat or
+# GlobalMemoryStatusEx), what Ollama holds resident (/api/ps; idle models are
+# evicted to make room), installed sizes (/api/tags) and each model's layer
+# geometry (/api/show) for its KV cache, the last two cached by the model
+# registry. It then takes the most capable preset
+# whose models fit, the largest context bucket and the sharpest figure DPI
+# that still fit, and the next preset down's models as out-of-memory fallbacks.
+# Memory is only known for an Ollama on this machine; for remote hosts every
+# preset is reported as unknown and nothing is changed.
+
+GiB = 1024 ** 3
+OS_RESERVE = 2 * GiB
+HEADROOM = 0.10  # of total memory, for the app, PyMuPDF and the page cache
+MIN_CTX = 8192
+KV_BYTES = 2  # f16 cache entries
+DEFAULT_KV_PER_TOKEN = 160 * 1024  # when /api/show has no geometry (8B-class GQA model)
+VISION_PROMPT_TOKENS = 1500
+PAGE_INCHES = (8.5, 11.0)
+DPI_STEP = 20
+MIN_DPI = 120
+PROBE_TIMEOUT_S = 2.0
+# Bytes per parameter for Ollama's usual quantizations
+QUANT_BYTES = {"Q4": 0.6, "Q5": 0.7, "Q6": 0.82, "Q8": 1.07, "F16": 2.0, "BF16": 2.0}
+_PARAMS = re.compile(r"(\d+(?:\.\d+)?)\s*([bBmM])\b")
+
+@dataclass
+class Memory:
+    total: int
+    available: int
+
+def system_memory() -> Memory | None:
+    try:
+        import psutil  # optional; the fallbacks below cover the usual platforms
+        vm = psutil.virtual_memory()
+        return Memory(vm.total, vm.available)
+    except ImportError:
+        pass
+    try:
+        if sys.platform.startswith("linux"):
+            info = {}
+            with open("/proc/meminfo", encoding="ascii") as f:
+                for line in f:
+                    key, value = line.split(":", 1)
+                    info[key] = int(value.split()[0]) * 1024
+            return Memory(info["MemTotal"], info.get("MemAvailable", info["MemFree"]))
+        if sys.platform == "darwin":
+            total = int(subprocess.check_output(["sysctl", "-n", "hw.memsize"], timeout=2))
+            vm_stat = subprocess.check_output(["vm_stat"], timeout=2, text=True)
+            page = int(re.search(r"page size of (\d+)", vm_stat).group(1))
+            pages = {k.strip(): int(v.strip(" .")) for k, v in re.findall(r"(Pages [^:]+):\s+(\d+)", vm_stat)}
+            free = sum(pages.get(k, 0) for k in ("Pages free", "Pages inactive", "Pages speculative", "Pages purgeable"))
+            return Memory(total, free * page)
+        if os.name == "nt":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            stat = MEMORYSTATUSEX()
+            stat.dwLength = ctypes.sizeof(stat)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(stat))
+            return Memory(stat.ullTotalPhys, stat.ullAvailPhys)
+    except (OSError, ValueError, KeyError, AttributeError, subprocess.SubprocessError) as e:
+        logging.info(f"Could not read system memory: {e}")
+    return None
+
+def is_local(url: str) -> bool:
+    return (urlparse(url).hostname or "") in ("localhost", "127.0.0.1", "::1", "0.0.0.0")
+
+def _get(url: str) -> dict:
+    with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT_S) as r:
+        return json.loads(r.read().decode("utf-8"))
+
+@dataclass(frozen=True)
+class Geometry:
+    kv_per_token: int = DEFAULT_KV_PER_TOKEN
+    context_length: int | None = None
+    params: float | None = None  # parameter count, for models that are not installed
+    quant: str = ""
+
+def model_geometry(base_url: str, model: str) -> Geometry:
+    """KV-cache bytes per token and trained context from /api/show (cached by the registry); defaults if unavailable."""
+    body = get_registry([base_url]).show(model, base_url)
+    if body is None:
+        return Geometry(params=_params_from_name(model))
+    info = body.get("model_info") or {}
+    arch = info.get("general.architecture", "")
+
+    def get(key: str):
+        return info.get(f"{arch}.{key}")
+
+    layers, kv_heads, heads = get("block_count"), get("attention.head_count_kv"), get("attention.head_count")
+    head_dim = get("attention.key_length") or (get("embedding_length") // heads if get("embedding_length") and heads else None)
+    if isinstance(kv_heads, list):  # per-layer counts in some architectures
+        kv_heads = max(kv_heads) if kv_heads else None
+    kv = 2 * layers * (kv_heads or heads) * head_dim * KV_BYTES if layers and (kv_heads or heads) and head_dim else DEFAULT_KV_PER_TOKEN
+    details = ModelDetails.from_show(model, body)
+    return Geometry(
+        kv_per_token=kv,
+        context_length=details.context_length,
+        params=details.parameter_count or _params_from_name((body.get("details") or {}).get("parameter_size", "") or model),
+        quant=details.quantization,
+    )
+
+def _params_from_name(name: str) -> float | None:
+    m = _PARAMS.search(name.split(":")[-1]) or _PARAMS.search(name)
+    if not m:
+        return None
+    return float(m.group(1)) * (1e9 if m.group(2).lower() == "b" else 1e6)
+
+@dataclass
+class OllamaState:
+    installed: dict[str, int] = field(default_factory=dict)  # model -> weights on disk (bytes)
+    resident: dict[str, int] = field(default_factory=dict)  # model -> bytes held now
+    reachable: bool = True
+
+def ollama_state(base_url: str) -> OllamaState:
+    installed = get_registry([base_url]).installed()
+    if installed is None:
+        return OllamaState(reachable=False)
+    try:
+        ps = _get(f"{base_url}/api/ps")
+    except (OSError, ValueError):
+        return OllamaState(reachable=False)
+    return OllamaState(
+        installed={name: m.size for name, m in installed.items()},
+        resident={model_key(m.get("name") or m.get("model", "")): int(m.get("size") or 0) for m in ps.get("models", [])},
+    )
+
+def weights_bytes(base_url: str, model: str, state: OllamaState) -> int | None:
+    size = state.installed.get(model_key(model))
+    if size:
+        return size
+    geo = model_geometry(base_url, model)  # not installed: estimate from the parameter count
+    if not geo.params:
+        return None
+    per_param = next((b for q, b in QUANT_BYTES.items() if geo.quant.startswith(q)), QUANT_BYTES["Q4"])
+    return int(geo.params * per_param)
+
+def model_need(base_url: str, model: str, num_ctx: int, state: OllamaState) -> int | None:
+    """Bytes Ollama needs to run `model` with a num_ctx-token context."""
+    weights = weights_bytes(base_url, model, state)
+    if weights is None:
+        return None
+    return weights + model_geometry(base_url, model).kv_per_token * num_ctx
+
+def page_tokens(dpi: int, patch: int = 28) -> int:
+    w, h = PAGE_INCHES
+    return math.ceil(w * dpi / patch) * math.ceil(h * dpi / patch)
+
+@dataclass
+class PresetFit:
+    name: str
+    fits: bool | None  # None: memory unknown
+    need: int | None = None  # bytes for the largest model at MIN_CTX
+    largest: str = ""
+    max_ctx: int | None = None
+    fig_dpi: int | None = None
+
+@dataclass
+class ResourcePlan:
+    preset: str | None
+    fits: dict[str, PresetFit]
+    budget: int | None = None  # bytes Ollama can use without swapping
+    memory: Memory | None = None
+    held: int = 0  # bytes of models Ollama has loaded; it evicts idle ones for a new load
+    fallbacks: dict[str, dict[str, str]] = field(default_factory=dict)  # preset -> role -> model
+    notes: list[str] = field(default_factory=list)
+
+    def explain(self, selected: str | None = None) -> str:
+        if self.budget is None:
+            return " ".join(self.notes) or "Memory could not be measured; presets are not checked."
+        lines = [
+            f"{self.budget / GiB:.1f} GB usable for models: {self.memory.available / GiB:.1f} GB free of "
+            f"{self.memory.total / GiB:.1f} GB" + (f", plus {self.held / GiB:.1f} GB held by models Ollama has loaded" if self.held else "")
+            + f", minus {(OS_RESERVE + HEADROOM * self.memory.total) / GiB:.1f} GB kept for the system."
+        ]
+        for fit in self.fits.values():
+            if fit.fits is None or fit.need is None:
+                continue
+            mark = "✅" if fit.fits else "⚠️"
+            detail = f"context up to {fit.max_ctx // 1024}k, figures at {fit.fig_dpi} dpi" if fit.fits else "would swap"
+            lines.append(f"{mark} {fit.name}: {fit.largest} needs ~{fit.need / GiB:.1f} GB; {detail}.")
+        if self.preset:
+            lines.append(f"Recommended: **{self.preset}** (the most capable preset that fits).")
+        lines += self.notes
+        if selected and selected in self.fits and self.fits[selected].fits is False:
+            lines.append(f"**{selected}** does not fit and will run many times slower while it swaps.")
+        return "\n\n".join(lines)
+
+def _fit(base_url: str, name: str, preset: dict, budget: int, state: OllamaState) -> PresetFit:
+    text_models = [preset["critic_model"], preset["writer_model"]]
+    vlm = preset.get("vision_model")
+    needs = {m: model_need(base_url, m, MIN_CTX, state) for m in [*text_models, vlm] if m}
+    if any(v is None for v in needs.values()):
+        return PresetFit(name, None)
+    largest = max(needs, key=needs.get)
+    fit = PresetFit(name, needs[largest] <= budget, needs[largest], largest)
+    if not fit.fits:
+        return fit
+    # Largest context bucket every text model can hold, within their trained lengths
+    trained = min((model_geometry(base_url, m).context_length or CTX_BUCKETS[-1]) for m in text_models)
+    fit.max_ctx = MIN_CTX
+    for b in CTX_BUCKETS:
+        if MIN_CTX <= b <= trained and all(model_need(base_url, m, b, state) <= budget for m in text_models):
+            fit.max_ctx = b
+    # Sharpest DPI at which one page batch still fits next to the VLM weights
+    dpi = int(preset.get("image_clarity", 200))
+    while vlm and dpi > MIN_DPI and model_need(base_url, vlm, VISION_PROMPT_TOKENS + page_tokens(dpi) * 10, state) > budget:
+        dpi -= DPI_STEP
+    fit.fig_dpi = max(dpi, MIN_DPI)
+    return fit
+
+def plan_presets(presets: dict[str, dict], base_url: str) -> ResourcePlan:
+    """Per-preset fit on this machine and the recommended preset; presets for other servers are left out."""
+    ollama = {k: v for k, v in presets.items() if v.get("llm_api", "ollama") == "ollama"}
+    fits = {k: PresetFit(k, None) for k in ollama}
+    if not is_local(base_url):
+        return ResourcePlan(None, fits, notes=[f"Ollama runs on {base_url}; its memory cannot be measured from here."])
+    memory = system_memory()
+    state = ollama_state(base_url)
+    if memory is None or not state.reachable:
+        why = "system memory could not be read" if memory is None else f"Ollama at {base_url} is not answering"
+        return ResourcePlan(None, fits, notes=[f"Presets are not checked: {why}."])
+    held = sum(state.resident.values())
+    budget = int(memory.available + held - OS_RESERVE - HEADROOM * memory.total)
+    plan = ResourcePlan(None, fits, budget=budget, memory=memory, held=held)
+    for name, preset in ollama.items():
+        fits[name] = _fit(base_url, name, preset, budget, state)
+    # Most capable first: presets ordered by the weights they load
+    ranked = sorted((f for f in fits.values() if f.need is not None), key=lambda f: -f.need)
+    plan.preset = next((f.name for f in ranked if f.fits), None)
+    if ranked and plan.preset is None:
+        plan.notes.append("No preset fits in free memory; close other programs or use a machine with more RAM.")
+    for i, f in enumerate(ranked):
+        # The next preset down, preferring one that fits
+        smaller = next((g for g in ranked[i + 1:] if g.fits), ranked[i + 1] if i + 1 < len(ranked) else None)
+        if smaller:
+            plan.fallbacks[f.name] = {
+                role: ollama[smaller.name][role] for role in ("critic_model", "writer_model")
+                if ollama[smaller.name][role] != ollama[f.name][role]
+            }
+    return plan
+
+_OOM = re.compile(
+    r"out of memory|requires more system memory|insufficient memory|not enough memory|"
+    r"failed to allocate|unable to allocate|cudaMalloc|\bOOM\b",
+    re.IGNORECASE,
+)
+
+def is_oom_error(e: BaseException) -> bool:
+    """Whether a model call failed for lack of memory (Ollama puts the reason in the error body)."""
+    text = str(e)
+    response = getattr(e, "response", None)
+    if response is not None:
+        try:
+            text += " " + response.text
+        except Exception:
+            pass
+    return bool(_OOM.search(text))
+
+def fits_now(base_url: str, model: str, num_ctx: int) -> bool | None:
+    """Whether `model` with num_ctx fits in memory right now; None when that cannot be told."""
+    if not is_local(base_url):
+        return None
+    memory = system_memory()
+    state = ollama_state(base_url)
+    need = model_need(base_url, model, num_ctx, state) if state.reachable else None
+    if memory is None or need is None:
+        return None
+    # A model that is already resident is paid for
+    held = sum(state.resident.values())
+    return need <= memory.available + held - OS_RESERVE - HEADROOM * memory.total
+
+if __name__ == "__main__":
+    import argparse
+    from .hosts import ollama_hosts
+    ap = argparse.ArgumentParser(description="Memory each model needs against what this machine has free.")
+    ap.add_argument("models", nargs="+")
+    ap.add_argument("--url", default=ollama_hosts()[0])
+    ap.add_argument("--num_ctx", type=int, default=MIN_CTX)
+    args = ap.parse_args()
+    mem = system_memory()
+    st = ollama_state(args.url)
+    if mem:
+        print(f"Memory: {mem.available / GiB:.1f} GB free of {mem.total / GiB:.1f} GB; "
+              f"Ollama holds {sum(st.resident.values()) / GiB:.1f} GB")
+    for m in args.models:
+        need = model_need(args.url, m, args.num_ctx, st)
+        ok = fits_now(args.url, m, args.num_ctx)
+        print(f"{m}: {'?' if need is None else f'{need / GiB:.1f} GB'} at num_ctx={args.num_ctx} -> "
+              f"{'fits' if ok else 'unknown' if ok is None else 'does not fit'}")
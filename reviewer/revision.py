@@ -0,0 +1,319 @@
+from __future__ import annotations
+import hashlib
+import json
+import re
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from .critique import CRITIQUE_FILE, SECTIONS, Critique, Issue, ISSUE_SCHEMA, as_text, from_dict, parse_issues
+from .ingest import Manuscript
+from .numeric_checks import section_segments
+
+# Revised manuscripts (R1, R2, ...): review the change, not the whole paper.
+#
+# Every run leaves manuscript_index.json in its output folder: the text as
+# sentences by section, plus hashes of the tables and of the figure images
+# sent to the VLM. Given the previous round's folder (--previous_run), the
+# new text is diffed by sentence hash. The critic then sees only the
+# changed passages, with the previous points for those sections, and
+# returns a status for each point and any new issues. Points in untouched
+# sections stay unaddressed without a model call. Only new or changed figure
+# images go to the VLM. The merged critique.json is the prior for the next
+# round.
+
+INDEX_FILE = "manuscript_index.json"
+NOTES_FILE = "figure_notes.md"
+REVISION_FILE = "revision.json"
+STATUSES = ("addressed", "partly addressed", "unaddressed")
+PREVIOUS_ROUND = "previous_round"  # points of a previous critique that was free text
+_SENTENCE_END = re.compile(r"(?<=[.;!?])\s+")
+# Critique sections and the manuscript sections their fixes go in
+_TEXT_SECTIONS = {
+    "abstract": ("abstract",),
+    "introduction": ("introduction",),
+    "methods": ("methods",),
+    "results": ("results",),
+    "discussion": ("discussion",),
+    "references": ("references",),
+    "reporting_guidelines": ("methods",),
+    "ethics_bias_reproducibility": ("methods", "discussion"),
+}
+
+def _hash(text: str | bytes) -> str:
+    data = text if isinstance(text, bytes) else " ".join(text.split()).encode("utf-8")
+    return hashlib.sha1(data).hexdigest()[:16]
+
+def file_hash(path: str | Path) -> str:
+    return _hash(Path(path).read_bytes())
+
+def _sentences(text: str) -> list[str]:
+    return [s for s in (" ".join(x.split()) for x in _SENTENCE_END.split(text)) if s]
+
+def build_index(manuscript: Manuscript, figure_paths=()) -> dict:
+    units = [
+        {"pointer": pointer, "section": section, "sentences": _sentences(text)}
+        for pointer, section, text in section_segments(manuscript.units)
+    ]
+    return {
+        "input": manuscript.path.name,
+        "units": [u for u in units if u["sentences"]],
+        "tables": {t.pointer: _hash(t.to_markdown()) for t in manuscript.tables},
+        "figures": {file_hash(p): Path(p).name for p in figure_paths},
+    }
+
+def save_index(out_dir: Path, index: dict) -> Path:
+    path = Path(out_dir) / INDEX_FILE
+    path.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    return path
+
+@dataclass
+class SectionChange:
+    section: str
+    unchanged: int = 0
+    added: list[tuple[str, str]] = field(default_factory=list)  # (pointer, sentence)
+    removed: list[str] = field(default_factory=list)
+
+@dataclass
+class RevisionDiff:
+    sections: dict[str, SectionChange]
+    tables_changed: list[str] = field(default_factory=list)  # new pointers
+    tables_removed: int = 0
+    sectioned: bool = True  # False when headings were not found in one of the versions
+
+    @property
+    def changed(self) -> list[str]:
+        return [s for s, c in self.sections.items() if c.added or c.removed]
+
+    def critique_sections(self, figures_changed: bool) -> list[str]:
+        """Critique sections whose text (or figures/tables) changed."""
+        if not self.changed and not self.tables_changed and not figures_changed:
+            return []
+        if not self.sectioned:
+            return [s for s in SECTIONS if s not in ("tables", "figures")] + (
+                ["tables"] if self.tables_changed else []) + (["figures"] if figures_changed else [])
+        out = [s for s, text in _TEXT_SECTIONS.items() if any(t in self.changed for t in text)]
+        if self.tables_changed or self.tables_removed:
+            out.append("tables")
+        if figures_changed:
+            out.append("figures")
+        return [s for s in SECTIONS if s in out]
+
+    def summary(self) -> dict:
+        return {
+            "sections": {s: {"added": len(c.added), "removed": len(c.removed), "unchanged": c.unchanged}
+                         for s, c in self.sections.items()},
+            "tables_changed": self.tables_changed,
+            "tables_removed": self.tables_removed,
+        }
+
+    def render(self, max_removed: int = 30) -> str:
+        """The changed passages for the critic: new sentences with pointers, then what was deleted."""
+        blocks = []
+        for name in self.changed:
+            c = self.sections[name]
+            lines = [f"## {name.upper()} ({len(c.added)} sentence(s) new or reworded, {len(c.removed)} removed, "
+                     f"{c.unchanged} unchanged)"]
+            pointer = None
+            for p, sentence in c.added:
+                if p != pointer:
+                    lines.append(f"{p}")
+                    pointer = p
+                lines.append(f"+ {sentence}")
+            for sentence in c.removed[:max_removed]:
+                lines.append(f"- {sentence}")
+            if len(c.removed) > max_removed:
+                lines.append(f"- … {len(c.removed) - max_removed} more removed sentence(s)")
+            blocks.append("\n".join(lines))
+        if self.tables_changed or self.tables_removed:
+            blocks.append(f"## TABLES: new or changed {', '.join(self.tables_changed) or 'none'}; "
+                          f"{self.tables_removed} removed")
+        return "\n\n".join(blocks) or "(no text changes detected)"
+
+def diff_manuscripts(old: dict, new: dict) -> RevisionDiff:
+    """Sentence-level diff of two indexes, by content hash within each section."""
+    def by_section(index: dict) -> dict[str, list[tuple[str, str]]]:
+        out: dict[str, list[tuple[str, str]]] = {}
+        for u in index.get("units", []):
+            out.setdefault(u["section"], []).extend((u["pointer"], s) for s in u["sentences"])
+        return out
+
+    old_s, new_s = by_section(old), by_section(new)
+    sectioned = len(set(old_s) - {"front"}) > 1 and len(set(new_s) - {"front"}) > 1
+    if not sectioned:
+        # Headings not found in one version: compare the whole text as one section
+        old_s = {"text": [x for v in old_s.values() for x in v]}
+        new_s = {"text": [x for v in new_s.values() for x in v]}
+    sections = {}
+    for name in dict.fromkeys([*new_s, *old_s]):
+        old_hashes = {}
+        for _, s in old_s.get(name, []):
+            old_hashes[_hash(s)] = old_hashes.get(_hash(s), 0) + 1
+        change = SectionChange(name)
+        for pointer, s in new_s.get(name, []):
+            h = _hash(s)
+            if old_hashes.get(h):
+                old_hashes[h] -= 1
+                change.unchanged += 1
+            else:
+                change.added.append((pointer, s))
+        gone = {h for h, n in old_hashes.items() if n > 0}
+        change.removed = [s for _, s in old_s.get(name, []) if _hash(s) in gone]
+        sections[name] = change
+    old_tables = set(old.get("tables", {}).values())
+    new_tables = new.get("tables", {})
+    return RevisionDiff(
+        sections=sections,
+        tables_changed=[p for p, h in new_tables.items() if h not in old_tables],
+        tables_removed=len(old_tables - set(new_tables.values())),
+        sectioned=sectioned,
+    )
+
+@dataclass
+class PreviousRun:
+    folder: Path
+    index: dict
+    critique: Critique | None  # structured (critique.json)
+    critique_text: str  # free-text Issue Log of a run without --critic_format json
+    figure_notes: str
+
+def load_previous(folder: str | Path) -> PreviousRun:
+    folder = Path(folder)
+    index_path = folder / INDEX_FILE
+    if not index_path.exists():
+        raise FileNotFoundError(f"{index_path} not found; the previous run predates revision support or is not a review folder.")
+    critique = None
+    if (folder / CRITIQUE_FILE).exists():
+        critique, _ = from_dict(json.loads((folder / CRITIQUE_FILE).read_text(encoding="utf-8")))
+    debug = folder / "critique_debug.md"
+    notes = folder / NOTES_FILE
+    return PreviousRun(
+        folder=folder,
+        index=json.loads(index_path.read_text(encoding="utf-8")),
+        critique=critique,
+        critique_text="" if critique or not debug.exists() else debug.read_text(encoding="utf-8"),
+        figure_notes=notes.read_text(encoding="utf-8") if notes.exists() else "",
+    )
+
+# -- the critic's revision pass --
+
+def open_points(critique: Critique) -> list[tuple[str, str, Issue]]:
+    """(id, section, issue) of every earlier point not yet addressed."""
+    out = []
+    for section, issues in critique.sections.items():
+        for n, issue in enumerate(issues, start=1):
+            if issue.status != "addressed":
+                out.append((f"{section}-{n}", section, issue))
+    return out
+
+def points_to_check(points: list[tuple[str, str, Issue]], asked) -> list[tuple[str, str, Issue]]:
+    """The points the critic is shown: those in revised sections, and any not tied to a section."""
+    return [p for p in points if p[1] in asked or p[1] not in SECTIONS]
+
+def render_points(points: list[tuple[str, str, Issue]]) -> str:
+    if not points:
+        return "(none)"
+    return "\n".join(f"{pid} [{i.severity}] {i.issue}" + (f" ({i.pointer})" if i.pointer else "") +
+                     (f" Requested: {i.fix}" if i.fix else "") for pid, _, i in points)
+
+def revision_schema(point_ids: list[str], sections: list[str]) -> dict:
+    prior = {
+        "type": "object",
+        "properties": {
+            "id": {"type": "string", "enum": point_ids} if point_ids else {"type": "string"},
+            "status": {"type": "string", "enum": list(STATUSES)},
+            "note": {"type": "string"},
+        },
+        "required": ["id", "status", "note"],
+    }
+    return {
+        "type": "object",
+        "properties": {
+            "summary": {"type": "string"},
+            "prior": {"type": "array", "items": prior},
+            "new_issues": {"type": "object", "properties": {s: {"type": "array", "items": ISSUE_SCHEMA} for s in sections},
+                           "required": list(sections)},
+        },
+        "required": ["summary", "prior", "new_issues"],
+    }
+
+def merge_revision(prior: Critique, points: list[tuple[str, str, Issue]], reply: dict | None,
+                   asked: list[str], previous_text: str = "") -> tuple[Critique, str]:
+    """The next critique.json and the critic's summary of the revision.
+
+    Points the critic was not asked about keep status "unaddressed" with a note
+    saying why. Verdicts on points from a free-text previous critique (no ids
+    to match) become issues of their own under PREVIOUS_ROUND, and the free
+    text itself (`previous_text`) is carried forward there as one unaddressed
+    point, so no earlier point is lost whatever the critic returned.
+    """
+    reply = reply if isinstance(reply, dict) else {}
+    verdicts = {as_text(v.get("id")): v for v in reply.get("prior") or []
+                if isinstance(v, dict) and as_text(v.get("status")).lower() in STATUSES}
+    shown = {pid for pid, _, _ in points_to_check(points, asked)}
+    merged = Critique(prior.synopsis, dict(prior.key_details), list(prior.strengths), {}, list(prior.missing_info))
+    for section, issues in prior.sections.items():
+        # Settled in an earlier round; kept so critique.json stays the full record
+        merged.sections[section] = [i for i in issues if i.status == "addressed"]
+    for pid, section, issue in points:
+        v = verdicts.pop(pid, None)
+        if v:
+            status, note = as_text(v["status"]).lower(), as_text(v.get("note"))
+        elif reply and pid in shown:
+            status, note = "unaddressed", "(not assessed by the critic)"
+        else:
+            status, note = "unaddressed", "(section not revised)"
+        merged.sections.setdefault(section, []).append(Issue(**{**asdict(issue), "status": status, "note": note}))
+    merged.sections = {k: v for k, v in merged.sections.items() if v}
+    for pid, v in verdicts.items():
+        if pid:
+            merged.sections.setdefault(PREVIOUS_ROUND, []).append(
+                Issue("Moderate", pid, status=as_text(v["status"]).lower(), note=as_text(v.get("note"))))
+    if previous_text.strip():
+        judged = bool(merged.sections.get(PREVIOUS_ROUND))
+        merged.sections.setdefault(PREVIOUS_ROUND, []).append(Issue(
+            "Moderate", previous_text.strip(),
+            why="Raised in the previous round's free-text critique, which is not split into separate points.",
+            status="unaddressed",
+            note="(verdicts on some of these points are listed separately)" if judged else "(carried forward)",
+        ))
+    new = reply.get("new_issues") if isinstance(reply.get("new_issues"), dict) else {}
+    for section in asked:
+        for issue in parse_issues(new.get(section)):
+            issue.status = "new"
+            merged.sections.setdefault(section, []).append(issue)
+    return merged, str(reply.get("summary") or "")
+
+def status_counts(c: Critique) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for i in c.issues:
+        counts[i.status or "unaddressed"] = counts.get(i.status or "unaddressed", 0) + 1
+    return counts
+
+def for_revision_writer(c: Critique, summary: str, diff: RevisionDiff, figures_changed: int) -> str:
+    """Previous points by status, then new issues; what the writer needs for a response-to-revision review."""
+    changed = ", ".join(diff.changed) or "none"
+    lines = [
+        "SYNOPSIS (previous round): " + (c.synopsis or "(none)"),
+        f"WHAT CHANGED: text in {changed}; tables changed: {', '.join(diff.tables_changed) or 'none'}; "
+        f"figures new or changed: {figures_changed}.",
+    ]
+    if summary:
+        lines.append("CRITIC'S SUMMARY OF THE REVISION: " + summary)
+    groups = {"addressed": [], "partly addressed": [], "unaddressed": [], "new": []}
+    for section, issues in c.sections.items():
+        for i in issues:
+            if "\n" in i.issue:
+                # The previous free-text critique, carried forward whole
+                rows = groups.get(i.status, groups["unaddressed"])
+                rows.append(f"- Points of the previous round's free-text critique ({section}) — {i.note}:\n  "
+                            + i.issue.replace("\n", "\n  "))
+                continue
+            row = f"- [{i.severity}] {i.issue} ({section}{', ' + i.pointer if i.pointer else ''})"
+            row += f" — {i.note}" if i.note else ""
+            row += f" Fix: {i.fix}" if i.status in ("new", "partly addressed", "unaddressed") and i.fix else ""
+            groups.get(i.status, groups["unaddressed"]).append(row)
+    titles = {"addressed": "PREVIOUS POINTS ADDRESSED", "partly addressed": "PREVIOUS POINTS PARTLY ADDRESSED",
+              "unaddressed": "PREVIOUS POINTS NOT ADDRESSED", "new": "NEW ISSUES IN THE REVISED TEXT"}
+    for status, rows in groups.items():
+        lines.append(f"{titles[status]}:\n" + ("\n".join(rows) if rows else "(none)"))
+    return "\n\n".join(lines)
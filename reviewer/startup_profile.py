@@ -0,0 +1,119 @@
+from __future__ import annotations
+import json
+import re
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+# Startup/import-time report. Runs each target in a fresh interpreter under
+# `-X importtime`, summarises the slowest imports, and optionally compares
+# against a saved baseline so cold-start regressions show up in review.
+#
+#   python -m reviewer.startup_profile                      # print report
+#   python -m reviewer.startup_profile --save cache/startup_baseline.json
+#   python -m reviewer.startup_profile --baseline cache/startup_baseline.json
+
+DEFAULT_TARGETS = ["reviewer.cli", "reviewer.daemon", "reviewer.jobs", "reviewer.progress", "streamlit"]
+
+_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+@dataclass
+class ImportEntry:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+@dataclass
+class TargetProfile:
+    target: str
+    wall_ms: float
+    import_ms: float
+    top: list[ImportEntry]
+    error: str | None = None
+
+def parse_importtime(stderr: str) -> list[ImportEntry]:
+    out: list[ImportEntry] = []
+    for line in stderr.splitlines():
+        m = _LINE.match(line)
+        if m:
+            self_us, cum_us, indent, mod = m.groups()
+            out.append(ImportEntry(module=mod, self_us=int(self_us), cumulative_us=int(cum_us), depth=len(indent) // 2))
+    return out
+
+def profile_target(target: str, top_n: int = 12, cwd: str | Path | None = None) -> TargetProfile:
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        capture_output=True, text=True, cwd=cwd,
+    )
+    wall_ms = (time.perf_counter() - t0) * 1000
+    entries = parse_importtime(proc.stderr)
+    root_idx = next((i for i in range(len(entries) - 1, -1, -1)
+                     if entries[i].module == target and entries[i].depth == 0), None)
+    root = entries[root_idx] if root_idx is not None else None
+    # -X importtime prints children before their parent, so the target's
+    # subtree is the run of nested lines just above it. Its direct children are
+    # what a lazy import would actually save.
+    children = []
+    if root_idx is not None:
+        i = root_idx - 1
+        while i >= 0 and entries[i].depth > 0:
+            if entries[i].depth == 1:
+                children.append(entries[i])
+            i -= 1
+    top = sorted(children, key=lambda e: e.cumulative_us, reverse=True)[:top_n]
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["import failed"])[-1]
+    return TargetProfile(
+        target=target,
+        wall_ms=round(wall_ms, 1),
+        import_ms=round((root.cumulative_us if root else 0) / 1000, 1),
+        top=top,
+        error=error,
+    )
+
+def format_report(profiles: list[TargetProfile], baseline: dict | None = None, tolerance: float = 0.25) -> tuple[str, list[str]]:
+    lines: list[str] = []
+    regressions: list[str] = []
+    for p in profiles:
+        base = (baseline or {}).get(p.target)
+        delta = ""
+        if base and base.get("import_ms"):
+            ratio = p.import_ms / base["import_ms"]
+            delta = f" (baseline {base['import_ms']:.1f} ms, {ratio - 1:+.0%})"
+            if ratio > 1 + tolerance:
+                regressions.append(f"{p.target}: {base['import_ms']:.1f} -> {p.import_ms:.1f} ms")
+        lines.append(f"## {p.target}: import {p.import_ms:.1f} ms, process {p.wall_ms:.1f} ms{delta}")
+        if p.error:
+            lines.append(f"   ! {p.error}")
+        for e in p.top:
+            lines.append(f"   {e.cumulative_us / 1000:8.1f} ms  {e.module}")
+    return "\n".join(lines), regressions
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Summarise -X importtime for the CLI/app startup path")
+    ap.add_argument("targets", nargs="*", default=DEFAULT_TARGETS)
+    ap.add_argument("--top", type=int, default=12)
+    ap.add_argument("--save", default=None, help="Write the results as a JSON baseline")
+    ap.add_argument("--baseline", default=None, help="Compare against a saved JSON baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    args = ap.parse_args()
+
+    repo_root = Path(__file__).resolve().parent.parent
+    profiles = [profile_target(t, args.top, cwd=repo_root) for t in args.targets]
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8")) if args.baseline else None
+    report, regressions = format_report(profiles, baseline, args.tolerance)
+    print(report)
+
+    if args.save:
+        Path(args.save).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.save).write_text(json.dumps({p.target: asdict(p) for p in profiles}, indent=2), encoding="utf-8")
+        print(f"Wrote {args.save}")
+    if regressions:
+        print("\nStartup regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)